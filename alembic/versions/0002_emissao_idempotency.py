@@ -0,0 +1,71 @@
+"""unique index on shipment_invoices.access_key and emissao idempotency keys
+
+Revision ID: 0002_emissao_idempotency
+Revises: 0001_initial
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_emissao_idempotency'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+
+# Quantas chaves duplicadas listar na mensagem de erro
+_MAX_DUPLICADAS_RELATADAS = 50
+
+
+def _verificar_chaves_duplicadas(bind):
+    """Aborta se há notas com a mesma access_key: o índice único não pode ser criado.
+
+    Os dados não são alterados aqui (trackings e eventos da Brudam referenciam as chaves);
+    as duplicadas devem ser resolvidas manualmente antes de rodar a migração de novo.
+    """
+    duplicadas = bind.execute(sa.text(
+        """
+        SELECT access_key, COUNT(*) AS total, MIN(id) AS primeiro_id, MAX(id) AS ultimo_id
+        FROM shipment_invoices
+        WHERE access_key IS NOT NULL
+        GROUP BY access_key
+        HAVING COUNT(*) > 1
+        ORDER BY access_key
+        """
+    )).all()
+    if not duplicadas:
+        return
+    linhas = "\n".join(
+        f"  {row.access_key}: {row.total} notas (ids {row.primeiro_id}..{row.ultimo_id})"
+        for row in duplicadas[:_MAX_DUPLICADAS_RELATADAS]
+    )
+    if len(duplicadas) > _MAX_DUPLICADAS_RELATADAS:
+        linhas += f"\n  ... e mais {len(duplicadas) - _MAX_DUPLICADAS_RELATADAS} chaves"
+    raise RuntimeError(
+        f"shipment_invoices tem {len(duplicadas)} access_key duplicadas; resolva-as antes de criar "
+        f"ix_shipment_invoices_access_key:\n{linhas}"
+    )
+
+
+def upgrade():
+    _verificar_chaves_duplicadas(op.get_bind())
+    op.create_index('ix_shipment_invoices_access_key', 'shipment_invoices', ['access_key'], unique=True)
+
+    op.create_table(
+        'emissao_idempotency_keys',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('api_user', sa.String(length=150), nullable=False),
+        sa.Column('idempotency_key', sa.String(length=255), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=False),
+        sa.Column('response', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('api_user', 'idempotency_key', name='uq_emissao_idempotency_user_key'),
+    )
+    op.create_index('ix_emissao_idempotency_keys_id', 'emissao_idempotency_keys', ['id'])
+
+
+def downgrade():
+    op.drop_index('ix_emissao_idempotency_keys_id', table_name='emissao_idempotency_keys')
+    op.drop_table('emissao_idempotency_keys')
+    op.drop_index('ix_shipment_invoices_access_key', table_name='shipment_invoices')
@@ -0,0 +1,28 @@
+"""side table for compressed minuta raw payloads
+
+Revision ID: 0003_shipment_raw_payloads
+Revises: 0002_emissao_idempotency
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003_shipment_raw_payloads'
+down_revision = '0002_emissao_idempotency'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'shipment_raw_payloads',
+        sa.Column('shipment_id', sa.Integer(), sa.ForeignKey('shipments.id'), primary_key=True),
+        sa.Column('encoding', sa.String(length=10), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table('shipment_raw_payloads')
@@ -0,0 +1,42 @@
+"""emissao_jobs queue table for /emissao?async=1
+
+Revision ID: 0004_emissao_jobs
+Revises: 0003_shipment_raw_payloads
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_emissao_jobs'
+down_revision = '0003_shipment_raw_payloads'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'emissao_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('api_user', sa.String(length=150), nullable=False),
+        sa.Column('modo', sa.String(length=20), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('processed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_emissao_jobs_id', 'emissao_jobs', ['id'])
+    # Fila: o worker busca o próximo 'queued' por (status, id)
+    op.create_index('ix_emissao_jobs_status_id', 'emissao_jobs', ['status', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_emissao_jobs_status_id', table_name='emissao_jobs')
+    op.drop_index('ix_emissao_jobs_id', table_name='emissao_jobs')
+    op.drop_table('emissao_jobs')
@@ -0,0 +1,26 @@
+"""composite indexes for GET /cargas keyset pagination and filters
+
+Revision ID: 0005_cargas_keyset_indexes
+Revises: 0004_emissao_jobs
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0005_cargas_keyset_indexes'
+down_revision = '0004_emissao_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (filtro, id): o filtro e o "id > after_id ORDER BY id" são resolvidos pelo mesmo índice
+    op.create_index('ix_shipments_rem_ndoc_id', 'shipments', ['rem_nDoc', 'id'])
+    op.create_index('ix_shipments_dest_uf_id', 'shipments', ['dest_uf', 'id'])
+    op.create_index('ix_shipments_integration_date_id', 'shipments', ['integration_date', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_shipments_integration_date_id', table_name='shipments')
+    op.drop_index('ix_shipments_dest_uf_id', table_name='shipments')
+    op.drop_index('ix_shipments_rem_ndoc_id', table_name='shipments')
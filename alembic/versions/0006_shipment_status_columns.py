@@ -0,0 +1,45 @@
+"""denormalized status_code/status_type columns on shipments
+
+Revision ID: 0006_shipment_status_columns
+Revises: 0005_cargas_keyset_indexes
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_shipment_status_columns'
+down_revision = '0005_cargas_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('shipments', sa.Column('status_code', sa.String(length=10), nullable=True))
+    op.add_column('shipments', sa.Column('status_type', sa.String(length=30), nullable=True))
+
+    # Backfill a partir do JSON status existente
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "UPDATE shipments SET status_code = status->>'code', status_type = status->>'type'"
+        )
+    else:
+        op.execute(
+            "UPDATE shipments SET status_code = json_extract(status, '$.code'), "
+            "status_type = json_extract(status, '$.type')"
+        )
+    op.execute("UPDATE shipments SET status_code = '10' WHERE status_code IS NULL")
+
+    with op.batch_alter_table('shipments') as batch:
+        batch.alter_column('status_code', existing_type=sa.String(length=10), nullable=False)
+
+    op.create_index('ix_shipments_status_code_id', 'shipments', ['status_code', 'id'])
+    op.create_index('ix_shipments_status_type_code', 'shipments', ['status_type', 'status_code'])
+
+
+def downgrade():
+    op.drop_index('ix_shipments_status_type_code', table_name='shipments')
+    op.drop_index('ix_shipments_status_code_id', table_name='shipments')
+    with op.batch_alter_table('shipments') as batch:
+        batch.drop_column('status_type')
+        batch.drop_column('status_code')
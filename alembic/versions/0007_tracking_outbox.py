@@ -0,0 +1,43 @@
+"""tracking_outbox table for asynchronous delivery of tracking events
+
+Revision ID: 0007_tracking_outbox
+Revises: 0006_shipment_status_columns
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007_tracking_outbox'
+down_revision = '0006_shipment_status_columns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tracking_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('shipment_invoice_id', sa.Integer(), sa.ForeignKey('shipment_invoices.id'), nullable=True),
+        sa.Column('codigo_evento', sa.String(length=20), nullable=False),
+        sa.Column('documentos', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('response', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_tracking_outbox_id', 'tracking_outbox', ['id'])
+    op.create_index('ix_tracking_outbox_shipment_invoice_id', 'tracking_outbox', ['shipment_invoice_id'])
+    # Dispatcher busca 'pending' vencidos por (status, next_attempt_at)
+    op.create_index('ix_tracking_outbox_status_next', 'tracking_outbox', ['status', 'next_attempt_at'])
+
+
+def downgrade():
+    op.drop_index('ix_tracking_outbox_status_next', table_name='tracking_outbox')
+    op.drop_index('ix_tracking_outbox_shipment_invoice_id', table_name='tracking_outbox')
+    op.drop_index('ix_tracking_outbox_id', table_name='tracking_outbox')
+    op.drop_table('tracking_outbox')
@@ -0,0 +1,30 @@
+"""attachment_blobs index for the content-addressed attachment store
+
+Revision ID: 0008_attachment_blobs
+Revises: 0007_tracking_outbox
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008_attachment_blobs'
+down_revision = '0007_tracking_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'attachment_blobs',
+        sa.Column('sha256', sa.String(length=64), primary_key=True),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('last_used_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+
+def downgrade():
+    op.drop_table('attachment_blobs')
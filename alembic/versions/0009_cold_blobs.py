@@ -0,0 +1,180 @@
+"""move xmls_b64 / prefat_base64 to compressed stored_blobs
+
+Revision ID: 0009_cold_blobs
+Revises: 0008_attachment_blobs
+Create Date: 2026-10-17 00:00:00.000000
+"""
+import base64
+import gzip
+import hashlib
+import struct
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0009_cold_blobs'
+down_revision = '0008_attachment_blobs'
+branch_labels = None
+depends_on = None
+
+# Mesmo formato de app.services.blob_service.pack_parts (tamanho de 4 bytes + bytes)
+_PART_HEADER = struct.Struct('>I')
+
+# Chave primária declarada para que inserted_primary_key devolva o id do blob
+stored_blobs = sa.Table(
+    'stored_blobs',
+    sa.MetaData(),
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('sha256', sa.String),
+    sa.Column('size', sa.BigInteger),
+    sa.Column('encoding', sa.String),
+    sa.Column('stored_size', sa.BigInteger),
+    sa.Column('data', sa.LargeBinary),
+    sa.Column('location', sa.String),
+)
+shipment_invoices = sa.table(
+    'shipment_invoices',
+    sa.column('id', sa.Integer),
+    sa.column('xmls_b64', sa.JSON),
+    sa.column('xmls_blob_id', sa.Integer),
+    sa.column('xmls_size', sa.BigInteger),
+    sa.column('xmls_sha256', sa.String),
+)
+prefats = sa.table(
+    'prefats',
+    sa.column('id', sa.Integer),
+    sa.column('prefat_base64', sa.Text),
+    sa.column('blob_id', sa.Integer),
+    sa.column('size', sa.BigInteger),
+    sa.column('sha256', sa.String),
+)
+
+
+def _insert_blob(bind, data: bytes):
+    compressed = gzip.compress(data, compresslevel=6)
+    sha256 = hashlib.sha256(data).hexdigest()
+    result = bind.execute(stored_blobs.insert().values(
+        sha256=sha256, size=len(data), encoding='gzip', stored_size=len(compressed), data=compressed,
+    ))
+    return result.inserted_primary_key[0], len(data), sha256
+
+
+def _read_blob(bind, blob_id):
+    row = bind.execute(
+        sa.select(stored_blobs.c.encoding, stored_blobs.c.data, stored_blobs.c.location)
+        .where(stored_blobs.c.id == blob_id)
+    ).first()
+    if row.location:
+        from pathlib import Path
+        from app.core.config import settings
+        compressed = (Path(settings.blob_dir) / row.location).read_bytes()
+    else:
+        compressed = row.data
+    if row.encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(compressed)
+    return gzip.decompress(compressed)
+
+
+def upgrade():
+    op.create_table(
+        'stored_blobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('encoding', sa.String(length=10), nullable=False),
+        sa.Column('stored_size', sa.BigInteger(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=True),
+        sa.Column('location', sa.String(length=255), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_stored_blobs_id', 'stored_blobs', ['id'])
+    op.create_index('ix_stored_blobs_sha256', 'stored_blobs', ['sha256'])
+
+    with op.batch_alter_table('shipment_invoices') as batch:
+        batch.add_column(sa.Column('xmls_blob_id', sa.Integer(), nullable=True))
+        batch.add_column(sa.Column('xmls_size', sa.BigInteger(), nullable=True))
+        batch.add_column(sa.Column('xmls_sha256', sa.String(length=64), nullable=True))
+        batch.create_foreign_key('fk_shipment_invoices_xmls_blob_id', 'stored_blobs', ['xmls_blob_id'], ['id'])
+    with op.batch_alter_table('prefats') as batch:
+        batch.add_column(sa.Column('blob_id', sa.Integer(), nullable=True))
+        batch.add_column(sa.Column('size', sa.BigInteger(), nullable=True))
+        batch.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+        batch.create_foreign_key('fk_prefats_blob_id', 'stored_blobs', ['blob_id'], ['id'])
+
+    # Move os dados existentes: base64 -> bytes originais comprimidos com gzip (camada "db")
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(shipment_invoices.c.id, shipment_invoices.c.xmls_b64)
+        .where(shipment_invoices.c.xmls_b64.isnot(None))
+    ).all()
+    for invoice_id, xmls_b64 in rows:
+        parts = [base64.b64decode(x) for x in (xmls_b64 or [])]
+        data = b''.join(_PART_HEADER.pack(len(part)) + part for part in parts)
+        blob_id, size, sha256 = _insert_blob(bind, data)
+        bind.execute(
+            shipment_invoices.update().where(shipment_invoices.c.id == invoice_id)
+            .values(xmls_blob_id=blob_id, xmls_size=size, xmls_sha256=sha256)
+        )
+
+    rows = bind.execute(sa.select(prefats.c.id, prefats.c.prefat_base64)).all()
+    for prefat_id, prefat_base64 in rows:
+        blob_id, size, sha256 = _insert_blob(bind, base64.b64decode(prefat_base64 or ''))
+        bind.execute(
+            prefats.update().where(prefats.c.id == prefat_id)
+            .values(blob_id=blob_id, size=size, sha256=sha256)
+        )
+
+    with op.batch_alter_table('shipment_invoices') as batch:
+        batch.drop_column('xmls_b64')
+    with op.batch_alter_table('prefats') as batch:
+        batch.alter_column('blob_id', existing_type=sa.Integer(), nullable=False)
+        batch.alter_column('size', existing_type=sa.BigInteger(), nullable=False)
+        batch.alter_column('sha256', existing_type=sa.String(length=64), nullable=False)
+        batch.drop_column('prefat_base64')
+
+
+def downgrade():
+    with op.batch_alter_table('shipment_invoices') as batch:
+        batch.add_column(sa.Column('xmls_b64', sa.JSON(), nullable=True))
+    with op.batch_alter_table('prefats') as batch:
+        batch.add_column(sa.Column('prefat_base64', sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(shipment_invoices.c.id, shipment_invoices.c.xmls_blob_id)
+        .where(shipment_invoices.c.xmls_blob_id.isnot(None))
+    ).all()
+    for invoice_id, blob_id in rows:
+        data, offset, xmls_b64 = _read_blob(bind, blob_id), 0, []
+        while offset < len(data):
+            (size,) = _PART_HEADER.unpack_from(data, offset)
+            offset += _PART_HEADER.size
+            xmls_b64.append(base64.b64encode(data[offset:offset + size]).decode())
+            offset += size
+        bind.execute(
+            shipment_invoices.update().where(shipment_invoices.c.id == invoice_id).values(xmls_b64=xmls_b64)
+        )
+
+    rows = bind.execute(sa.select(prefats.c.id, prefats.c.blob_id)).all()
+    for prefat_id, blob_id in rows:
+        bind.execute(
+            prefats.update().where(prefats.c.id == prefat_id)
+            .values(prefat_base64=base64.b64encode(_read_blob(bind, blob_id)).decode())
+        )
+
+    with op.batch_alter_table('prefats') as batch:
+        batch.alter_column('prefat_base64', existing_type=sa.Text(), nullable=False)
+        batch.drop_constraint('fk_prefats_blob_id', type_='foreignkey')
+        batch.drop_column('sha256')
+        batch.drop_column('size')
+        batch.drop_column('blob_id')
+    with op.batch_alter_table('shipment_invoices') as batch:
+        batch.drop_constraint('fk_shipment_invoices_xmls_blob_id', type_='foreignkey')
+        batch.drop_column('xmls_sha256')
+        batch.drop_column('xmls_size')
+        batch.drop_column('xmls_blob_id')
+    op.drop_index('ix_stored_blobs_sha256', table_name='stored_blobs')
+    op.drop_index('ix_stored_blobs_id', table_name='stored_blobs')
+    op.drop_table('stored_blobs')
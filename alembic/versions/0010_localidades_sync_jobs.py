@@ -0,0 +1,36 @@
+"""localidades_sync_jobs table for the background IBGE sync
+
+Revision ID: 0010_localidades_sync_jobs
+Revises: 0009_cold_blobs
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0010_localidades_sync_jobs'
+down_revision = '0009_cold_blobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'localidades_sync_jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('api_user', sa.String(length=150), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('phase', sa.String(length=20), nullable=True),
+        sa.Column('progress', sa.JSON(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index('ix_localidades_sync_jobs_id', 'localidades_sync_jobs', ['id'])
+
+
+def downgrade():
+    op.drop_index('ix_localidades_sync_jobs_id', table_name='localidades_sync_jobs')
+    op.drop_table('localidades_sync_jobs')
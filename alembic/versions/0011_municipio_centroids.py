@@ -0,0 +1,52 @@
+"""municipios centroid (latitude/longitude) and enclosing radius
+
+Revision ID: 0011_municipio_centroids
+Revises: 0010_localidades_sync_jobs
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0011_municipio_centroids'
+down_revision = '0010_localidades_sync_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('municipios') as batch:
+        batch.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch.add_column(sa.Column('raio_envolvente_km', sa.Float(), nullable=True))
+
+    conn = op.get_bind()
+    if conn.dialect.name != 'postgresql':
+        return
+    has_postgis = conn.execute(
+        sa.text("SELECT 1 FROM pg_extension WHERE extname = 'postgis' LIMIT 1")
+    ).fetchone() is not None
+    if not has_postgis:
+        return
+
+    # Geometrias já importadas: centróide e raio envolvente calculados na projeção
+    # policônica do Brasil (EPSG:5880, métrica), como na importação do shapefile
+    conn.execute(sa.text("""
+        UPDATE municipios m
+        SET latitude = ST_Y(ST_Transform(c.centroide, 4674)),
+            longitude = ST_X(ST_Transform(c.centroide, 4674)),
+            raio_envolvente_km = ST_MaxDistance(c.geom, c.centroide) / 1000.0
+        FROM (
+            SELECT codigo_ibge, g.geom, ST_Centroid(g.geom) AS centroide
+            FROM municipios, LATERAL (SELECT ST_Transform(geometria, 5880) AS geom) g
+            WHERE geometria IS NOT NULL
+        ) c
+        WHERE m.codigo_ibge = c.codigo_ibge
+    """))
+
+
+def downgrade():
+    with op.batch_alter_table('municipios') as batch:
+        batch.drop_column('raio_envolvente_km')
+        batch.drop_column('longitude')
+        batch.drop_column('latitude')
@@ -0,0 +1,65 @@
+"""municipios.geometria_simplificada and GiST indexes on the geometries
+
+Revision ID: 0012_municipio_geom_simplified
+Revises: 0011_municipio_centroids
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+from geoalchemy2 import Geometry
+
+# revision identifiers, used by Alembic.
+revision = '0012_municipio_geom_simplified'
+down_revision = '0011_municipio_centroids'
+branch_labels = None
+depends_on = None
+
+# Mesmo padrão de LOCALIDADES_SIMPLIFICACAO_M (metros, EPSG:3857)
+SIMPLIFICACAO_M = 100.0
+
+
+def _has_postgis(conn) -> bool:
+    if conn.dialect.name != 'postgresql':
+        return False
+    return conn.execute(
+        sa.text("SELECT 1 FROM pg_extension WHERE extname = 'postgis' LIMIT 1")
+    ).fetchone() is not None
+
+
+def upgrade():
+    conn = op.get_bind()
+    if not _has_postgis(conn):
+        # Sem PostGIS a geometria já é TEXT (0001); a coluna nova segue o mesmo fallback
+        with op.batch_alter_table('municipios') as batch:
+            batch.add_column(sa.Column('geometria_simplificada', sa.Text(), nullable=True))
+        return
+
+    # spatial_index=False: os índices GiST são criados abaixo, com IF NOT EXISTS
+    op.add_column('municipios', sa.Column(
+        'geometria_simplificada',
+        Geometry(geometry_type='MULTIPOLYGON', srid=3857, spatial_index=False),
+        nullable=True,
+    ))
+    conn.execute(sa.text(
+        "CREATE INDEX IF NOT EXISTS idx_municipios_geometria ON municipios USING GIST (geometria)"
+    ))
+    conn.execute(
+        sa.text("""
+            UPDATE municipios
+            SET geometria_simplificada = ST_Multi(ST_SimplifyPreserveTopology(geometria, :tolerancia))
+            WHERE geometria IS NOT NULL
+        """),
+        {"tolerancia": SIMPLIFICACAO_M},
+    )
+    conn.execute(sa.text(
+        "CREATE INDEX IF NOT EXISTS idx_municipios_geometria_simplificada "
+        "ON municipios USING GIST (geometria_simplificada)"
+    ))
+    conn.execute(sa.text("ANALYZE municipios"))
+
+
+def downgrade():
+    # idx_municipios_geometria fica: pode ter sido criado pelo geoalchemy2 antes desta revisão.
+    # O índice da coluna simplificada cai junto com ela.
+    with op.batch_alter_table('municipios') as batch:
+        batch.drop_column('geometria_simplificada')
@@ -0,0 +1,30 @@
+"""emissao_idempotency_keys: pending reservations (nullable response, reserved_at)
+
+Revision ID: 0013_idempotency_reservation
+Revises: 0012_municipio_geom_simplified
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0013_idempotency_reservation'
+down_revision = '0012_municipio_geom_simplified'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('emissao_idempotency_keys') as batch:
+        batch.add_column(sa.Column('reserved_at', sa.DateTime(timezone=True), nullable=True))
+        batch.alter_column('status_code', existing_type=sa.Integer(), nullable=True)
+        batch.alter_column('response', existing_type=sa.JSON(), nullable=True)
+
+
+def downgrade():
+    # Reservas sem resposta não têm o que voltar a NOT NULL
+    op.execute("DELETE FROM emissao_idempotency_keys WHERE status_code IS NULL OR response IS NULL")
+    with op.batch_alter_table('emissao_idempotency_keys') as batch:
+        batch.alter_column('response', existing_type=sa.JSON(), nullable=False)
+        batch.alter_column('status_code', existing_type=sa.Integer(), nullable=False)
+        batch.drop_column('reserved_at')
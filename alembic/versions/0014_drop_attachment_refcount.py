@@ -0,0 +1,25 @@
+"""attachment_blobs: drop ref_count (no reference is ever released)
+
+Revision ID: 0014_drop_attachment_refcount
+Revises: 0013_idempotency_reservation
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0014_drop_attachment_refcount'
+down_revision = '0013_idempotency_reservation'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('attachment_blobs') as batch:
+        batch.drop_column('ref_count')
+
+
+def downgrade():
+    # As contagens nunca foram decrementadas; 1 mantém todos os arquivos referenciados
+    with op.batch_alter_table('attachment_blobs') as batch:
+        batch.add_column(sa.Column('ref_count', sa.Integer(), nullable=False, server_default='1'))
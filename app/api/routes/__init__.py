@@ -12,4 +12,6 @@ _include("auth", "", ["autenticacao"])
 _include("emissao", "", ["emissao"])
 _include("cargas", "", ["cargas"])
 _include("prefat", "", ["prefat"])
-_include("localidades", "", ["localidades"])
\ No newline at end of file
+_include("localidades", "", ["localidades"])
+_include("metrics", "", ["metricas"])
+_include("attachments", "", ["anexos"])
@@ -0,0 +1,67 @@
+import asyncio
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+
+from app.api.deps.security import is_front
+from app.config.settings import ATTACHMENT_X_ACCEL_PREFIX
+from app.services.attachments_service import AttachmentService
+
+router = APIRouter(prefix="/attachments", dependencies=[Depends(is_front)])
+
+_SHA256_NAME = re.compile(r"^[0-9a-f]{64}$")
+# Um nome de arquivo nunca é regravado com outro conteúdo (uuid ou SHA-256). "private":
+# comprovantes de entrega têm dados pessoais e não podem ficar em caches compartilhados
+_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def _etag(path, stat_result: os.stat_result) -> str:
+    """SHA-256 do conteúdo para anexos cas (ETag forte); senão mtime + tamanho."""
+    stem = path.name.split(".", 1)[0]
+    if _SHA256_NAME.match(stem):
+        return f'"{stem}"'
+    return f'"{int(stat_result.st_mtime_ns):x}-{stat_result.st_size:x}"'
+
+
+def _not_modified(request: Request, etag: str, stat_result: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in tags or "*" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@router.get("/{filename}")
+async def baixar_anexo(filename: str, request: Request):
+    """Serve um anexo salvo, com Range, ETag e Last-Modified (304 para revalidações)."""
+    path = AttachmentService().resolve_path(filename)
+    if path is None or path.name != filename or filename.startswith("."):
+        raise HTTPException(404, "Anexo não encontrado")
+
+    stat_result = await asyncio.to_thread(os.stat, path)
+    headers = {
+        "etag": _etag(path, stat_result),
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "cache-control": _CACHE_CONTROL,
+    }
+
+    if _not_modified(request, headers["etag"], stat_result):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if ATTACHMENT_X_ACCEL_PREFIX:
+        # nginx assume o envio (sendfile, Range) a partir do location interno
+        headers["x-accel-redirect"] = f"{ATTACHMENT_X_ACCEL_PREFIX.rstrip('/')}/{filename}"
+        return Response(headers=headers, media_type=media_type)
+
+    return FileResponse(path, media_type=media_type, headers=headers, stat_result=stat_result)
@@ -1,17 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, status
-from sqlalchemy import select
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form, Query, Response, status
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, load_only
 from app.db import get_db
 from app.models.shipment import Shipment, ShipmentInvoice
 from app.services.constants import VALID_CODES, VALID_CODES_SET
 from app.api.deps.security import is_front, is_front_admin
-from typing import List, Optional
+from typing import Annotated, List, Optional
 from fastapi import Request
 from loguru import logger
 import json
-from app.schemas.shipment import ShipmentListRead, ShipmentDetailRead, ShipmentStatusResponse, UploadXmlResponse
-from app.utils.shipment_serializers import shipment_to_read
+from app.schemas.shipment import (
+    ShipmentListRead,
+    ShipmentDetailRead,
+    ShipmentStatsRead,
+    ShipmentStatusBatchRequest,
+    ShipmentStatusResponse,
+    StatusCountOut,
+    UploadXmlResponse,
+)
+from app.utils.shipment_serializers import shipment_to_read, SHIPMENT_LIST_COLUMNS, INVOICE_LIST_COLUMNS
 from app.services.shipment_status_service import ShipmentStatusService
 from app.services.shipment_xml_service import ShipmentXmlService
 
@@ -19,16 +28,92 @@ router = APIRouter(prefix="/cargas")
 
 
 @router.get("/", response_model=List[ShipmentListRead])
-async def listar_cargas(current_user: str = Depends(is_front), db: AsyncSession = Depends(get_db)):
+async def listar_cargas(
+    response: Response,
+    after_id: Annotated[Optional[int], Query(ge=0, description="Cursor: retorna cargas com id maior que este")] = None,
+    limit: Annotated[int, Query(ge=1, le=500)] = 100,
+    status_code: Annotated[Optional[str], Query(description="Código de status (ex.: '10')")] = None,
+    rem_nDoc: Annotated[Optional[str], Query()] = None,
+    dest_uf: Annotated[Optional[str], Query(min_length=2, max_length=2)] = None,
+    integration_date_from: Annotated[Optional[datetime], Query()] = None,
+    integration_date_to: Annotated[Optional[datetime], Query()] = None,
+    access_key: Annotated[Optional[str], Query(description="Chave de acesso de alguma nota da carga")] = None,
+    current_user: str = Depends(is_front),
+    db: AsyncSession = Depends(get_db),
+):
+    """Lista cargas paginadas por id (keyset). O cursor da próxima página vem no header X-Next-After-Id."""
+
+    q = (
+        select(Shipment)
+        .options(
+            load_only(*SHIPMENT_LIST_COLUMNS),
+            selectinload(Shipment.invoices).load_only(*INVOICE_LIST_COLUMNS),
+        )
+        .order_by(Shipment.id)
+        .limit(limit)
+    )
+    if after_id is not None:
+        q = q.where(Shipment.id > after_id)
+    if status_code:
+        q = q.where(Shipment.status_code == status_code)
+    if rem_nDoc:
+        q = q.where(Shipment.rem_nDoc == rem_nDoc)
+    if dest_uf:
+        q = q.where(Shipment.dest_uf == dest_uf.upper())
+    if integration_date_from:
+        q = q.where(Shipment.integration_date >= integration_date_from)
+    if integration_date_to:
+        q = q.where(Shipment.integration_date <= integration_date_to)
+    if access_key:
+        q = q.where(
+            Shipment.id.in_(select(ShipmentInvoice.shipment_id).where(ShipmentInvoice.access_key == access_key))
+        )
 
-    q = select(Shipment).options(selectinload(Shipment.invoices))
     res = await db.execute(q)
     cargas = res.scalars().all()
 
+    if len(cargas) == limit:
+        response.headers["X-Next-After-Id"] = str(cargas[-1].id)
+
     serialized = [shipment_to_read(c, include_locations=False) for c in cargas]
     return serialized
 
 
+@router.get("/stats", response_model=ShipmentStatsRead)
+async def estatisticas_cargas(
+    status_type: Annotated[Optional[str], Query(description="Categoria de status (ex.: 'PENDENCIA')")] = None,
+    current_user: str = Depends(is_front),
+    db: AsyncSession = Depends(get_db),
+):
+    """Contadores de cargas por categoria/código de status, agregados pelo índice (status_type, status_code)."""
+
+    q = (
+        select(Shipment.status_type, Shipment.status_code, func.count())
+        .group_by(Shipment.status_type, Shipment.status_code)
+    )
+    if status_type:
+        q = q.where(Shipment.status_type == status_type)
+
+    res = await db.execute(q)
+
+    total = 0
+    por_categoria: dict[str, int] = {}
+    por_codigo: list[StatusCountOut] = []
+    for tipo, codigo, count in res.all():
+        total += count
+        if tipo is not None:
+            por_categoria[tipo] = por_categoria.get(tipo, 0) + count
+        por_codigo.append(StatusCountOut(
+            codigo=codigo,
+            descricao=VALID_CODES.get(codigo, {}).get("message"),
+            categoria=tipo,
+            total=count,
+        ))
+    por_codigo.sort(key=lambda item: (-item.total, item.codigo))
+
+    return ShipmentStatsRead(total=total, por_categoria=por_categoria, por_codigo=por_codigo)
+
+
 @router.get("/{carga_id}", response_model=ShipmentDetailRead)
 async def obter_carga(carga_id: int,  current_user: str = Depends(is_front), db: AsyncSession = Depends(get_db)):
     q = select(Shipment).where(Shipment.id == carga_id).options(selectinload(Shipment.invoices))
@@ -42,6 +127,17 @@ async def obter_carga(carga_id: int,  current_user: str = Depends(is_front), db:
 
     return shipment_to_read(carga, include_locations=True)
 
+@router.post("/status:batch", response_model=ShipmentStatusResponse)
+async def alterar_status_lote(
+    payload: ShipmentStatusBatchRequest,
+    current_user: str = Depends(is_front_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Aplica o mesmo código de status a várias notas (resultado por nota)."""
+    service = ShipmentStatusService()
+    return await service.change_status_batch(db=db, payload=payload)
+
+
 @router.post("/{carga_id}/status", response_model=ShipmentStatusResponse)
 async def alterar_status(
     carga_id: int,
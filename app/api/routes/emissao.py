@@ -1,19 +1,22 @@
 """Endpoint de emissão de minutas (Notfis).
 
 Este módulo contém o handler HTTP que recebe payloads Notfis e delega
-o processamento ao EmissaoService.
+o processamento ao EmissaoService (ou à fila de jobs, com async=1).
 """
 
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
-from app.db import get_db
+from app.db import get_db, AsyncSessionLocal, ensure_db_initialized
 from app.schemas.notfis import NotfisPayload
-from app.schemas.emissao import EmissaoResponse
+from app.schemas.emissao import EmissaoResponse, EmissaoJobRead
 from app.api.deps.security import is_api_user
-from app.services.emissao_service import EmissaoService
+from app.services.emissao_service import EmissaoService, MODOS_EMISSAO
+from app.services.emissao_job_service import EmissaoJobService
 
 
 router = APIRouter()
@@ -22,10 +25,23 @@ router = APIRouter()
 @router.post("/emissao", response_model=EmissaoResponse)
 async def receive_emission(
     payload: NotfisPayload,
+    modo: Optional[str] = Query(None, description="Modo de gravação: 'serial', 'bulk' ou 'concurrent' (padrão: EMISSAO_MODO)"),
+    async_: bool = Query(False, alias="async", description="Enfileira o lote e responde 202 com o ID do job"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     current_user: str = Depends(is_api_user),
     db: AsyncSession = Depends(get_db)
 ):
     
+    if modo and modo.lower() not in MODOS_EMISSAO:
+        return JSONResponse(
+            status_code=400,
+            content={
+                "message": "Falha ao processar solicitação",
+                "status": 0,
+                "data": [{"status": 0, "message": f"Modo inválido: {modo}", "id": None}]
+            }
+        )
+    
     # Validação de payload vazio
     if not payload.documentos:
         logger.warning("/emissao called with empty documentos by user=%s", current_user)
@@ -38,19 +54,57 @@ async def receive_emission(
             }
         )
     
+    reserved = False
     try:
-        # Delegar processamento ao service
         service = EmissaoService(db)
-        result = await service.process_payload(payload, current_user)
+        
+        # Reserva o Idempotency-Key antes de processar: um reenvio devolve a resposta
+        # original e uma requisição simultânea com a mesma chave recebe 409
+        if idempotency_key:
+            stored = await service.reserve_idempotency_key(idempotency_key, current_user)
+            if stored is not None and stored.status_code is not None:
+                logger.info("/emissao replay for Idempotency-Key=%s user=%s", idempotency_key, current_user)
+                return JSONResponse(
+                    status_code=stored.status_code,
+                    content=stored.response,
+                    headers={"Idempotent-Replayed": "true"}
+                )
+            if stored is not None:
+                logger.info("/emissao Idempotency-Key=%s user=%s still in progress", idempotency_key, current_user)
+                return JSONResponse(
+                    status_code=409,
+                    content={
+                        "message": "Requisição com este Idempotency-Key ainda em processamento",
+                        "status": 0,
+                        "data": [{"status": 0, "message": "Requisição com este Idempotency-Key ainda em processamento", "id": None}]
+                    }
+                )
+            reserved = True
+        
+        if async_:
+            # Aceita e enfileira: o worker processa e o cliente acompanha em /emissao/jobs/{id}
+            job = await EmissaoJobService.enqueue(db, payload, current_user, modo=modo)
+            status_code = 202
+            content = EmissaoJobService.to_read(job).model_dump(mode="json")
+        else:
+            # Delegar processamento ao service
+            result = await service.process_payload(payload, current_user, modo=modo)
+            status_code = result.get_http_status()
+            content = result.model_dump()
+        
+        if idempotency_key:
+            await service.store_idempotent_response(idempotency_key, current_user, status_code, content)
         
         # Retornar com status HTTP apropriado
         return JSONResponse(
-            status_code=result.get_http_status(),
-            content=result.model_dump()
+            status_code=status_code,
+            content=content
         )
         
     except Exception as e:
         logger.exception("Unhandled error in /emissao handler: %s", e)
+        if reserved:
+            await EmissaoService(db).release_idempotency_key(idempotency_key, current_user)
         return JSONResponse(
             status_code=500,
             content={
@@ -59,3 +113,44 @@ async def receive_emission(
                 "data": [{"status": 0, "message": "Erro interno do servidor", "id": None}]
             }
         )
+
+
+@router.post("/emissao/stream")
+async def receive_emission_stream(
+    request: Request,
+    current_user: str = Depends(is_api_user),
+):
+    """Recebe minutas em NDJSON (uma MinutaStructure por linha) e responde um MinutaResult por linha.
+
+    Cada minuta é validada e persistida assim que sua linha chega, sem carregar o lote inteiro.
+    """
+
+    async def results():
+        # Sessão própria: o stream continua depois que as dependências da rota já terminaram
+        await ensure_db_initialized()
+        async with AsyncSessionLocal() as db:
+            service = EmissaoService(db)
+            async for result in service.process_stream(request.stream(), current_user):
+                yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.get("/emissao/jobs/{job_id}", response_model=EmissaoJobRead)
+async def get_emission_job(
+    job_id: int,
+    current_user: str = Depends(is_api_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Progresso e resultado final de um lote enviado com /emissao?async=1."""
+    job = await EmissaoJobService.get_job(db, job_id, current_user)
+    if job is None:
+        return JSONResponse(
+            status_code=404,
+            content={
+                "message": "Job não encontrado",
+                "status": 0,
+                "data": [{"status": 0, "message": "Job não encontrado", "id": job_id}]
+            }
+        )
+    return EmissaoJobService.to_read(job)
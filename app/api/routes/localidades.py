@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_db
-from app.schemas.localidade import EstadoRead, MunicipioRead
+from app.schemas.localidade import EstadoRead, MunicipioRead, LocalidadesSyncJobRead
 from app.services.localidades_service import LocalidadesService
+from app.services.localidades_sync_service import LocalidadesSyncService, SyncAlreadyRunning
 from app.api.deps.security import is_api_user
 
 router = APIRouter(dependencies=[Depends(is_api_user)])
@@ -33,12 +36,19 @@ async def obter_municipio(codigo_ibge: int, db: AsyncSession = Depends(get_db)):
     return muni
 
 @router.get("/municipios/{codigo_ibge}/raio", response_model=list[MunicipioRead])
-async def municipios_por_raio(codigo_ibge: int, raio: float, db: AsyncSession = Depends(get_db)):
+async def municipios_por_raio(
+    codigo_ibge: int,
+    raio: float,
+    refinar: Annotated[Optional[bool], Query(description="Testa os candidatos pelos polígonos (requer PostGIS)")] = None,
+    db: AsyncSession = Depends(get_db),
+):
     """
     Retorna municípios dentro de um raio (em km) a partir de um município base.
+
+    Por padrão compara os centróides dos municípios (índice em memória, sem PostGIS).
     """
     try:
-        municipios = await LocalidadesService.get_municipios_por_raio(db, codigo_ibge, raio)
+        municipios = await LocalidadesService.get_municipios_por_raio(db, codigo_ibge, raio, refinar=refinar)
     except LocalidadesService.PostGisUnavailableError as e:
         # Spatial functionality not available; return 501 with a clear message
         raise HTTPException(status_code=501, detail=str(e))
@@ -49,8 +59,26 @@ async def municipios_por_raio(codigo_ibge: int, raio: float, db: AsyncSession =
     return municipios
 
 
-@router.post("/sincronizar")
-async def sincronizar(db: AsyncSession = Depends(get_db), current_user: dict = Depends(is_api_user)):
-    """Sincroniza localidades com IBGE (requer admin)"""
-    await LocalidadesService.sincronizar_com_ibge(db)
-    return {"status": "ok", "mensagem": "Localidades atualizadas com IBGE"}
\ No newline at end of file
+@router.post("/sincronizar", status_code=202, response_model=LocalidadesSyncJobRead)
+async def sincronizar(
+    forcar: Annotated[bool, Query(description="Sincroniza mesmo se o snapshot de localidades não mudou")] = False,
+    current_user: str = Depends(is_api_user),
+):
+    """Inicia a sincronização com o IBGE em background (ou retoma a que falhou).
+
+    Acompanhe em GET /sincronizar/{job_id}; responde 409 se já há uma sincronização em andamento.
+    """
+    try:
+        job = await LocalidadesSyncService().start(current_user, forcar=forcar)
+    except SyncAlreadyRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return LocalidadesSyncService.to_read(job)
+
+
+@router.get("/sincronizar/{job_id}", response_model=LocalidadesSyncJobRead)
+async def status_sincronizacao(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Fase atual, resultado de cada fase concluída e erro de uma sincronização."""
+    job = await LocalidadesSyncService.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(404, "Sincronização não encontrada")
+    return LocalidadesSyncService.to_read(job)
\ No newline at end of file
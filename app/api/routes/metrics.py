@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.deps.security import is_front_admin
+from app.db import get_db
+from app.http_clients import http_clients
+from app.services.tracking_outbox_service import TrackingOutboxService
+
+router = APIRouter(prefix="/metrics", dependencies=[Depends(is_front_admin)])
+
+
+@router.get("/http-clients")
+async def metricas_http_clients():
+    """Requisições, conexões novas e taxa de reuso de conexão de cada cliente HTTP compartilhado"""
+    return http_clients.stats()
+
+
+@router.get("/tracking-outbox")
+async def metricas_tracking_outbox(db: AsyncSession = Depends(get_db)):
+    """Eventos de tracking por status no outbox (pending, sending, sent, dead)"""
+    return await TrackingOutboxService.stats(db)
@@ -1,27 +1,39 @@
-from fastapi import APIRouter, Depends
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.db import get_db
 from app.models.prefat import Prefat
 from app.api.deps.security import is_api_user
 from app.schemas.prefat import PrefatRequest
+from app.services.blob_service import BlobService
 import base64
 import httpx
 
 router = APIRouter()
 
 @router.get("/prefat")
-async def get_prefat(db: AsyncSession = Depends(get_db), current_user: str = Depends(is_api_user)):
+async def get_prefat(
+    incluir_arquivo: Annotated[bool, Query(description="False omite prefat_base64 (não lê os arquivos)")] = True,
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(is_api_user),
+):
     q = select(Prefat)
     res = await db.execute(q)
     prefats = res.scalars().all()
+    files = await BlobService().prefat_files(db, prefats) if incluir_arquivo else {}
 
     def serialize(p):
-        return {
+        data = {
             "id": p.id,
-            "prefat_base64": p.prefat_base64,
+            "size": p.size,
+            "sha256": p.sha256,
             "created_at": p.created_at.isoformat()
         }
+        if incluir_arquivo:
+            data["prefat_base64"] = base64.b64encode(files.get(p.id, b"")).decode('utf-8')
+        return data
 
     return [serialize(p) for p in prefats]
 
@@ -31,9 +43,12 @@ async def get_prefat_by_id(prefat_id: int, db: AsyncSession = Depends(get_db), c
     if not prefat:
         return {"error": "Prefat not found"}
 
+    files = await BlobService().prefat_files(db, [prefat])
     return {
         "id": prefat.id,
-        "prefat_base64": prefat.prefat_base64,
+        "prefat_base64": base64.b64encode(files.get(prefat.id, b"")).decode('utf-8'),
+        "size": prefat.size,
+        "sha256": prefat.sha256,
         "created_at": prefat.created_at.isoformat()
     }
 
@@ -67,13 +82,9 @@ async def create_prefat(
             
             file_content = response.content
 
-        encoded_string = base64.b64encode(file_content).decode('utf-8')
-
+        new_prefat = Prefat()
+        await BlobService().set_prefat_file(db, new_prefat, file_content)
 
-        new_prefat = Prefat(
-            prefat_base64=encoded_string
-        )
-        
         db.add(new_prefat)
         await db.commit()
         await db.refresh(new_prefat)
@@ -12,3 +12,17 @@ FERNET_KEY = os.getenv("FERNET_KEY")
 # Attachment storage settings
 ATTACHMENTS_DIR = os.getenv("ATTACHMENTS_DIR", "attachments")
 ATTACHMENT_BASE_URL = os.getenv("ATTACHMENT_BASE_URL", "/attachments")
+# Tamanho do bloco (bytes) na cópia de uploads para o disco e na geração do base64
+ATTACHMENT_CHUNK_SIZE = int(os.getenv("ATTACHMENT_CHUNK_SIZE", 1024 * 1024))
+# "cas": arquivos nomeados pelo SHA-256, gravados uma vez e indexados em attachment_blobs;
+# "uuid": um arquivo novo por anexo (comportamento antigo)
+ATTACHMENT_STORE = os.getenv("ATTACHMENT_STORE", "cas")
+# Download de anexos por URL: downloads simultâneos, tamanho máximo (bytes), timeout (s)
+# e quantidade de URLs lembradas (URL + ETag) para evitar baixar de novo o mesmo arquivo
+ATTACHMENT_FETCH_CONCURRENCY = int(os.getenv("ATTACHMENT_FETCH_CONCURRENCY", 8))
+ATTACHMENT_FETCH_MAX_BYTES = int(os.getenv("ATTACHMENT_FETCH_MAX_BYTES", 25 * 1024 * 1024))
+ATTACHMENT_FETCH_TIMEOUT = float(os.getenv("ATTACHMENT_FETCH_TIMEOUT", 30))
+ATTACHMENT_FETCH_CACHE_SIZE = int(os.getenv("ATTACHMENT_FETCH_CACHE_SIZE", 1024))
+# Atrás de um nginx com "internal" location para ATTACHMENTS_DIR, GET /attachments/{nome}
+# responde só com X-Accel-Redirect (prefixo informado aqui) e o nginx envia o arquivo via sendfile
+ATTACHMENT_X_ACCEL_PREFIX = os.getenv("ATTACHMENT_X_ACCEL_PREFIX", "")
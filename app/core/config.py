@@ -18,5 +18,64 @@ class Settings(BaseSettings):
     api_users: list[str] = Field(default=["integracao_logistica", "09098221000380"], env="API_USERS")
     front_users: list[str] = Field(default=["integracao_logistica", "SBF"], env="FRONT_USERS")
     front_admin_users: list[str] = Field(default=["integracao_logistica"], env="FRONT_ADMIN_USERS")
+    # Modo padrão do /emissao: "serial" (uma transação por minuta), "bulk" (INSERT em lote)
+    # ou "concurrent" (minutas distribuídas entre workers, cada um com sua sessão)
+    emissao_modo: str = Field(default="serial", env="EMISSAO_MODO")
+    # Workers do modo concurrent; 0 usa o tamanho do pool do engine (e nunca passa dele)
+    emissao_concorrencia: int = Field(default=0, env="EMISSAO_CONCORRENCIA")
+    # Payload bruto de cada minuta: "text" (em shipments.raw_payload), "gzip" ou "zstd"
+    # (comprimido na tabela shipment_raw_payloads) ou "off" (não guarda)
+    emissao_raw_payload: str = Field(default="text", env="EMISSAO_RAW_PAYLOAD")
+    # Linha de auditoria por minuta recebida: "full" (payload completo), "summary"
+    # (nDocEmit, quantidade de notas e tamanho) ou "off"
+    emissao_audit_log: str = Field(default="summary", env="EMISSAO_AUDIT_LOG")
+    # Workers da fila do /emissao?async=1 neste processo (0 desliga; outro processo pode consumir a fila)
+    emissao_job_workers: int = Field(default=2, env="EMISSAO_JOB_WORKERS")
+    # Intervalo (s) entre consultas à fila quando não há job pendente
+    emissao_job_poll_interval: float = Field(default=1.0, env="EMISSAO_JOB_POLL_INTERVAL")
+    # Minutas processadas entre cada atualização de progresso do job
+    emissao_job_chunk: int = Field(default=100, env="EMISSAO_JOB_CHUNK")
+    # Job em "running" há mais que isso (s) é considerado abandonado e volta a ser consumido
+    emissao_job_stale_seconds: int = Field(default=900, env="EMISSAO_JOB_STALE_SECONDS")
+    # Idempotency-Key reservado há mais que isso (s) sem resposta é de uma requisição que morreu
+    emissao_idempotency_stale_seconds: int = Field(default=900, env="EMISSAO_IDEMPOTENCY_STALE_SECONDS")
+    # Clientes HTTP compartilhados (app/http_clients.py); os limites valem por cliente, não por host
+    http_timeout: float = Field(default=10.0, env="HTTP_TIMEOUT")
+    http_max_connections: int = Field(default=20, env="HTTP_MAX_CONNECTIONS")
+    http_max_keepalive_connections: int = Field(default=10, env="HTTP_MAX_KEEPALIVE_CONNECTIONS")
+    http_keepalive_expiry: float = Field(default=30.0, env="HTTP_KEEPALIVE_EXPIRY")
+    # HTTP/2 requer o pacote opcional 'h2' (httpx[http2]); sem ele os clientes usam HTTP/1.1
+    http_http2: bool = Field(default=True, env="HTTP_HTTP2")
+    # Token de login da Brudam: validade usada quando o token não é um JWT com "exp",
+    # e antecedência (s) com que ele é renovado em background
+    brudam_token_ttl: int = Field(default=1800, env="BRUDAM_TOKEN_TTL")
+    brudam_token_refresh_margin: int = Field(default=120, env="BRUDAM_TOKEN_REFRESH_MARGIN")
+    # Outbox de tracking: dispatcher neste processo (False desliga; outro processo pode consumir)
+    tracking_outbox_dispatcher: bool = Field(default=True, env="TRACKING_OUTBOX_DISPATCHER")
+    # Envios simultâneos à Brudam e eventos reservados por rodada
+    tracking_outbox_concurrency: int = Field(default=4, env="TRACKING_OUTBOX_CONCURRENCY")
+    tracking_outbox_batch: int = Field(default=20, env="TRACKING_OUTBOX_BATCH")
+    tracking_outbox_poll_interval: float = Field(default=1.0, env="TRACKING_OUTBOX_POLL_INTERVAL")
+    # Backoff exponencial entre tentativas (s) e tentativas antes de ir para "dead"
+    tracking_outbox_backoff_base: float = Field(default=5.0, env="TRACKING_OUTBOX_BACKOFF_BASE")
+    tracking_outbox_backoff_max: float = Field(default=3600.0, env="TRACKING_OUTBOX_BACKOFF_MAX")
+    tracking_outbox_max_attempts: int = Field(default=8, env="TRACKING_OUTBOX_MAX_ATTEMPTS")
+    # Evento em "sending" há mais que isso (s) é considerado abandonado e volta à fila
+    tracking_outbox_stale_seconds: int = Field(default=300, env="TRACKING_OUTBOX_STALE_SECONDS")
+    # Blobs frios (XMLs de CT-e, arquivos PROCEDA do prefat): comprimidos com "gzip" ou "zstd"
+    # e guardados na tabela stored_blobs ("db") ou em arquivos em BLOB_DIR ("fs")
+    blob_storage: str = Field(default="db", env="BLOB_STORAGE")
+    blob_dir: str = Field(default=str(BASE_DIR.parent / "blobs"), env="BLOB_DIR")
+    blob_encoding: str = Field(default="gzip", env="BLOB_ENCODING")
+    # Fonte da sincronização de localidades: "ibge" (API), "arquivo" (LOCALIDADES_ARQUIVO,
+    # JSON ou CSV) ou "snapshot" (LOCALIDADES_SNAPSHOT_URL, em cache em LOCALIDADES_CACHE_DIR)
+    localidades_fonte: str = Field(default="ibge", env="LOCALIDADES_FONTE")
+    localidades_arquivo: str = Field(default=str(BASE_DIR.parent / "dados_geo" / "localidades.json"), env="LOCALIDADES_ARQUIVO")
+    localidades_snapshot_url: str = Field(default="", env="LOCALIDADES_SNAPSHOT_URL")
+    localidades_cache_dir: str = Field(default=str(BASE_DIR.parent / "dados_geo" / "cache"), env="LOCALIDADES_CACHE_DIR")
+    # Consulta por raio: True refina os candidatos do índice de centróides pelos polígonos (requer PostGIS)
+    localidades_raio_refinar: bool = Field(default=False, env="LOCALIDADES_RAIO_REFINAR")
+    # Tolerância (metros, EPSG:3857) da geometria simplificada gerada na importação do shapefile
+    localidades_simplificacao_m: float = Field(default=100.0, env="LOCALIDADES_SIMPLIFICACAO_M")
 
 settings = Settings()
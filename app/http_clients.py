@@ -0,0 +1,119 @@
+"""Clientes HTTP compartilhados pela aplicação.
+
+Um httpx.AsyncClient por upstream (ex.: "brudam"), criado no lifespan e
+reutilizado por todos os serviços, para que as conexões TCP/TLS fiquem no
+pool (keep-alive, HTTP/2 quando o pacote 'h2' está instalado) em vez de
+um handshake novo a cada troca de status. Os limites do pool valem por
+cliente (httpx.Limits), não por host: o cliente "brudam" fala com um único
+host, mas o de anexos divide o mesmo pool entre todas as URLs que baixa.
+"""
+
+import importlib.util
+from typing import Optional
+
+import httpx
+from loguru import logger
+
+from app.core.config import settings
+
+BRUDAM = "brudam"
+
+
+class ConnectionStats:
+    """Contadores de requisições e de conexões novas de um cliente."""
+
+    __slots__ = ("requests", "new_connections")
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+
+    @property
+    def reuse_ratio(self) -> Optional[float]:
+        """Fração das requisições atendidas por uma conexão já aberta."""
+        if not self.requests:
+            return None
+        return max(0.0, 1 - self.new_connections / self.requests)
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reuse_ratio": self.reuse_ratio,
+        }
+
+
+class HttpClientRegistry:
+    """Registro de clientes httpx nomeados, com métricas de reuso de conexão."""
+
+    def __init__(self):
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._stats: dict[str, ConnectionStats] = {}
+
+    def get(self, name: str = BRUDAM) -> httpx.AsyncClient:
+        """Devolve o cliente compartilhado, criando-o se ainda não existe (ex.: fora do lifespan)."""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name)
+        return client
+
+    def stats(self) -> dict:
+        """Métricas por cliente: requisições, conexões abertas e taxa de reuso."""
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    async def aclose(self) -> None:
+        """Fecha todos os clientes (shutdown da aplicação)."""
+        for name, client in list(self._clients.items()):
+            await client.aclose()
+            stats = self._stats.get(name)
+            if stats is not None and stats.requests:
+                logger.info("HTTP client %s closed: %d requests, %d new connections (reuse %.2f)",
+                            name, stats.requests, stats.new_connections, stats.reuse_ratio)
+        self._clients.clear()
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        stats = self._stats.setdefault(name, ConnectionStats())
+
+        async def trace(event: str, info: dict) -> None:
+            # Emitido pelo httpcore apenas quando uma conexão nova é aberta
+            if event == "connection.connect_tcp.complete":
+                stats.new_connections += 1
+
+        async def on_request(request: httpx.Request) -> None:
+            stats.requests += 1
+            request.extensions.setdefault("trace", trace)
+
+        http2 = settings.http_http2 and _h2_available()
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        )
+        logger.info("HTTP client %s created (http2=%s, max_connections=%d)", name, http2, settings.http_max_connections)
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=limits,
+            timeout=settings.http_timeout,
+            event_hooks={"request": [on_request]},
+        )
+
+
+_warned_h2_missing = False
+
+
+def _h2_available() -> bool:
+    global _warned_h2_missing
+    if importlib.util.find_spec("h2") is not None:
+        return True
+    if not _warned_h2_missing:
+        logger.warning("h2 is not installed, shared HTTP clients will use HTTP/1.1")
+        _warned_h2_missing = True
+    return False
+
+
+http_clients = HttpClientRegistry()
+
+
+def get_http_client(name: str = BRUDAM) -> httpx.AsyncClient:
+    """Atalho para http_clients.get(name)."""
+    return http_clients.get(name)
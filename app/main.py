@@ -5,7 +5,7 @@ from fastapi.exceptions import RequestValidationError
 import logging
 from json import JSONDecodeError
 from app.api.routes import router
-from app.db import engine, Base
+from app.db import engine, Base, AsyncSessionLocal
 
 # Configure Loguru-based logging
 from app.logging import configure_logging
@@ -25,8 +25,40 @@ async def lifespan(app: FastAPI):
         except Exception:
             pass
 
+    # Pré-carrega o cache de municípios usado no enriquecimento das minutas
+    from app.services.localidades_service import LocalidadesService
+    async with AsyncSessionLocal() as db:
+        await LocalidadesService.carregar_cache_municipios(db)
+        # Centróides da consulta por raio (GET /municipios/{codigo}/raio)
+        await LocalidadesService.carregar_indice_raio(db)
+
+    # Workers da fila do /emissao?async=1
+    from app.core.config import settings
+    from app.services.emissao_job_service import EmissaoJobWorker
+    job_worker = None
+    if settings.emissao_job_workers > 0:
+        job_worker = EmissaoJobWorker()
+        job_worker.start()
+
+    # Pool HTTP compartilhado pelos serviços que falam com a Brudam
+    from app.http_clients import http_clients, BRUDAM
+    http_clients.get(BRUDAM)
+
+    # Entrega dos eventos de tracking gravados no outbox
+    from app.services.tracking_outbox_service import TrackingOutboxDispatcher
+    outbox_dispatcher = None
+    if settings.tracking_outbox_dispatcher:
+        outbox_dispatcher = TrackingOutboxDispatcher()
+        outbox_dispatcher.start()
+
     yield
 
+    if outbox_dispatcher is not None:
+        await outbox_dispatcher.stop()
+    if job_worker is not None:
+        await job_worker.stop()
+    await http_clients.aclose()
+
 app = FastAPI(title="Integração Nike Store - Notfis/JSON", lifespan=lifespan)
 
 # CORS for local front-end (vite)
@@ -44,6 +76,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cursor de GET /cargas; sem isso o navegador não deixa o front ler o header
+    expose_headers=["X-Next-After-Id"],
 )
 
 
@@ -1,3 +1,9 @@
 from .user import User
-from .shipment import Shipment, ShipmentInvoice, ShipmentInvoiceTracking
+from .blob import StoredBlob
+from .shipment import Shipment, ShipmentInvoice, ShipmentInvoiceTracking, ShipmentRawPayload
 from .prefat import Prefat
+from .idempotency import EmissaoIdempotencyKey
+from .emissao_job import EmissaoJob
+from .tracking_outbox import TrackingOutbox
+from .attachment import AttachmentBlob
+from .localidades_sync_job import LocalidadesSyncJob
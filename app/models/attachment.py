@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime, BigInteger
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+class AttachmentBlob(Base):
+    """Índice do armazenamento endereçado por conteúdo de anexos (ATTACHMENT_STORE=cas)."""
+    __tablename__ = "attachment_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    # Nome do arquivo em ATTACHMENTS_DIR: hash + extensão do primeiro envio
+    filename = Column(String(255), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
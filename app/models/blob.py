@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, LargeBinary
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+class StoredBlob(Base):
+    """Conteúdo frio comprimido (XMLs de CT-e, arquivos do prefat), fora das tabelas quentes."""
+    __tablename__ = "stored_blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # SHA-256 e tamanho do conteúdo original (antes da compressão)
+    sha256 = Column(String(64), nullable=False, index=True)
+    size = Column(BigInteger, nullable=False)
+    encoding = Column(String(10), nullable=False)
+    stored_size = Column(BigInteger, nullable=False)
+    # BLOB_STORAGE=db: bytes comprimidos em data; BLOB_STORAGE=fs: arquivo BLOB_DIR/location
+    data = Column(LargeBinary, nullable=True)
+    location = Column(String(255), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
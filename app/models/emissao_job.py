@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Index
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class EmissaoJob(Base):
+    """Lote do /emissao?async=1 aguardando (ou já processado pelo) worker."""
+    __tablename__ = "emissao_jobs"
+    __table_args__ = (
+        Index("ix_emissao_jobs_status_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    api_user = Column(String(150), nullable=False)
+    modo = Column(String(20), nullable=True)
+    status = Column(String(20), nullable=False, default=JOB_QUEUED)
+    payload = Column(Text, nullable=False)
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
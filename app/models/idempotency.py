@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+class EmissaoIdempotencyKey(Base):
+    """Resposta gravada de um POST /emissao enviado com o header Idempotency-Key.
+
+    status_code/response nulos: chave reservada por uma requisição ainda em processamento.
+    """
+    __tablename__ = "emissao_idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("api_user", "idempotency_key", name="uq_emissao_idempotency_user_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    api_user = Column(String(150), nullable=False)
+    idempotency_key = Column(String(255), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    response = Column(JSON, nullable=True)
+    reserved_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,7 +1,7 @@
 import uuid
-from sqlalchemy import Column, String, ForeignKey, Integer
+from sqlalchemy import Column, String, ForeignKey, Integer, Float
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship, DeclarativeBase
+from sqlalchemy.orm import relationship, DeclarativeBase, deferred
 from geoalchemy2 import Geometry  # Para tipos de dados espaciais
 
 # Base declarativa para as classes
@@ -29,8 +29,17 @@ class Municipio(Base):
     nome = Column(String, nullable=False)
     estado_uuid = Column(UUID(as_uuid=True), ForeignKey("estados.uuid", ondelete="CASCADE"), nullable=False)
 
-    # Geometria MULTIPOLYGON no PostGIS (SRID 3857 - métrico)
-    geometria = Column(Geometry(geometry_type='MULTIPOLYGON', srid=3857), nullable=True)
+    # Geometria MULTIPOLYGON no PostGIS (SRID 3857 - métrico), com índice GiST idx_municipios_geometria
+    geometria = Column(Geometry(geometry_type='MULTIPOLYGON', srid=3857, spatial_index=True), nullable=True)
+    # Geometria simplificada (ST_SimplifyPreserveTopology, tolerância LOCALIDADES_SIMPLIFICACAO_M),
+    # gerada na importação do shapefile; pré-filtro por bbox da consulta por raio
+    geometria_simplificada = deferred(Column(Geometry(geometry_type='MULTIPOLYGON', srid=3857, spatial_index=True), nullable=True))
+
+    # Centróide (SIRGAS 2000, graus) e distância máxima dele ao contorno, calculados na
+    # importação do shapefile; usados pela consulta por raio sem PostGIS
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    raio_envolvente_km = Column(Float, nullable=True)
 
     estado = relationship("Estado", back_populates="municipios")
 
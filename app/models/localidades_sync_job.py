@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+SYNC_QUEUED = "queued"
+SYNC_RUNNING = "running"
+SYNC_DONE = "done"
+SYNC_FAILED = "failed"
+
+# Fases, em ordem; um job que falhou é retomado a partir de "phase"
+SYNC_PHASES = ("estados", "municipios", "shapefile", "geometria")
+
+
+class LocalidadesSyncJob(Base):
+    """Sincronização de localidades com o IBGE executada em background (POST /sincronizar)."""
+    __tablename__ = "localidades_sync_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    api_user = Column(String(150), nullable=True)
+    status = Column(String(20), nullable=False, default=SYNC_QUEUED)
+    # Fase em execução (ou a que falhou); None quando concluído
+    phase = Column(String(20), nullable=True, default=SYNC_PHASES[0])
+    # Resultado de cada fase concluída: {"estados": {"inserted": ..}, "municipios": {..}, ..}
+    progress = Column(JSON, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,9 +1,12 @@
-from sqlalchemy import Column, Integer, Text, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger, ForeignKey
 from sqlalchemy.sql import func
 from app.db import Base
 
 class Prefat(Base):
     __tablename__ = "prefats"
     id = Column(Integer, primary_key=True, index=True)
-    prefat_base64 = Column(Text, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    # Arquivo PROCEDA recebido, comprimido em stored_blobs (BlobService.prefat_files)
+    blob_id = Column(Integer, ForeignKey("stored_blobs.id"), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,14 +1,25 @@
 from typing import Optional
-from sqlalchemy import Column, Integer, String, DateTime, Float, Numeric, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Float, Numeric, Text, ForeignKey, JSON, LargeBinary, BigInteger, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db import Base
 from app.services.constants import VALID_CODES
 
+DEFAULT_STATUS_CODE = "10"
+
 
 class Shipment(Base):
     __tablename__ = "shipments"
+    # Índices compostos (filtro, id) para a paginação keyset do GET /cargas
+    __table_args__ = (
+        Index("ix_shipments_rem_ndoc_id", "rem_nDoc", "id"),
+        Index("ix_shipments_dest_uf_id", "dest_uf", "id"),
+        Index("ix_shipments_integration_date_id", "integration_date", "id"),
+        # Status desnormalizado: filtro por código na listagem e contadores do GET /cargas/stats
+        Index("ix_shipments_status_code_id", "status_code", "id"),
+        Index("ix_shipments_status_type_code", "status_type", "status_code"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     external_ref = Column(String(255), nullable=True)
@@ -133,10 +144,24 @@ class Shipment(Base):
     status = Column(
         JSON,
         nullable=False,
-        default=lambda: {"code": "10", **VALID_CODES["10"]},
+        default=lambda: {"code": DEFAULT_STATUS_CODE, **VALID_CODES[DEFAULT_STATUS_CODE]},
     )
+    # Cópias indexadas de status["code"] / status["type"], mantidas pelo ShipmentStatusService
+    status_code = Column(String(10), nullable=False, default=DEFAULT_STATUS_CODE)
+    status_type = Column(String(30), nullable=True, default=VALID_CODES[DEFAULT_STATUS_CODE]["type"])
 
     invoices = relationship("ShipmentInvoice", back_populates="shipment", cascade="all, delete-orphan")
+    raw_payload_blob = relationship("ShipmentRawPayload", uselist=False, cascade="all, delete-orphan")
+
+
+class ShipmentRawPayload(Base):
+    """Payload bruto da minuta comprimido (EMISSAO_RAW_PAYLOAD=gzip/zstd), fora da tabela shipments."""
+    __tablename__ = "shipment_raw_payloads"
+
+    shipment_id = Column(Integer, ForeignKey("shipments.id"), primary_key=True)
+    encoding = Column(String(10), nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class ShipmentInvoice(Base):
     __tablename__ = "shipment_invoices"
@@ -158,12 +183,16 @@ class ShipmentInvoice(Base):
     ncfop = Column(String(20), nullable=True)
     pbru = Column(String(50), nullable=True)
     qvol = Column(String(50), nullable=True)
-    access_key = Column(String(64), nullable=True)
+    # Chave de acesso da NF-e (44 dígitos): única, usada para deduplicar reenvios do /emissao
+    access_key = Column(String(64), nullable=True, unique=True, index=True)
     tp_doc = Column(String(20), nullable=True)
     x_esp = Column(String(255), nullable=True)
     x_nat = Column(String(255), nullable=True)
     cte_chave = Column(String(100), nullable=True)
-    xmls_b64 = Column(JSON, nullable=True)
+    # XMLs de CT-e do upload-xml, comprimidos em stored_blobs (BlobService.invoice_xmls)
+    xmls_blob_id = Column(Integer, ForeignKey("stored_blobs.id"), nullable=True)
+    xmls_size = Column(BigInteger, nullable=True)
+    xmls_sha256 = Column(String(64), nullable=True)
 
     # Invoice-level remetente nDoc (may be present per nota). Use shipment.rem_nDoc as fallback on insert.
     remetente_ndoc = Column(String(100), nullable=True, index=True)
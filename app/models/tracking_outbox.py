@@ -0,0 +1,34 @@
+import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.db import Base
+
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENDING = "sending"
+OUTBOX_SENT = "sent"
+OUTBOX_DEAD = "dead"
+
+
+class TrackingOutbox(Base):
+    """Evento de tracking aguardando envio à Brudam (gravado na mesma transação da troca de status)."""
+    __tablename__ = "tracking_outbox"
+    __table_args__ = (
+        Index("ix_tracking_outbox_status_next", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    shipment_invoice_id = Column(Integer, ForeignKey("shipment_invoices.id"), nullable=True, index=True)
+    codigo_evento = Column(String(20), nullable=False)
+    # Lista "documentos" do payload da Brudam (sem o bloco auth, montado no envio)
+    documentos = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default=OUTBOX_PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False,
+                             default=lambda: datetime.datetime.now(datetime.timezone.utc))
+    last_error = Column(Text, nullable=True)
+    response = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
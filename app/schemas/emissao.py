@@ -1,5 +1,6 @@
 """Schemas de resposta para o endpoint /emissao."""
 
+from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import List, Optional
 
@@ -27,6 +28,16 @@ class EmissaoResponse(BaseModel):
     class Config:
         from_attributes = True
 
+    @classmethod
+    def from_results(cls, results: List[MinutaResult]) -> "EmissaoResponse":
+        """Monta a resposta global a partir dos resultados por minuta."""
+        all_success = all(r.status == 1 for r in results)
+        return cls(
+            message="Documento gerado no sistema" if all_success else "Houve erros no processamento",
+            status=1 if all_success else 0,
+            data=results
+        )
+
     def has_failures(self) -> bool:
         """Retorna True se alguma minuta falhou."""
         return any(r.status == 0 for r in self.data)
@@ -44,3 +55,16 @@ class EmissaoResponse(BaseModel):
         if self.has_failures():
             return 207  # Sucesso parcial (Multi-Status)
         return 200  # Todas OK
+
+
+class EmissaoJobRead(BaseModel):
+    """Estado de um lote enviado com /emissao?async=1."""
+    
+    job_id: int = Field(..., description="ID do job na fila")
+    status: str = Field(..., description="queued, running, done ou failed")
+    total: int = Field(..., description="Quantidade de minutas do lote")
+    processed: int = Field(..., description="Minutas já processadas")
+    result: Optional[EmissaoResponse] = Field(None, description="Resposta final do /emissao (quando done)")
+    error: Optional[str] = Field(None, description="Erro que interrompeu o job (quando failed)")
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, field_validator
 import uuid
+from datetime import datetime
 from typing import List, Optional
 
 # --- Tipos base (sem a geometria, que só faz sentido no Read/Model) ---
@@ -45,4 +46,17 @@ class MunicipioRead(MunicipioBase):
     uuid: uuid.UUID
 
     class Config:
-        from_attributes = True  # ✅ Corrigido
\ No newline at end of file
+        from_attributes = True  # ✅ Corrigido
+
+class LocalidadesSyncJobRead(BaseModel):
+    """Estado de uma sincronização de localidades (POST /sincronizar)."""
+
+    job_id: int
+    status: str
+    phase: Optional[str] = None
+    progress: Optional[dict] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
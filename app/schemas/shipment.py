@@ -1,4 +1,4 @@
-from pydantic import BaseModel, field_validator, model_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 # EmailStr optionally requires the "email-validator" package. Provide a safe
 # fallback (str) when the package is not installed so tests and environments
@@ -7,7 +7,7 @@ try:
     from pydantic import EmailStr  # type: ignore
 except Exception:
     EmailStr = str  # type: ignore
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from app.services.constants import VALID_CODES
 
@@ -47,6 +47,8 @@ class ShipmentStatusResult(BaseModel):
     cte: str
     ok: bool
     vblog_response: Optional[str] = None
+    # ID do evento no outbox de tracking (envio à Brudam é assíncrono)
+    evento_id: Optional[int] = None
 
 
 class ShipmentStatusResponse(BaseModel):
@@ -101,6 +103,21 @@ class StatusOut(BaseModel):
     categoria: Optional[str] = None
 
 
+class StatusCountOut(BaseModel):
+    """Quantidade de cargas em um código de status."""
+    codigo: str
+    descricao: Optional[str] = None
+    categoria: Optional[str] = None
+    total: int
+
+
+class ShipmentStatsRead(BaseModel):
+    """Contadores de cargas por categoria e por código de status (GET /cargas/stats)."""
+    total: int
+    por_categoria: Dict[str, int] = {}
+    por_codigo: List[StatusCountOut] = []
+
+
 class ShipmentInvoiceOut(BaseModel):
     id: int
     access_key: Optional[str] = None
@@ -159,6 +176,18 @@ class ShipmentStatusRequest(BaseModel):
         return v
 
 
+class ShipmentStatusBatchRequest(BaseModel):
+    """Mesmo código de status aplicado a várias notas (POST /cargas/status:batch)."""
+    ids: List[int] = Field(..., min_length=1, max_length=1000, description="IDs das notas (shipment_invoices)")
+    code: str
+
+    @field_validator("code")
+    def validate_code(cls, v):
+        if v not in VALID_CODES:
+            raise ValueError(f"Código de status inválido: {v}")
+        return v
+
+
 class UploadXmlResponse(BaseModel):
     status: bool
     cte_chave: Optional[str] = None
@@ -0,0 +1,157 @@
+"""Download de anexos informados por URL (AttachmentIn.arquivo.nome = "http...").
+
+Responsabilidades:
+- Baixar as URLs em paralelo (asyncio.gather + semáforo) com o cliente HTTP compartilhado
+- Gravar em streaming, abortando downloads acima de ATTACHMENT_FETCH_MAX_BYTES
+- Lembrar URL + ETag dos arquivos já baixados (LRU em memória sobre o armazenamento
+  em disco) e revalidar com If-None-Match, sem baixar de novo o que não mudou
+"""
+
+import asyncio
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import httpx
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import (
+    ATTACHMENT_FETCH_CACHE_SIZE,
+    ATTACHMENT_FETCH_CONCURRENCY,
+    ATTACHMENT_FETCH_MAX_BYTES,
+    ATTACHMENT_FETCH_TIMEOUT,
+)
+from app.http_clients import get_http_client
+from app.services.attachments_service import AttachmentService, AttachmentTooLarge, StagedFile
+
+ATTACHMENTS_CLIENT = "attachments"
+
+
+class CachedFile(NamedTuple):
+    """Arquivo já armazenado para uma URL, com o ETag que o servidor devolveu."""
+    etag: str
+    sha256: str
+    filename: str
+    size: int
+
+
+class RemoteAttachmentCache:
+    """LRU URL -> CachedFile (os bytes ficam no armazenamento de anexos em disco)."""
+
+    def __init__(self, max_entries: int = ATTACHMENT_FETCH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedFile]" = OrderedDict()
+
+    def get(self, url: str) -> Optional[CachedFile]:
+        entry = self._entries.get(url)
+        if entry is not None:
+            self._entries.move_to_end(url)
+        return entry
+
+    def put(self, url: str, entry: CachedFile) -> None:
+        self._entries[url] = entry
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, url: str) -> None:
+        self._entries.pop(url, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_cache = RemoteAttachmentCache()
+
+
+def _original_name(url: str) -> Optional[str]:
+    """Nome do arquivo no caminho da URL (só a extensão é usada no armazenamento)."""
+    try:
+        return Path(httpx.URL(url).path).name or None
+    except Exception:
+        return None
+
+
+class RemoteAttachmentFetcher:
+    """Baixa e armazena anexos remotos de uma troca de status."""
+
+    def __init__(
+        self,
+        attachment_svc: Optional[AttachmentService] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        concurrency: int = ATTACHMENT_FETCH_CONCURRENCY,
+        max_bytes: int = ATTACHMENT_FETCH_MAX_BYTES,
+        cache: Optional[RemoteAttachmentCache] = None,
+    ):
+        self.attachment_svc = attachment_svc or AttachmentService()
+        self._client = client
+        self.concurrency = max(1, concurrency)
+        self.max_bytes = max_bytes
+        self.cache = cache if cache is not None else _cache
+
+    async def fetch_many(self, urls: list[str], db: Optional[AsyncSession] = None) -> dict[str, Optional[dict]]:
+        """Baixa as URLs (cada uma uma vez) e armazena os arquivos.
+
+        Args:
+            urls: URLs dos anexos (repetições são baixadas uma vez)
+            db: Sessão do chamador, usada pelo armazenamento cas
+
+        Returns:
+            URL -> dicionário de AttachmentService.save_file, ou None se o download falhou
+        """
+        unique = list(dict.fromkeys(urls))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def download(url: str):
+            async with semaphore:
+                try:
+                    return await self._download(url)
+                except Exception as e:
+                    # Inclui URLs malformadas (httpx.InvalidURL não é HTTPError): o anexo é pulado
+                    logger.warning(f"Attachment download failed for {url}: {type(e).__name__}: {e}")
+                    return None
+
+        downloads = await asyncio.gather(*(download(url) for url in unique))
+
+        # Registro no armazenamento em sequência: a AsyncSession não aceita uso concorrente
+        results: dict[str, Optional[dict]] = {}
+        for i, (url, downloaded) in enumerate(zip(unique, downloads)):
+            try:
+                if isinstance(downloaded, CachedFile):
+                    saved = await self.attachment_svc.add_reference(db, downloaded.sha256, downloaded.filename, downloaded.size)
+                    if saved is None:
+                        self.cache.discard(url)
+                elif downloaded is not None:
+                    staged, etag = downloaded
+                    saved = await self.attachment_svc.commit_staged(staged, _original_name(url), db=db)
+                    if etag:
+                        self.cache.put(url, CachedFile(etag, saved["sha256"], saved["filename"], saved["size"]))
+                else:
+                    saved = None
+            except BaseException:
+                # Temporários desta URL e das seguintes nunca chegaram ao armazenamento
+                for pending in downloads[i:]:
+                    if isinstance(pending, tuple):
+                        pending[0].path.unlink(missing_ok=True)
+                raise
+            results[url] = saved
+        return results
+
+    async def _download(self, url: str):
+        """Devolve CachedFile (304), (StagedFile, etag) ou None (status de erro)."""
+        cached = self.cache.get(url)
+        headers = {"If-None-Match": cached.etag} if cached else {}
+        client = self._client or get_http_client(ATTACHMENTS_CLIENT)
+
+        async with client.stream("GET", url, headers=headers, timeout=ATTACHMENT_FETCH_TIMEOUT) as resp:
+            if resp.status_code == 304 and cached is not None:
+                return cached
+            if resp.status_code >= 300:
+                logger.warning("Attachment download for %s returned HTTP %d", url, resp.status_code)
+                return None
+            declared = resp.headers.get("content-length")
+            if declared and declared.isdigit() and int(declared) > self.max_bytes:
+                raise AttachmentTooLarge(f"Anexo maior que {self.max_bytes} bytes")
+            staged: StagedFile = await self.attachment_svc.stage_stream(resp.aiter_bytes(), max_bytes=self.max_bytes)
+            return staged, resp.headers.get("etag")
@@ -1,23 +1,107 @@
+import asyncio
 import base64
+import datetime
+import hashlib
 import os
 import uuid
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Iterator, NamedTuple, Optional
 
-from app.config.settings import ATTACHMENTS_DIR, ATTACHMENT_BASE_URL
+from loguru import logger
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config.settings import ATTACHMENTS_DIR, ATTACHMENT_BASE_URL, ATTACHMENT_CHUNK_SIZE, ATTACHMENT_STORE
+from app.models.attachment import AttachmentBlob
+
+ATTACHMENT_STORE_CAS = "cas"
+ATTACHMENT_STORE_UUID = "uuid"
+
+
+def _b64_chunk_size(chunk_size: int) -> int:
+    """Bloco de leitura múltiplo de 3, para que cada pedaço vire base64 sem padding intermediário."""
+    return max(3, chunk_size - chunk_size % 3)
+
+
+# Chave usada nos anexos gravados no outbox: o arquivo local é referenciado pelo nome
+# e o base64 ("dados") só é gerado, em streaming, no envio à Brudam
+ANEXO_REF_KEY = "dados_ref"
+
+
+# session.info: arquivos cas aguardando o commit (destino final -> temporário)
+_PENDING_KEY = "attachments_service.pending_files"
+
+
+def _unlink_quiet(path: Path) -> None:
+    try:
+        path.unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning("Failed to remove attachment file %s: %s", path, e)
+
+
+def _pending_files(session: Session) -> dict:
+    """Arquivos da transação atual da sessão; registra os hooks de commit/rollback na primeira vez."""
+    pending = session.info.get(_PENDING_KEY)
+    if pending is None:
+        pending = session.info[_PENDING_KEY] = {}
+        event.listen(session, "after_commit", _after_commit)
+        event.listen(session, "after_rollback", _after_rollback)
+    return pending
+
+
+def _after_commit(session: Session) -> None:
+    # O índice já referencia os arquivos: entram no armazenamento (mesmo conteúdo, então
+    # substituir um arquivo gravado por outra transação não muda nada)
+    pending = session.info[_PENDING_KEY]
+    placed = list(pending.items())
+    pending.clear()
+    for path, tmp_path in placed:
+        try:
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error("Failed to store attachment %s: %s", path, e)
+            _unlink_quiet(tmp_path)
+
+
+def _after_rollback(session: Session) -> None:
+    # Nenhuma linha referencia os arquivos da transação desfeita
+    pending = session.info[_PENDING_KEY]
+    discarded = list(pending.values())
+    pending.clear()
+    for tmp_path in discarded:
+        _unlink_quiet(tmp_path)
+
+
+class AttachmentTooLarge(ValueError):
+    """Anexo acima do limite de tamanho configurado."""
+
+
+class StagedFile(NamedTuple):
+    """Arquivo temporário gravado por stage_stream, ainda fora do armazenamento."""
+    path: Path
+    sha256: str
+    size: int
 
 
 class AttachmentService:
     """Simple local attachment storage service.
 
     Saves files under ATTACHMENTS_DIR and exposes a URL using ATTACHMENT_BASE_URL.
+    With ATTACHMENT_STORE=cas and a DB session, files are content-addressed:
+    named by SHA-256, written once and indexed in attachment_blobs. They only
+    reach their final name after the session commits.
     """
 
-    def __init__(self, storage_dir: Optional[str] = None, base_url: Optional[str] = None):
+    def __init__(self, storage_dir: Optional[str] = None, base_url: Optional[str] = None, store: Optional[str] = None):
         self.storage_dir = Path(storage_dir or ATTACHMENTS_DIR)
         self.base_url = base_url or ATTACHMENT_BASE_URL
+        self.content_addressed = (store or ATTACHMENT_STORE).lower() == ATTACHMENT_STORE_CAS
         self.storage_dir.mkdir(parents=True, exist_ok=True)
 
+    def _url(self, filename: str) -> str:
+        return f"{self.base_url.rstrip('/')}/{filename}"
+
     def _make_filename(self, original_name: Optional[str]) -> str:
         suffix = Path(original_name).suffix if original_name else ""
         return f"{uuid.uuid4().hex}{suffix}"
@@ -28,16 +112,193 @@ class AttachmentService:
         path = self.storage_dir / filename
         with open(path, "wb") as f:
             f.write(data)
-        url = f"{self.base_url.rstrip('/')}/{filename}"
-        return {"url": url, "path": str(path), "filename": filename}
+        return {"url": self._url(filename), "path": str(path), "filename": filename}
+
+    async def save_upload(
+        self,
+        upload,
+        original_name: Optional[str] = None,
+        chunk_size: int = ATTACHMENT_CHUNK_SIZE,
+        db: Optional[AsyncSession] = None,
+    ) -> dict:
+        """Copia um UploadFile para o disco em blocos, calculando o SHA-256 durante a cópia.
+
+        A escrita roda em thread (asyncio.to_thread), então o event loop não
+        bloqueia, e a memória usada fica limitada a um bloco por upload. Com
+        db no modo cas, um conteúdo já armazenado não gera um segundo arquivo.
+
+        Returns:
+            Mesmo dicionário de save_file, mais "sha256" e "size"
+        """
+        async def chunks():
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+        staged = await self.stage_stream(chunks())
+        return await self.commit_staged(staged, original_name or getattr(upload, "filename", None), db=db)
+
+    async def stage_stream(self, chunks: AsyncIterator[bytes], max_bytes: Optional[int] = None) -> StagedFile:
+        """Grava um fluxo de bytes em um arquivo temporário, calculando o SHA-256.
+
+        Não usa o banco, então pode rodar em paralelo; o arquivo só entra no
+        armazenamento com commit_staged.
+
+        Raises:
+            AttachmentTooLarge: Fluxo passou de max_bytes (o temporário é apagado)
+        """
+        tmp_path = self.storage_dir / f".{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        size = 0
+        f = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise AttachmentTooLarge(f"Anexo maior que {max_bytes} bytes")
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            f.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        await asyncio.to_thread(f.close)
+        return StagedFile(tmp_path, digest.hexdigest(), size)
+
+    async def commit_staged(self, staged: StagedFile, original_name: Optional[str] = None, db: Optional[AsyncSession] = None) -> dict:
+        """Move um arquivo de stage_stream para o armazenamento (deduplicado no modo cas com db).
+
+        No modo cas o arquivo só recebe o nome final no commit de db; um rollback
+        apaga o temporário.
+        """
+        if self.content_addressed and db is not None:
+            filename = await self._register(db, staged.sha256, self._cas_filename(staged.sha256, original_name), staged.size)
+            path = self.storage_dir / filename
+            self._place_after_commit(db, path, staged.path)
+        else:
+            filename = self._make_filename(original_name)
+            path = self.storage_dir / filename
+            await asyncio.to_thread(os.replace, staged.path, path)
+        return {"url": self._url(filename), "path": str(path), "filename": filename, "sha256": staged.sha256, "size": staged.size}
+
+    async def add_reference(self, db: Optional[AsyncSession], sha256: str, filename: str, size: int) -> Optional[dict]:
+        """Nova referência a um anexo já armazenado (ex.: cache de download); None se o arquivo sumiu."""
+        path = self.storage_dir / filename
+        pending = db is not None and path in db.sync_session.info.get(_PENDING_KEY, {})
+        if not (path.is_file() or pending):
+            return None
+        if self.content_addressed and db is not None:
+            filename = await self._register(db, sha256, filename, size)
+        return {"url": self._url(filename), "path": str(self.storage_dir / filename), "filename": filename, "sha256": sha256, "size": size}
+
+    async def save_bytes(self, data: bytes, original_name: Optional[str] = None, db: Optional[AsyncSession] = None) -> dict:
+        """Versão assíncrona de save_file; no modo cas (com db) conteúdo repetido não é regravado."""
+        if not (self.content_addressed and db is not None):
+            return await asyncio.to_thread(self.save_file, data, original_name)
+        sha256 = hashlib.sha256(data).hexdigest()
+        filename = await self._register(db, sha256, self._cas_filename(sha256, original_name), len(data))
+        path = self.storage_dir / filename
+        if not (path.exists() or path in _pending_files(db.sync_session)):
+            tmp_path = self.storage_dir / f".{uuid.uuid4().hex}.part"
+            await asyncio.to_thread(tmp_path.write_bytes, data)
+            self._place_after_commit(db, path, tmp_path)
+        return {"url": self._url(filename), "path": str(path), "filename": filename, "sha256": sha256, "size": len(data)}
+
+    @staticmethod
+    def _place_after_commit(db: AsyncSession, path: Path, tmp_path: Path) -> None:
+        """Agenda tmp_path para virar path no commit de db (descartado se o conteúdo já está lá)."""
+        pending = _pending_files(db.sync_session)
+        if path.exists() or path in pending:
+            _unlink_quiet(tmp_path)
+        else:
+            pending[path] = tmp_path
+
+    @staticmethod
+    def _cas_filename(sha256: str, original_name: Optional[str]) -> str:
+        suffix = Path(original_name).suffix.lower() if original_name else ""
+        return f"{sha256}{suffix}"
+
+    @staticmethod
+    async def _register(db: AsyncSession, sha256: str, filename: str, size: int) -> str:
+        """Cria a entrada do índice ou atualiza last_used_at (upsert na transação do chamador).
+
+        Returns:
+            Nome do arquivo armazenado para esse hash
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        dialect = db.get_bind().dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            if dialect == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert as upsert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as upsert
+            stmt = upsert(AttachmentBlob).values(
+                sha256=sha256, filename=filename, size=size, created_at=now, last_used_at=now,
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[AttachmentBlob.sha256],
+                set_={"last_used_at": now},
+            ).returning(AttachmentBlob.filename)
+            return (await db.execute(stmt)).scalar_one()
+
+        # Outros bancos: leitura + insert/update (sem proteção contra corrida)
+        blob = (await db.execute(select(AttachmentBlob).where(AttachmentBlob.sha256 == sha256))).scalar_one_or_none()
+        if blob is None:
+            db.add(AttachmentBlob(sha256=sha256, filename=filename, size=size, last_used_at=now))
+            await db.flush()
+            return filename
+        blob.last_used_at = now
+        logger.debug("Attachment %s deduplicated", sha256)
+        return blob.filename
+
+    @staticmethod
+    def anexo_ref(saved: dict) -> dict:
+        """Item "anexos" que referencia um arquivo salvo, sem carregar o base64."""
+        return {"arquivo": {"nome": saved["url"], ANEXO_REF_KEY: saved["filename"]}}
 
     def save_base64(self, b64: str, original_name: Optional[str] = None) -> dict:
         data = base64.b64decode(b64)
         return self.save_file(data, original_name)
 
     def get_base64_from_path(self, path: str) -> str:
+        return "".join(self.iter_base64(path))
+
+    def resolve_path(self, filename: str) -> Optional[Path]:
+        """Caminho de um arquivo salvo (apenas o nome; sem diretórios), ou None se não existe."""
+        p = self.storage_dir / Path(filename).name
+        return p if p.is_file() else None
+
+    @staticmethod
+    def base64_length(path) -> int:
+        """Tamanho do base64 do arquivo, sem lê-lo."""
+        return 4 * ((os.path.getsize(path) + 2) // 3)
+
+    @staticmethod
+    def iter_base64(path, chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> Iterator[str]:
+        """Gera o base64 do arquivo em pedaços (memória limitada a um bloco)."""
+        chunk_size = _b64_chunk_size(chunk_size)
         with open(path, "rb") as f:
-            return base64.b64encode(f.read()).decode()
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield base64.b64encode(chunk).decode("ascii")
+
+    @staticmethod
+    async def aiter_base64(path, chunk_size: int = ATTACHMENT_CHUNK_SIZE) -> AsyncIterator[str]:
+        """Versão assíncrona de iter_base64: leitura do disco em thread."""
+        chunk_size = _b64_chunk_size(chunk_size)
+        f = await asyncio.to_thread(open, path, "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(f.read, chunk_size)
+                if not chunk:
+                    break
+                yield base64.b64encode(chunk).decode("ascii")
+        finally:
+            f.close()
 
     def get_base64_from_url(self, url: str) -> Optional[str]:
         # only supports local urls from ATTACHMENT_BASE_URL
@@ -45,8 +306,7 @@ class AttachmentService:
             # try with slash normalized
             if not url.startswith(self.base_url):
                 return None
-        filename = Path(url).name
-        p = self.storage_dir / filename
-        if not p.exists():
+        p = self.resolve_path(Path(url).name)
+        if p is None:
             return None
         return self.get_base64_from_path(str(p))
@@ -0,0 +1,224 @@
+"""Armazenamento frio de conteúdos grandes (XMLs de CT-e, arquivos PROCEDA do prefat).
+
+Responsabilidades:
+- Guardar os bytes originais (não o base64) comprimidos com gzip/zstd, na tabela
+  stored_blobs (BLOB_STORAGE=db) ou em arquivos em BLOB_DIR (BLOB_STORAGE=fs)
+- Deixar nas linhas de shipment_invoices/prefats só a referência, o tamanho e o SHA-256
+- Carregar e descomprimir apenas quando um endpoint precisa do conteúdo
+- Na camada fs, apagar arquivos só depois do commit que remove a referência, e remover os
+  arquivos gravados por uma transação desfeita (collect_garbage limpa os que sobrarem)
+"""
+
+import asyncio
+import hashlib
+import os
+import struct
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable, Optional
+
+from loguru import logger
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.blob import StoredBlob
+from app.models.prefat import Prefat
+from app.models.shipment import ShipmentInvoice
+from app.utils.raw_payload import (
+    RAW_PAYLOAD_GZIP,
+    RAW_PAYLOAD_ZSTD,
+    compress_raw_payload,
+    decompress_raw_payload,
+    resolve_encoding,
+)
+
+BLOB_STORAGE_DB = "db"
+BLOB_STORAGE_FS = "fs"
+
+_FS_SUFFIX = {RAW_PAYLOAD_GZIP: ".gz", RAW_PAYLOAD_ZSTD: ".zst"}
+_PART_HEADER = struct.Struct(">I")
+
+# Session.info: arquivos gravados e arquivos a apagar pela transação em andamento
+_PENDING_KEY = "blob_service.pending_files"
+
+
+def pack_parts(parts: Iterable[bytes]) -> bytes:
+    """Junta vários arquivos em um só conteúdo (tamanho de 4 bytes + bytes, para cada um)."""
+    return b"".join(_PART_HEADER.pack(len(part)) + part for part in parts)
+
+
+def unpack_parts(data: bytes) -> list[bytes]:
+    """Inverso de pack_parts."""
+    parts, offset = [], 0
+    while offset < len(data):
+        (size,) = _PART_HEADER.unpack_from(data, offset)
+        offset += _PART_HEADER.size
+        parts.append(data[offset:offset + size])
+        offset += size
+    return parts
+
+
+def _unlink_quiet(path: Path) -> None:
+    try:
+        path.unlink(missing_ok=True)
+    except OSError as e:
+        logger.warning("Failed to remove blob file %s: %s", path, e)
+
+
+def _pending_files(session: Session) -> dict:
+    """Arquivos da transação atual da sessão; registra os hooks de commit/rollback na primeira vez."""
+    pending = session.info.get(_PENDING_KEY)
+    if pending is None:
+        pending = session.info[_PENDING_KEY] = {"written": [], "unlink": []}
+        event.listen(session, "after_commit", _after_commit)
+        event.listen(session, "after_rollback", _after_rollback)
+    return pending
+
+
+def _after_commit(session: Session) -> None:
+    # Referências removidas no banco: agora os arquivos podem ir embora
+    pending = session.info[_PENDING_KEY]
+    unlink, pending["written"], pending["unlink"] = pending["unlink"], [], []
+    for path in unlink:
+        _unlink_quiet(path)
+
+
+def _after_rollback(session: Session) -> None:
+    # Nenhuma linha referencia os arquivos gravados; os que seriam apagados continuam em uso
+    pending = session.info[_PENDING_KEY]
+    written, pending["written"], pending["unlink"] = pending["written"], [], []
+    for path in written:
+        _unlink_quiet(path)
+
+
+class BlobService:
+    """Grava e lê blobs frios comprimidos."""
+
+    def __init__(self, storage: Optional[str] = None, blob_dir: Optional[str] = None, encoding: Optional[str] = None):
+        self.storage = (storage or settings.blob_storage).lower()
+        if self.storage not in (BLOB_STORAGE_DB, BLOB_STORAGE_FS):
+            logger.warning("Unknown blob storage %s, using %s", self.storage, BLOB_STORAGE_DB)
+            self.storage = BLOB_STORAGE_DB
+        self.blob_dir = Path(blob_dir or settings.blob_dir)
+        self.encoding = resolve_encoding(encoding or settings.blob_encoding)
+        if self.encoding not in (RAW_PAYLOAD_GZIP, RAW_PAYLOAD_ZSTD):
+            # "text"/"off" não se aplicam aqui: o conteúdo é sempre guardado comprimido
+            self.encoding = RAW_PAYLOAD_GZIP
+
+    async def put(self, db: AsyncSession, data: bytes) -> StoredBlob:
+        """Comprime e grava o conteúdo; o blob é adicionado à sessão (flush, sem commit).
+
+        Returns:
+            StoredBlob com id, sha256 e size do conteúdo original
+        """
+        compressed = await asyncio.to_thread(compress_raw_payload, data, self.encoding)
+        blob = StoredBlob(
+            sha256=hashlib.sha256(data).hexdigest(),
+            size=len(data),
+            encoding=self.encoding,
+            stored_size=len(compressed),
+        )
+        if self.storage == BLOB_STORAGE_FS:
+            # Até o commit o arquivo é lixo: removido no rollback ou por collect_garbage
+            blob.location = f"{uuid.uuid4().hex}{_FS_SUFFIX[self.encoding]}"
+            path = self.blob_dir / blob.location
+            await asyncio.to_thread(self._write_atomic, path, compressed)
+            _pending_files(db.sync_session)["written"].append(path)
+        else:
+            blob.data = compressed
+        db.add(blob)
+        await db.flush()
+        return blob
+
+    async def get(self, db: AsyncSession, blob_id: int) -> Optional[bytes]:
+        """Conteúdo original do blob, ou None se não existe."""
+        return (await self.get_many(db, [blob_id])).get(blob_id)
+
+    async def get_many(self, db: AsyncSession, blob_ids: Iterable[Optional[int]]) -> dict[int, bytes]:
+        """Conteúdo original de vários blobs, com uma única consulta."""
+        ids = {blob_id for blob_id in blob_ids if blob_id is not None}
+        if not ids:
+            return {}
+        result = await db.execute(select(StoredBlob).where(StoredBlob.id.in_(ids)))
+        return {blob.id: await self._read(blob) for blob in result.scalars().all()}
+
+    async def delete(self, db: AsyncSession, blob_id: int) -> None:
+        """Remove o blob (sem commit); na camada fs o arquivo é apagado depois do commit."""
+        blob = await db.get(StoredBlob, blob_id)
+        if blob is None:
+            return
+        await db.delete(blob)
+        if blob.location:
+            _pending_files(db.sync_session)["unlink"].append(self.blob_dir / blob.location)
+
+    async def collect_garbage(self, db: AsyncSession, min_age_seconds: float = 3600) -> int:
+        """Apaga arquivos de BLOB_DIR que nenhuma linha de stored_blobs referencia.
+
+        São arquivos de transações que não chegaram ao commit (processo que morreu entre a
+        gravação e o commit). min_age_seconds protege os de transações ainda em andamento.
+
+        Returns:
+            Quantidade de arquivos removidos
+        """
+        result = await db.execute(select(StoredBlob.location).where(StoredBlob.location.isnot(None)))
+        referenced = set(result.scalars().all())
+        cutoff = time.time() - min_age_seconds
+
+        def sweep() -> int:
+            if not self.blob_dir.is_dir():
+                return 0
+            removed = 0
+            for path in self.blob_dir.iterdir():
+                if path.is_file() and path.name not in referenced and path.stat().st_mtime < cutoff:
+                    _unlink_quiet(path)
+                    removed += 1
+            return removed
+
+        removed = await asyncio.to_thread(sweep)
+        if removed:
+            logger.info("Removed %d unreferenced blob files from %s", removed, self.blob_dir)
+        return removed
+
+    async def set_invoice_xmls(self, db: AsyncSession, invoice: ShipmentInvoice, xmls: list[bytes]) -> None:
+        """Substitui os XMLs de CT-e da nota (sem commit)."""
+        previous = invoice.xmls_blob_id
+        blob = await self.put(db, pack_parts(xmls))
+        invoice.xmls_blob_id, invoice.xmls_size, invoice.xmls_sha256 = blob.id, blob.size, blob.sha256
+        if previous is not None:
+            await self.delete(db, previous)
+
+    async def invoice_xmls(self, db: AsyncSession, invoice: ShipmentInvoice) -> list[bytes]:
+        """XMLs de CT-e da nota (vazio se nunca houve upload)."""
+        if invoice.xmls_blob_id is None:
+            return []
+        data = await self.get(db, invoice.xmls_blob_id)
+        return unpack_parts(data) if data is not None else []
+
+    async def set_prefat_file(self, db: AsyncSession, prefat: Prefat, content: bytes) -> None:
+        """Grava o arquivo PROCEDA do prefat (sem commit)."""
+        blob = await self.put(db, content)
+        prefat.blob_id, prefat.size, prefat.sha256 = blob.id, blob.size, blob.sha256
+
+    async def prefat_files(self, db: AsyncSession, prefats: Iterable[Prefat]) -> dict[int, bytes]:
+        """prefat.id -> arquivo PROCEDA, com uma única consulta a stored_blobs."""
+        prefats = list(prefats)
+        contents = await self.get_many(db, (p.blob_id for p in prefats))
+        return {p.id: contents[p.blob_id] for p in prefats if p.blob_id in contents}
+
+    async def _read(self, blob: StoredBlob) -> bytes:
+        if blob.location:
+            compressed = await asyncio.to_thread((self.blob_dir / blob.location).read_bytes)
+        else:
+            compressed = blob.data
+        return await asyncio.to_thread(decompress_raw_payload, compressed, blob.encoding)
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{uuid.uuid4().hex}.part")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
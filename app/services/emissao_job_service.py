@@ -0,0 +1,202 @@
+"""Fila de jobs do /emissao?async=1.
+
+Responsabilidades:
+- Persistir o payload Notfis recebido e devolver o ID do job imediatamente
+- Entregar cada job a um único worker (SELECT ... FOR UPDATE SKIP LOCKED)
+- Processar o lote com o EmissaoService, registrando o progresso por bloco
+- Manter um pool de workers em background durante a vida da aplicação
+"""
+
+import asyncio
+import datetime
+from typing import Optional
+
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+
+from app.core.config import settings
+from app.db import AsyncSessionLocal
+from app.models.emissao_job import EmissaoJob, JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED
+from app.schemas.notfis import NotfisPayload
+from app.schemas.emissao import MinutaResult, EmissaoResponse, EmissaoJobRead
+from app.services.emissao_service import EmissaoService
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class EmissaoJobService:
+    """Enfileiramento e processamento dos jobs de emissão."""
+
+    def __init__(self, session_factory=None):
+        """Inicializa o serviço.
+
+        Args:
+            session_factory: Fábrica de sessões usada pelos workers (padrão: AsyncSessionLocal)
+        """
+        self.session_factory = session_factory or AsyncSessionLocal
+
+    @staticmethod
+    async def enqueue(db: AsyncSession, payload: NotfisPayload, user: str, modo: Optional[str] = None) -> EmissaoJob:
+        """Persiste o payload como um job pendente.
+
+        Args:
+            db: Sessão da requisição
+            payload: Payload Notfis validado
+            user: Usuário autenticado
+            modo: Modo de gravação repassado ao EmissaoService
+
+        Returns:
+            EmissaoJob criado (com ID atribuído)
+        """
+        job = EmissaoJob(
+            api_user=user,
+            modo=modo,
+            status=JOB_QUEUED,
+            payload=payload.model_dump_json(),
+            total=len(payload.documentos),
+            processed=0,
+            attempts=0,
+        )
+        async with db.begin():
+            db.add(job)
+        logger.info("/emissao job id=%s queued by user=%s with %d minutas", job.id, user, job.total)
+        return job
+
+    @staticmethod
+    async def get_job(db: AsyncSession, job_id: int, user: str) -> Optional[EmissaoJob]:
+        """Busca um job do usuário (jobs de outros usuários não são expostos)."""
+        result = await db.execute(
+            select(EmissaoJob).where(EmissaoJob.id == job_id, EmissaoJob.api_user == user)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    def to_read(job: EmissaoJob) -> EmissaoJobRead:
+        """Converte o job para o schema de resposta."""
+        return EmissaoJobRead(
+            job_id=job.id,
+            status=job.status,
+            total=job.total,
+            processed=job.processed,
+            result=job.result,
+            error=job.error,
+            created_at=job.created_at,
+            finished_at=job.finished_at,
+        )
+
+    async def claim_next(self) -> Optional[int]:
+        """Reserva o próximo job pendente para este worker.
+
+        Usa SELECT ... FOR UPDATE SKIP LOCKED, então workers concorrentes (neste
+        ou em outros processos) nunca pegam o mesmo job. Jobs em "running" há
+        mais de EMISSAO_JOB_STALE_SECONDS (worker morto) voltam a ser elegíveis;
+        minutas já gravadas são devolvidas pela deduplicação por chave de NF-e.
+
+        Returns:
+            ID do job reservado, ou None se a fila está vazia
+        """
+        stale_before = _now() - datetime.timedelta(seconds=settings.emissao_job_stale_seconds)
+        async with self.session_factory() as db:
+            async with db.begin():
+                result = await db.execute(
+                    select(EmissaoJob.id)
+                    .where(or_(
+                        EmissaoJob.status == JOB_QUEUED,
+                        and_(EmissaoJob.status == JOB_RUNNING, EmissaoJob.started_at < stale_before),
+                    ))
+                    .order_by(EmissaoJob.id)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                )
+                job_id = result.scalar_one_or_none()
+                if job_id is None:
+                    return None
+                await db.execute(
+                    update(EmissaoJob)
+                    .where(EmissaoJob.id == job_id)
+                    .values(status=JOB_RUNNING, started_at=_now(), attempts=EmissaoJob.attempts + 1)
+                )
+        return job_id
+
+    async def process_job(self, job_id: int) -> None:
+        """Processa um job reservado, atualizando o progresso a cada bloco de minutas.
+
+        Args:
+            job_id: ID retornado por claim_next
+        """
+        async with self.session_factory() as db:
+            job = await db.get(EmissaoJob, job_id)
+            payload_json, user, modo = job.payload, job.api_user, job.modo
+
+        logger.info("/emissao job id=%s started", job_id)
+        try:
+            payload = NotfisPayload.model_validate_json(payload_json)
+            chunk = max(1, settings.emissao_job_chunk)
+            results: list[MinutaResult] = []
+
+            async with self.session_factory() as db:
+                service = EmissaoService(db, session_factory=self.session_factory)
+                for start in range(0, len(payload.documentos), chunk):
+                    part = NotfisPayload.model_construct(documentos=payload.documentos[start:start + chunk])
+                    response = await service.process_payload(part, user, modo=modo)
+                    results.extend(response.data)
+                    await self._update(job_id, processed=len(results))
+
+            final = EmissaoResponse.from_results(results)
+            await self._update(job_id, status=JOB_DONE, result=final.model_dump(), finished_at=_now())
+            logger.info("/emissao job id=%s done: %d minutas", job_id, len(results))
+
+        except Exception as e:
+            logger.exception("/emissao job id=%s failed: %s", job_id, e)
+            await self._update(job_id, status=JOB_FAILED, error=f"{e.__class__.__name__}: {e}", finished_at=_now())
+
+    async def run_once(self) -> bool:
+        """Reserva e processa um job. Retorna False se a fila estava vazia."""
+        job_id = await self.claim_next()
+        if job_id is None:
+            return False
+        await self.process_job(job_id)
+        return True
+
+    async def _update(self, job_id: int, **values) -> None:
+        async with self.session_factory() as db:
+            async with db.begin():
+                await db.execute(update(EmissaoJob).where(EmissaoJob.id == job_id).values(**values))
+
+
+class EmissaoJobWorker:
+    """Pool de workers em background que consome a fila de emissão."""
+
+    def __init__(self, workers: Optional[int] = None, service: Optional[EmissaoJobService] = None):
+        self.workers = settings.emissao_job_workers if workers is None else workers
+        self.service = service or EmissaoJobService()
+        self._tasks: list[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    def start(self) -> None:
+        """Inicia os workers no event loop atual."""
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._loop(n)) for n in range(self.workers)]
+        logger.info("Emissao job workers started: %d", self.workers)
+
+    async def stop(self) -> None:
+        """Sinaliza parada e aguarda os jobs em andamento terminarem."""
+        self._stopping.set()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _loop(self, n: int) -> None:
+        while not self._stopping.is_set():
+            try:
+                if await self.service.run_once():
+                    continue
+            except Exception as e:
+                logger.exception("Emissao job worker %d error: %s", n, e)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=settings.emissao_job_poll_interval)
+            except asyncio.TimeoutError:
+                pass
@@ -4,64 +4,115 @@ Responsabilidades:
 - Processar payload Notfis contendo múltiplas minutas
 - Criar Shipments e ShipmentInvoices no banco de dados
 - Gerenciar transações isoladas por minuta (uma falha não afeta as outras)
+- Modo bulk: pré-valida em memória e persiste o lote com INSERTs multi-row
+- Modo concurrent: distribui as minutas entre N workers com sessões próprias
+- Streaming NDJSON: processa uma minuta por linha à medida que chega
+- Idempotência: minutas reenviadas (mesmas chaves de NF-e) devolvem o shipment original
+- Payload bruto serializado uma única vez por minuta (texto, comprimido ou desligado)
 - Enriquecer shipments com dados de localidades (best-effort)
 """
 
-import json
-from typing import Optional
+import asyncio
+import datetime
+from types import SimpleNamespace
+from typing import AsyncIterator, Optional
+from pydantic import ValidationError as PydanticValidationError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
-from app.models.shipment import Shipment, ShipmentInvoice
+from app.core.config import settings
+from app.db import AsyncSessionLocal, engine
+from app.models.shipment import Shipment, ShipmentInvoice, ShipmentRawPayload
+from app.models.idempotency import EmissaoIdempotencyKey
 from app.schemas.notfis import NotfisPayload, MinutaStructure, NotaFiscalItem
 from app.schemas.emissao import MinutaResult, EmissaoResponse
 from app.utils.mappers import minuta_to_shipment_payload, nota_to_invoice_payload
+from app.utils.raw_payload import RAW_PAYLOAD_TEXT, RAW_PAYLOAD_OFF, resolve_encoding, compress_raw_payload
 from app.services.localidades_service import LocalidadesService
 from app.services.emissao_exceptions import ValidationError, PersistenceError
 
 
+MODO_SERIAL = "serial"
+MODO_BULK = "bulk"
+MODO_CONCURRENT = "concurrent"
+MODOS_EMISSAO = (MODO_SERIAL, MODO_BULK, MODO_CONCURRENT)
+
+# Quantidade de chaves por IN na busca de notas já importadas
+LOOKUP_CHUNK_SIZE = 500
+
+AUDIT_LOG_FULL = "full"
+AUDIT_LOG_SUMMARY = "summary"
+
+
 class EmissaoService:
     """Serviço para processamento de emissões de minutas."""
 
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, session_factory=None):
         """Inicializa o serviço com uma sessão de banco de dados.
         
         Args:
             db: Sessão assíncrona do SQLAlchemy
+            session_factory: Fábrica de sessões dos workers do modo concurrent
+                (padrão: AsyncSessionLocal)
         """
         self.db = db
+        self.session_factory = session_factory or AsyncSessionLocal
+        # chave de acesso -> shipment_id das notas do lote que já existem no banco
+        self._chaves_existentes: dict[str, int] = {}
 
-    async def process_payload(self, payload: NotfisPayload, user: str) -> EmissaoResponse:
+    async def process_payload(self, payload: NotfisPayload, user: str, modo: Optional[str] = None) -> EmissaoResponse:
         """Processa um payload Notfis completo com múltiplas minutas.
         
-        Cada minuta é processada em uma transação isolada. Uma falha em uma
-        minuta não afeta as outras.
+        No modo serial cada minuta é processada em uma transação isolada. No
+        modo bulk o lote inteiro é persistido com INSERTs multi-row. No modo
+        concurrent as minutas são divididas entre workers paralelos. Em todos
+        uma falha em uma minuta não afeta as outras.
+        
+        Antes da gravação, as chaves de todas as notas do lote são buscadas em
+        uma única consulta indexada: minutas cujas notas já foram importadas
+        (reenvio) devolvem o shipment original sem passar pelo caminho de escrita.
         
         Args:
             payload: Payload Notfis validado pelo Pydantic
             user: Usuário autenticado que está fazendo a requisição
+            modo: "serial", "bulk" ou "concurrent"; se omitido usa settings.emissao_modo
             
         Returns:
             EmissaoResponse com resultados de cada minuta
         """
-        logger.debug("/emissao processing started by user=%s with %d minutas", user, len(payload.documentos))
+        modo = (modo or settings.emissao_modo or MODO_SERIAL).lower()
+        logger.debug("/emissao processing started by user=%s with %d minutas (modo=%s)", user, len(payload.documentos), modo)
         
-        results: list[MinutaResult] = []
+        results: list[Optional[MinutaResult]] = [None] * len(payload.documentos)
         
+        self._chaves_existentes = await self._lookup_chaves(
+            nf.chave for minuta_struct in payload.documentos for nf in minuta_struct.documentos
+        )
+        pendentes = []
         for idx, minuta_struct in enumerate(payload.documentos):
-            result = await self._process_minuta(idx, minuta_struct, user)
-            results.append(result)
+            results[idx] = self._replay_result(minuta_struct)
+            if results[idx] is None:
+                pendentes.append(idx)
+        if len(pendentes) < len(payload.documentos):
+            logger.info("/emissao replay: %d of %d minutas already imported", len(payload.documentos) - len(pendentes), len(payload.documentos))
+        
+        documentos = [payload.documentos[idx] for idx in pendentes]
+        if modo == MODO_BULK:
+            processed = await self._process_bulk(documentos, user)
+        elif modo == MODO_CONCURRENT:
+            processed = await self._process_concurrent(documentos, user)
+        else:
+            processed = []
+            for idx in pendentes:
+                result = await self._process_minuta(idx, payload.documentos[idx], user)
+                processed.append(result)
+        for idx, result in zip(pendentes, processed):
+            results[idx] = result
         
         # Determinar status global
-        all_success = all(r.status == 1 for r in results)
-        global_message = "Documento gerado no sistema" if all_success else "Houve erros no processamento"
-        global_status = 1 if all_success else 0
-        
-        response = EmissaoResponse(
-            message=global_message,
-            status=global_status,
-            data=results
-        )
+        response = EmissaoResponse.from_results(results)
         
         logger.debug("/emissao completed: %d success, %d failed", 
                     sum(1 for r in results if r.status == 1),
@@ -69,13 +120,18 @@ class EmissaoService:
         
         return response
 
-    async def _process_minuta(self, idx: int, minuta_struct: MinutaStructure, user: str) -> MinutaResult:
+    async def _process_minuta(self, idx: int, minuta_struct: MinutaStructure, user: str,
+                              raw_bytes: Optional[bytes] = None,
+                              prepared: Optional[tuple] = None) -> MinutaResult:
         """Processa uma única minuta com transação isolada.
         
         Args:
             idx: Índice da minuta no payload (para logging)
             minuta_struct: Estrutura da minuta com header, atores e documentos
             user: Usuário autenticado
+            raw_bytes: Bytes originais da minuta, quando disponíveis (stream NDJSON)
+            prepared: Tupla de _prepare_minuta (fallback do modo bulk): o payload bruto e o
+                comprimido são reaproveitados e a auditoria, já registrada, não se repete
             
         Returns:
             MinutaResult com status do processamento
@@ -83,30 +139,23 @@ class EmissaoService:
         try:
             logger.debug("Processing minuta index=%d user=%s", idx, user)
             
-            # Log raw payload para auditoria
-            raw = minuta_struct.model_dump() if hasattr(minuta_struct, 'model_dump') else minuta_struct.dict()
-            logger.info("Received minuta from %s: %s", user, json.dumps(raw, default=str))
+            # Payload bruto serializado uma única vez: serve à auditoria e ao raw_payload
+            if prepared is not None:
+                *_, raw_blob, raw = prepared
+            else:
+                raw = self._capture_raw(minuta_struct, raw_bytes)
+                self._audit_log(user, minuta_struct, raw)
+                raw_blob = self._raw_payload_blob(raw)
             
             # Processar em transação isolada
             async with self.db.begin():
-                shipment = await self._create_shipment(minuta_struct, raw)
+                shipment = await self._create_shipment(minuta_struct, raw, raw_blob)
                 success_count, failure_count = await self._create_invoices(shipment, minuta_struct.documentos)
             
             # Transação commitada com sucesso
             logger.debug("Minuta index=%d committed successfully, shipment id=%s", idx, shipment.id)
             
-            if failure_count > 0:
-                message = f"Importação realizada com sucesso (algumas notas falharam: {failure_count})"
-            else:
-                message = "Importação realizada com sucesso"
-            
-            return MinutaResult(
-                status=1,
-                message=message,
-                id=shipment.id,
-                invoice_count=success_count,
-                invoice_failures=failure_count if failure_count > 0 else None
-            )
+            return self._success_result(shipment.id, success_count, failure_count)
             
         except ValidationError as e:
             logger.warning("Validation error for minuta index=%d: %s", idx, e.message)
@@ -135,12 +184,461 @@ class EmissaoService:
                 id=None
             )
 
-    async def _create_shipment(self, minuta_struct: MinutaStructure, raw: dict) -> Shipment:
+    async def process_stream(self, chunks: AsyncIterator[bytes], user: str) -> AsyncIterator[MinutaResult]:
+        """Processa minutas em NDJSON (uma MinutaStructure por linha) conforme chegam.
+        
+        Cada linha é validada e persistida antes da próxima ser lida, então a
+        memória fica limitada a uma minuta por vez. Linhas inválidas geram um
+        MinutaResult de falha sem interromper o stream.
+        
+        Args:
+            chunks: Corpo da requisição em blocos de bytes
+            user: Usuário autenticado
+            
+        Yields:
+            MinutaResult de cada linha, na ordem recebida
+        """
+        idx = 0
+        async for line in self._iter_lines(chunks):
+            try:
+                minuta_struct = MinutaStructure.model_validate_json(line)
+            except PydanticValidationError as e:
+                first = (e.errors() or [{}])[0]
+                logger.warning("Validation error for streamed minuta index=%d: %s", idx, first)
+                yield MinutaResult(
+                    status=0,
+                    message=f"Erro de validação: {first.get('msg', str(e))}",
+                    id=None
+                )
+            else:
+                self._chaves_existentes = await self._lookup_chaves(nf.chave for nf in minuta_struct.documentos)
+                yield self._replay_result(minuta_struct) or await self._process_minuta(idx, minuta_struct, user, raw_bytes=line)
+            idx += 1
+        
+        logger.debug("/emissao/stream completed: %d minutas", idx)
+
+    @staticmethod
+    async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Divide um stream de bytes em linhas não vazias."""
+        buffer = bytearray()
+        async for chunk in chunks:
+            buffer.extend(chunk)
+            start = 0
+            while (end := buffer.find(b"\n", start)) != -1:
+                line = bytes(buffer[start:end])
+                start = end + 1
+                if line.strip():
+                    yield line
+            del buffer[:start]
+        if buffer.strip():
+            yield bytes(buffer)
+
+    async def _lookup_chaves(self, chaves) -> dict[str, int]:
+        """Busca quais chaves de NF-e já estão gravadas (índice único em access_key).
+        
+        Args:
+            chaves: Chaves de acesso das notas recebidas
+            
+        Returns:
+            Dict chave -> shipment_id das notas já existentes
+        """
+        chaves = sorted({c for c in chaves if c})
+        existentes: dict[str, int] = {}
+        if not chaves:
+            return existentes
+        
+        try:
+            async with self.db.begin():
+                for start in range(0, len(chaves), LOOKUP_CHUNK_SIZE):
+                    result = await self.db.execute(
+                        select(ShipmentInvoice.access_key, ShipmentInvoice.shipment_id)
+                        .where(ShipmentInvoice.access_key.in_(chaves[start:start + LOOKUP_CHUNK_SIZE]))
+                    )
+                    existentes.update({chave: shipment_id for chave, shipment_id in result.all()})
+        except Exception as e:
+            # Sem a consulta o lote segue pelo caminho normal; o índice único ainda barra duplicatas
+            logger.warning("Failed to look up existing access keys (continuing without replay): %s", e)
+            return {}
+        
+        return existentes
+
+    def _replay_result(self, minuta_struct: MinutaStructure) -> Optional[MinutaResult]:
+        """Retorna o resultado original se todas as notas da minuta já pertencem a um shipment.
+        
+        Args:
+            minuta_struct: Estrutura da minuta recebida
+            
+        Returns:
+            MinutaResult apontando para o shipment existente, ou None se a minuta é nova
+        """
+        chaves = [nf.chave for nf in minuta_struct.documentos if nf.chave]
+        if not chaves:
+            return None
+        
+        shipment_ids = {self._chaves_existentes.get(chave) for chave in chaves}
+        if None in shipment_ids or len(shipment_ids) != 1:
+            return None
+        
+        shipment_id = shipment_ids.pop()
+        logger.debug("Minuta already imported as shipment id=%s, returning original result", shipment_id)
+        return MinutaResult(
+            status=1,
+            message="Minuta já importada anteriormente",
+            id=shipment_id,
+            invoice_count=len(chaves)
+        )
+
+    def _check_nota_duplicada(self, nf: NotaFiscalItem) -> None:
+        """Rejeita nota cuja chave já foi importada em outro shipment.
+        
+        Raises:
+            ValidationError: Se a chave já existe no banco
+        """
+        shipment_id = self._chaves_existentes.get(nf.chave)
+        if shipment_id is not None:
+            raise ValidationError(f"Nota com chave {nf.chave} já importada (shipment {shipment_id})")
+
+    async def find_idempotent_response(self, key: str, user: str) -> Optional[EmissaoIdempotencyKey]:
+        """Busca a resposta gravada para um Idempotency-Key do usuário.
+        
+        Args:
+            key: Valor do header Idempotency-Key
+            user: Usuário autenticado
+            
+        Returns:
+            Registro com status HTTP e corpo da resposta original, ou None
+        """
+        async with self.db.begin():
+            result = await self.db.execute(
+                select(EmissaoIdempotencyKey).where(
+                    EmissaoIdempotencyKey.api_user == user,
+                    EmissaoIdempotencyKey.idempotency_key == key,
+                )
+            )
+            return result.scalar_one_or_none()
+
+    async def reserve_idempotency_key(self, key: str, user: str) -> Optional[EmissaoIdempotencyKey]:
+        """Reserva o Idempotency-Key antes do processamento (linha pendente sob a constraint única).
+        
+        Duas requisições simultâneas com a mesma chave não passam as duas: a segunda
+        recebe IntegrityError no INSERT e vê a reserva da primeira. Uma reserva sem
+        resposta há mais de EMISSAO_IDEMPOTENCY_STALE_SECONDS é de uma requisição que
+        morreu e é assumida por esta.
+        
+        Args:
+            key: Valor do header Idempotency-Key
+            user: Usuário autenticado
+            
+        Returns:
+            None se a chave foi reservada para esta requisição; senão o registro existente
+            (com resposta gravada, ou pendente se outra requisição ainda está processando)
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        try:
+            async with self.db.begin():
+                self.db.add(EmissaoIdempotencyKey(api_user=user, idempotency_key=key, reserved_at=now))
+            return None
+        except IntegrityError:
+            await self._safe_rollback()
+        
+        existing = await self.find_idempotent_response(key, user)
+        if existing is None or existing.status_code is not None:
+            return existing
+        
+        cutoff = now - datetime.timedelta(seconds=settings.emissao_idempotency_stale_seconds)
+        async with self.db.begin():
+            result = await self.db.execute(
+                update(EmissaoIdempotencyKey)
+                .where(
+                    EmissaoIdempotencyKey.id == existing.id,
+                    EmissaoIdempotencyKey.status_code.is_(None),
+                    EmissaoIdempotencyKey.reserved_at < cutoff,
+                )
+                .values(reserved_at=now)
+                # Sem avaliar o critério nos objetos da sessão (reserved_at do SQLite vem sem fuso)
+                .execution_options(synchronize_session=False)
+            )
+        if result.rowcount == 1:
+            logger.warning("Idempotency-Key=%s user=%s: taking over stale reservation", key, user)
+            return None
+        return existing
+
+    async def store_idempotent_response(self, key: str, user: str, status_code: int, response: dict) -> None:
+        """Grava a resposta na chave reservada por reserve_idempotency_key (best-effort).
+        
+        Args:
+            key: Valor do header Idempotency-Key
+            user: Usuário autenticado
+            status_code: Status HTTP devolvido ao cliente
+            response: Corpo JSON devolvido ao cliente
+        """
+        try:
+            async with self.db.begin():
+                await self.db.execute(
+                    update(EmissaoIdempotencyKey)
+                    .where(
+                        EmissaoIdempotencyKey.api_user == user,
+                        EmissaoIdempotencyKey.idempotency_key == key,
+                        EmissaoIdempotencyKey.status_code.is_(None),
+                    )
+                    .values(status_code=status_code, response=response)
+                )
+        except Exception as e:
+            logger.warning("Failed to store idempotency key=%s for user=%s: %s", key, user, e)
+            await self._safe_rollback()
+
+    async def release_idempotency_key(self, key: str, user: str) -> None:
+        """Desfaz a reserva de uma requisição que falhou, para o cliente poder repetir (best-effort)."""
+        try:
+            await self._safe_rollback()
+            async with self.db.begin():
+                await self.db.execute(
+                    delete(EmissaoIdempotencyKey).where(
+                        EmissaoIdempotencyKey.api_user == user,
+                        EmissaoIdempotencyKey.idempotency_key == key,
+                        EmissaoIdempotencyKey.status_code.is_(None),
+                    )
+                )
+        except Exception as e:
+            logger.warning("Failed to release idempotency key=%s for user=%s: %s", key, user, e)
+            await self._safe_rollback()
+
+    @staticmethod
+    def _capture_raw(minuta_struct: MinutaStructure, raw_bytes: Optional[bytes] = None) -> Optional[bytes]:
+        """Retorna o JSON bruto da minuta, serializando no máximo uma vez.
+        
+        Quando os bytes originais estão disponíveis eles são usados como estão.
+        Se nem o armazenamento nem a auditoria completa precisam do payload,
+        nada é serializado.
+        """
+        if raw_bytes is not None:
+            return raw_bytes
+        if resolve_encoding(settings.emissao_raw_payload) == RAW_PAYLOAD_OFF and settings.emissao_audit_log != AUDIT_LOG_FULL:
+            return None
+        return minuta_struct.model_dump_json().encode()
+
+    @staticmethod
+    def _audit_log(user: str, minuta_struct: MinutaStructure, raw: Optional[bytes]) -> None:
+        """Linha de auditoria da minuta recebida, conforme EMISSAO_AUDIT_LOG."""
+        mode = settings.emissao_audit_log
+        if mode == AUDIT_LOG_FULL:
+            logger.info("Received minuta from %s: %s", user, raw.decode(errors="replace") if raw is not None else None)
+        elif mode == AUDIT_LOG_SUMMARY:
+            logger.info("Received minuta from %s: nDocEmit=%s notas=%d bytes=%s",
+                        user, minuta_struct.minuta.nDocEmit, len(minuta_struct.documentos),
+                        len(raw) if raw is not None else "-")
+
+    @staticmethod
+    def _raw_payload_text(raw: Optional[bytes]) -> Optional[str]:
+        """Valor de Shipment.raw_payload (apenas no modo text)."""
+        if raw is None or resolve_encoding(settings.emissao_raw_payload) != RAW_PAYLOAD_TEXT:
+            return None
+        return raw.decode(errors="replace")
+
+    @staticmethod
+    def _raw_payload_blob(raw: Optional[bytes]) -> Optional[tuple[str, bytes]]:
+        """(encoding, dados comprimidos) para shipment_raw_payloads nos modos gzip/zstd."""
+        encoding = resolve_encoding(settings.emissao_raw_payload)
+        if raw is None or encoding in (RAW_PAYLOAD_TEXT, RAW_PAYLOAD_OFF):
+            return None
+        return encoding, compress_raw_payload(raw, encoding)
+
+    @staticmethod
+    def _success_result(shipment_id: int, success_count: int, failure_count: int) -> MinutaResult:
+        """Monta o MinutaResult de sucesso com a contagem de notas."""
+        if failure_count > 0:
+            message = f"Importação realizada com sucesso (algumas notas falharam: {failure_count})"
+        else:
+            message = "Importação realizada com sucesso"
+        
+        return MinutaResult(
+            status=1,
+            message=message,
+            id=shipment_id,
+            invoice_count=success_count,
+            invoice_failures=failure_count if failure_count > 0 else None
+        )
+
+    def _concurrency_limit(self) -> int:
+        """Número de workers do modo concurrent, limitado ao pool do engine."""
+        try:
+            pool_size = engine.pool.size()
+        except Exception:
+            pool_size = 1
+        configured = settings.emissao_concorrencia or pool_size
+        return max(1, min(configured, pool_size))
+
+    async def _process_concurrent(self, documentos: list[MinutaStructure], user: str) -> list[MinutaResult]:
+        """Processa as minutas em N workers, cada um com sua própria sessão.
+        
+        Cada worker consome minutas de uma fila compartilhada e as processa
+        pelo mesmo caminho do modo serial (transação isolada por minuta).
+        
+        Args:
+            documentos: Minutas do payload, na ordem recebida
+            user: Usuário autenticado
+            
+        Returns:
+            Lista de MinutaResult na mesma ordem de documentos
+        """
+        results: list[Optional[MinutaResult]] = [None] * len(documentos)
+        pending = iter(enumerate(documentos))
+        workers = min(self._concurrency_limit(), len(documentos))
+        logger.debug("Processing %d minutas with %d workers", len(documentos), workers)
+        
+        async def worker():
+            async with self.session_factory() as db:
+                service = EmissaoService(db, session_factory=self.session_factory)
+                service._chaves_existentes = self._chaves_existentes
+                for idx, minuta_struct in pending:
+                    results[idx] = await service._process_minuta(idx, minuta_struct, user)
+        
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return results
+
+    async def _process_bulk(self, documentos: list[MinutaStructure], user: str) -> list[MinutaResult]:
+        """Processa o lote inteiro com pré-validação em memória e INSERTs em lote.
+        
+        Minutas inválidas são reportadas sem tocar o banco. As válidas são
+        gravadas em uma única transação: um INSERT multi-row com RETURNING id
+        para os shipments e um executemany para as notas. Se a gravação em
+        lote falhar, o lote é reprocessado pelo caminho serial para que cada
+        minuta receba seu próprio resultado.
+        
+        Args:
+            documentos: Minutas do payload, na ordem recebida
+            user: Usuário autenticado
+            
+        Returns:
+            Lista de MinutaResult na mesma ordem de documentos
+        """
+        results: list[Optional[MinutaResult]] = [None] * len(documentos)
+        prepared = []
+        
+        for idx, minuta_struct in enumerate(documentos):
+            try:
+                prepared.append(self._prepare_minuta(idx, minuta_struct, user))
+            except ValidationError as e:
+                logger.warning("Validation error for minuta index=%d: %s", idx, e.message)
+                results[idx] = MinutaResult(status=0, message=f"Erro de validação: {e.message}", id=None)
+        
+        if prepared:
+            try:
+                shipment_ids = await self._bulk_insert(prepared)
+            except Exception as e:
+                logger.exception("Bulk insert failed for %d minutas, falling back to serial path: %s", len(prepared), e)
+                await self._safe_rollback()
+                for item in prepared:
+                    idx = item[0]
+                    results[idx] = await self._process_minuta(idx, documentos[idx], user, prepared=item)
+            else:
+                for (idx, _, invoice_rows, failure_count, *_), shipment_id in zip(prepared, shipment_ids):
+                    results[idx] = self._success_result(shipment_id, len(invoice_rows), failure_count)
+        
+        return results
+
+    def _prepare_minuta(self, idx: int, minuta_struct: MinutaStructure, user: str) -> tuple:
+        """Valida e mapeia uma minuta em memória, sem acessar o banco.
+        
+        Args:
+            idx: Índice da minuta no payload
+            minuta_struct: Estrutura da minuta validada
+            user: Usuário autenticado
+            
+        Returns:
+            Tuple (idx, shipment_row, invoice_rows, failure_count, raw_blob, raw), onde
+            raw_blob é o payload comprimido para shipment_raw_payloads (ou None) e raw
+            o JSON bruto já auditado (reaproveitado pelo fallback serial)
+            
+        Raises:
+            ValidationError: Se a minuta não puder ser mapeada para um Shipment
+        """
+        raw = self._capture_raw(minuta_struct)
+        self._audit_log(user, minuta_struct, raw)
+        
+        try:
+            shipment_row = minuta_to_shipment_payload(
+                minuta=minuta_struct.minuta,
+                rem=minuta_struct.rem,
+                dest=minuta_struct.dest,
+                toma=minuta_struct.toma,
+                receb=getattr(minuta_struct, 'receb', None),
+                raw_payload=self._raw_payload_text(raw)
+            )
+        except Exception as e:
+            raise ValidationError(f"Falha ao mapear minuta: {str(e)}")
+        
+        invoice_rows = []
+        failure_count = 0
+        for nf_idx, nf in enumerate(minuta_struct.documentos):
+            try:
+                self._validate_nota(nf)
+                self._check_nota_duplicada(nf)
+                invoice_row = nota_to_invoice_payload(nf)
+                invoice_row['remetente_ndoc'] = invoice_row.get('remetente_ndoc') or shipment_row.get('rem_nDoc')
+                invoice_rows.append(invoice_row)
+            except Exception as e:
+                failure_count += 1
+                logger.warning("Invalid nota index=%d for minuta index=%d: %s", nf_idx, idx, getattr(e, 'message', e))
+        
+        return idx, shipment_row, invoice_rows, failure_count, self._raw_payload_blob(raw), raw
+
+    async def _bulk_insert(self, prepared: list[tuple]) -> list[int]:
+        """Persiste as minutas pré-validadas em uma única transação.
+        
+        Args:
+            prepared: Tuplas retornadas por _prepare_minuta
+            
+        Returns:
+            IDs dos shipments criados, na mesma ordem de prepared
+        """
+        async with self.db.begin():
+            shipment_rows = []
+            for _, shipment_row, *_ in prepared:
+                # Enriquecimento trabalha sobre atributos; usa um holder em memória
+                holder = SimpleNamespace(id=None, **shipment_row)
+                await self._enrich_locations(holder)
+                row = vars(holder)
+                row.pop('id')
+                shipment_rows.append(row)
+            
+            # INSERT multi-row exige o mesmo conjunto de chaves em todas as linhas
+            columns = set().union(*shipment_rows)
+            shipment_rows = [{c: row.get(c) for c in columns} for row in shipment_rows]
+            
+            result = await self.db.execute(
+                insert(Shipment).returning(Shipment.id, sort_by_parameter_order=True),
+                shipment_rows,
+            )
+            shipment_ids = list(result.scalars().all())
+            
+            invoice_rows = [
+                {**invoice_row, 'shipment_id': shipment_id}
+                for (_, _, rows, *_), shipment_id in zip(prepared, shipment_ids)
+                for invoice_row in rows
+            ]
+            if invoice_rows:
+                await self.db.execute(insert(ShipmentInvoice), invoice_rows)
+            
+            raw_rows = [
+                {'shipment_id': shipment_id, 'encoding': blob[0], 'data': blob[1]}
+                for (_, _, _, _, blob, _), shipment_id in zip(prepared, shipment_ids)
+                if blob is not None
+            ]
+            if raw_rows:
+                await self.db.execute(insert(ShipmentRawPayload), raw_rows)
+        
+        logger.debug("Bulk insert committed: %d shipments, %d invoices", len(shipment_ids), len(invoice_rows))
+        return shipment_ids
+
+    async def _create_shipment(self, minuta_struct: MinutaStructure, raw: Optional[bytes],
+                               raw_blob: Optional[tuple[str, bytes]] = None) -> Shipment:
         """Cria e persiste um Shipment a partir da estrutura da minuta.
         
         Args:
             minuta_struct: Estrutura da minuta validada
-            raw: Payload raw para armazenamento
+            raw: Payload bruto (JSON) para armazenamento, conforme EMISSAO_RAW_PAYLOAD
+            raw_blob: raw já comprimido por _raw_payload_blob (None: comprime aqui)
             
         Returns:
             Shipment criado e persistido (com ID atribuído)
@@ -156,7 +654,7 @@ class EmissaoService:
                 dest=minuta_struct.dest,
                 toma=minuta_struct.toma,
                 receb=getattr(minuta_struct, 'receb', None),
-                raw_payload=json.dumps(raw, default=str)
+                raw_payload=self._raw_payload_text(raw)
             )
             
             # Criar e persistir
@@ -164,6 +662,10 @@ class EmissaoService:
             self.db.add(shipment)
             await self.db.flush()
             
+            blob = raw_blob if raw_blob is not None else self._raw_payload_blob(raw)
+            if blob is not None:
+                self.db.add(ShipmentRawPayload(shipment_id=shipment.id, encoding=blob[0], data=blob[1]))
+            
             logger.debug("Shipment created with id=%s, service_code=%s", 
                         shipment.id, shipment.service_code)
             
@@ -243,11 +745,8 @@ class EmissaoService:
         """
         logger.debug("Processing nota index=%d for shipment id=%s", idx, shipment.id)
         
-        # Validações (já são feitas pelo Pydantic, mas double-check)
-        if not nf.nDoc:
-            raise ValidationError("Campo obrigatório 'nDoc' não informado")
-        if not nf.chave or len(nf.chave) != 44:
-            raise ValidationError("Campo 'chave' inválido (deve ter 44 caracteres)")
+        self._validate_nota(nf)
+        self._check_nota_duplicada(nf)
         
         # Mapear e criar
         invoice_payload = nota_to_invoice_payload(nf, shipment_id=shipment.id)
@@ -260,6 +759,18 @@ class EmissaoService:
         
         return invoice
 
+    @staticmethod
+    def _validate_nota(nf: NotaFiscalItem) -> None:
+        """Validações da nota (já são feitas pelo Pydantic, mas double-check).
+        
+        Raises:
+            ValidationError: Se dados obrigatórios estiverem faltando
+        """
+        if not nf.nDoc:
+            raise ValidationError("Campo obrigatório 'nDoc' não informado")
+        if not nf.chave or len(nf.chave) != 44:
+            raise ValidationError("Campo 'chave' inválido (deve ter 44 caracteres)")
+
     async def _safe_rollback(self) -> None:
         """Executa rollback de forma segura, ignorando erros."""
         try:
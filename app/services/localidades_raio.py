@@ -0,0 +1,74 @@
+"""Índice em memória dos centróides dos municípios para GET /municipios/{codigo}/raio.
+
+Responsabilidades:
+- Guardar latitude/longitude (centróide importado do shapefile) de todos os municípios em
+  arrays NumPy e responder "municípios a até N km" com uma haversine vetorizada (~5.570 pontos)
+- Funcionar em qualquer banco: nenhuma função espacial é usada na consulta
+- Gerar candidatos para o refinamento pelos polígonos reais no PostGIS, com uma folga
+  (raio_envolvente_km da base e do candidato) que garante não perder nenhum município
+"""
+
+from typing import Iterable, Optional
+
+import numpy as np
+
+# Raio médio da Terra (IUGG), em km
+RAIO_TERRA_KM = 6371.0088
+
+# Folga relativa do filtro de candidatos (diferença entre esfera e elipsoide, arredondamentos)
+_FOLGA_CANDIDATOS = 1.01
+
+
+class CentroidIndex:
+    """Centróides dos municípios; as linhas são os dicionários devolvidos pela API."""
+
+    def __init__(self, rows: Iterable[dict]):
+        """Monta o índice.
+
+        Args:
+            rows: Dicionários com codigo_ibge, latitude, longitude, raio_envolvente_km (opcional)
+                e os campos de MunicipioRead (uuid, nome, estado)
+        """
+        # Ordenadas por nome: o filtro por máscara já devolve o resultado na ordem da API
+        self.rows = sorted(rows, key=lambda r: r["nome"])
+        self._posicao = {row["codigo_ibge"]: i for i, row in enumerate(self.rows)}
+        self._lat = np.radians(np.array([r["latitude"] for r in self.rows], dtype=np.float64))
+        self._lon = np.radians(np.array([r["longitude"] for r in self.rows], dtype=np.float64))
+        self._cos_lat = np.cos(self._lat)
+        self._envolvente = np.array([r.get("raio_envolvente_km") or 0.0 for r in self.rows], dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, codigo_ibge: int) -> bool:
+        return codigo_ibge in self._posicao
+
+    def distancias_km(self, codigo_ibge: int) -> Optional[np.ndarray]:
+        """Distância (haversine) do centróide da base ao de cada município, na ordem de self.rows."""
+        i = self._posicao.get(codigo_ibge)
+        if i is None:
+            return None
+        dlat = self._lat - self._lat[i]
+        dlon = self._lon - self._lon[i]
+        a = np.sin(dlat / 2) ** 2 + self._cos_lat[i] * self._cos_lat * np.sin(dlon / 2) ** 2
+        return 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def dentro_do_raio(self, codigo_ibge: int, raio_km: float) -> Optional[list[dict]]:
+        """Municípios cujo centróide está a até raio_km do centróide da base (None se a base não está no índice)."""
+        distancias = self.distancias_km(codigo_ibge)
+        if distancias is None:
+            return None
+        return [self.rows[i] for i in np.flatnonzero(distancias <= raio_km)]
+
+    def candidatos(self, codigo_ibge: int, raio_km: float) -> Optional[list[int]]:
+        """Códigos IBGE que podem ter o polígono a até raio_km do polígono da base.
+
+        Dois polígonos só ficam a até raio_km se os centróides estão a até
+        raio_km + raio_envolvente_km(base) + raio_envolvente_km(candidato).
+        """
+        distancias = self.distancias_km(codigo_ibge)
+        if distancias is None:
+            return None
+        i = self._posicao[codigo_ibge]
+        limite = (raio_km + self._envolvente[i] + self._envolvente) * _FOLGA_CANDIDATOS
+        return [self.rows[j]["codigo_ibge"] for j in np.flatnonzero(distancias <= limite)]
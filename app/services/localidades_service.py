@@ -1,13 +1,18 @@
 import asyncio
-import httpx
 import json
-
-from sqlalchemy import select, text, func, cast
+import time
+import uuid
+from typing import Optional
+from loguru import logger
+
+from sqlalchemy import select, text, func, cast, and_, or_, case, true, update, exists, inspect
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table
+from sqlalchemy.sql import Select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.engine import URL
 from sqlalchemy import create_engine
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import selectinload, joinedload, defer
+from sqlalchemy.orm import aliased, selectinload, joinedload, defer
 
 try:
     import geopandas as gpd
@@ -17,16 +22,20 @@ except ImportError:
         "As bibliotecas 'geopandas' e 'pandas' são necessárias para geoprocessamento."
     )
 
+from app.core.config import settings
 from app.models.localidades import Estado, Municipio
+from app.services.localidades_raio import CentroidIndex
+from app.services.localidades_sources import (
+    LocalidadesSnapshot,
+    LocalidadesSource,
+    fonte_padrao,
+)
 
 
 # -------------------------------------------------------------------
 # CONSTANTES
 # -------------------------------------------------------------------
 
-IBGE_ESTADOS_URL = "https://servicodados.ibge.gov.br/api/v1/localidades/estados"
-IBGE_MUNIS_URL = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios"
-
 SHAPEFILE_MUNICIPIOS_PATH = "./dados_geo/BR_Municipios_2024.shp"
 
 # Mapeamento de código IBGE do estado para sigla UF (fallback quando tabela municipios está vazia)
@@ -39,6 +48,35 @@ CODIGO_IBGE_TO_UF = {
     50: "MS", 51: "MT", 52: "GO", 53: "DF"
 }
 
+# Tabelas temporárias da sincronização (por conexão): o JSON do IBGE é carregado com
+# executemany e aplicado com um único INSERT ... ON CONFLICT por tabela
+_STAGING_METADATA = MetaData()
+_ESTADOS_STAGING = Table(
+    "localidades_stg_estados", _STAGING_METADATA,
+    Column("uuid", Estado.__table__.c.uuid.type),
+    Column("codigo_ibge", Integer, primary_key=True),
+    Column("sigla", String(2)),
+    Column("nome", String),
+    prefixes=["TEMPORARY"],
+)
+_MUNICIPIOS_STAGING = Table(
+    "localidades_stg_municipios", _STAGING_METADATA,
+    Column("uuid", Municipio.__table__.c.uuid.type),
+    Column("codigo_ibge", Integer, primary_key=True),
+    Column("nome", String),
+    Column("estado_codigo", Integer),
+    prefixes=["TEMPORARY"],
+)
+
+# Tabela gravada pela importação do shapefile (as colunas de geometria só existem com PostGIS)
+_TEMP_GEOMETRIA = Table(
+    "municipios_temp_geometria", MetaData(),
+    Column("codigo_ibge", Integer),
+    Column("latitude", Float),
+    Column("longitude", Float),
+    Column("raio_envolvente_km", Float),
+)
+
 
 # -------------------------------------------------------------------
 # SERVICE
@@ -46,41 +84,76 @@ CODIGO_IBGE_TO_UF = {
 
 class LocalidadesService:
 
+    # Cache em memória: codigo_ibge -> (municipio_nome, estado_codigo_ibge, estado_sigla).
+    # Carregado uma vez (startup ou primeiro uso) e invalidado ao fim da sincronização com o IBGE.
+    _municipios_cache: Optional[dict[int, tuple]] = None
+    _municipios_cache_lock = asyncio.Lock()
+    # Após uma carga que falhou, a próxima tentativa espera alguns segundos (time.monotonic)
+    _municipios_cache_retry_at: float = 0.0
+    _MUNICIPIOS_CACHE_RETRY_SECONDS = 5.0
+
+    # Índice de centróides da consulta por raio (mesmo ciclo de vida do cache acima)
+    _indice_raio: Optional[CentroidIndex] = None
+    _indice_raio_lock = asyncio.Lock()
+    # Resultado de _postgis_available, consultado uma vez por processo
+    _postgis: Optional[bool] = None
+
     @staticmethod
-    async def _find_municipio_info_by_codigo(db: AsyncSession, codigo_ibge: int):
-        """Return (municipio_codigo, municipio_nome, estado_codigo, estado_sigla) or (None,None,None,None) if not found."""
-        print(f"      [DEBUG] _find_municipio_info_by_codigo called with codigo_ibge={codigo_ibge} (type={type(codigo_ibge).__name__})")
+    async def _load_municipios_cache(db: AsyncSession) -> int:
         try:
-            # First, check if table and records exist
-            count_result = await db.execute(text("SELECT COUNT(*) FROM municipios"))
-            total_count = count_result.scalar()
-            print(f"      [DEBUG] Total municipios in DB: {total_count}")
-            
-            # Try to check if specific codigo exists
-            check_result = await db.execute(text("SELECT codigo_ibge, nome FROM municipios WHERE codigo_ibge = :codigo LIMIT 1"), {"codigo": codigo_ibge})
-            check_row = check_result.first()
-            print(f"      [DEBUG] Raw SQL query result: {check_row}")
-            
-            # Use savepoint to isolate query failures - if the table doesn't exist or query fails,
-            # only this savepoint is aborted, not the parent transaction
+            # Savepoint: a failing query must not abort the caller's transaction (e.g. emissão)
             async with db.begin_nested():
-                # IMPORTANT: defer(Municipio.geometria) to avoid PostGIS function calls
-                result = await db.execute(select(Municipio).options(selectinload(Municipio.estado), defer(Municipio.geometria)).where(Municipio.codigo_ibge == codigo_ibge))
-                muni = result.scalar_one_or_none()
-                print(f"      [DEBUG] ORM Query result: muni={muni}")
-                if muni:
-                    print(f"      [DEBUG] Found municipio: codigo_ibge={muni.codigo_ibge} (type={type(muni.codigo_ibge).__name__}), nome={muni.nome}")
-                    estado = muni.estado
-                    print(f"      [DEBUG] Estado: {estado}, codigo_ibge={estado.codigo_ibge if estado else None}, sigla={estado.sigla if estado else None}")
-                    return muni.codigo_ibge, muni.nome, (estado.codigo_ibge if estado else None), (estado.sigla if estado else None)
-                else:
-                    print(f"      [DEBUG] No municipio found with codigo_ibge={codigo_ibge}")
-                    return None, None, None, None
+                result = await db.execute(
+                    select(Municipio.codigo_ibge, Municipio.nome, Estado.codigo_ibge, Estado.sigla)
+                    .join(Estado, Municipio.estado_uuid == Estado.uuid)
+                )
+                cache = {row[0]: (row[1], row[2], row[3]) for row in result.all()}
         except Exception as e:
-            print(f"      [DEBUG] Exception in _find_municipio_info_by_codigo: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
+            # Mantém o cache como None: uma consulta posterior tenta carregar de novo
+            logger.warning(f"Failed to load municipios cache: {type(e).__name__}: {e}")
+            LocalidadesService._municipios_cache_retry_at = (
+                time.monotonic() + LocalidadesService._MUNICIPIOS_CACHE_RETRY_SECONDS
+            )
+            return 0
+        LocalidadesService._municipios_cache = cache
+        logger.info(f"{len(cache)} municipios carregados no cache")
+        return len(cache)
+
+    @staticmethod
+    async def carregar_cache_municipios(db: AsyncSession) -> int:
+        """Load all municipios (with their estado) into the process-wide cache with a single query.
+
+        Returns the number of cached municipios. If the query fails (e.g. tables not created yet)
+        the cache stays unloaded and 0 is returned; lookups fall back to CODIGO_IBGE_TO_UF and the
+        load is retried by the first lookup after _MUNICIPIOS_CACHE_RETRY_SECONDS.
+        """
+        async with LocalidadesService._municipios_cache_lock:
+            return await LocalidadesService._load_municipios_cache(db)
+
+    @staticmethod
+    def invalidar_cache_municipios() -> None:
+        """Drop the municipios cache; it is reloaded on the next lookup."""
+        LocalidadesService._municipios_cache = None
+        LocalidadesService._municipios_cache_retry_at = 0.0
+
+    @staticmethod
+    async def _find_municipio_info_by_codigo(db: AsyncSession, codigo_ibge: int):
+        """Return (municipio_codigo, municipio_nome, estado_codigo, estado_sigla) or (None,None,None,None) if not found.
+
+        Served from the in-memory cache; the DB is only queried to (re)load the cache when it is not
+        loaded (after a failed load, at most once per _MUNICIPIOS_CACHE_RETRY_SECONDS).
+        """
+        if (LocalidadesService._municipios_cache is None
+                and time.monotonic() >= LocalidadesService._municipios_cache_retry_at):
+            async with LocalidadesService._municipios_cache_lock:
+                if (LocalidadesService._municipios_cache is None
+                        and time.monotonic() >= LocalidadesService._municipios_cache_retry_at):
+                    await LocalidadesService._load_municipios_cache(db)
+        info = (LocalidadesService._municipios_cache or {}).get(codigo_ibge)
+        if info is None:
             return None, None, None, None
+        municipio_nome, estado_codigo, estado_sigla = info
+        return codigo_ibge, municipio_nome, estado_codigo, estado_sigla
 
     @staticmethod
     async def set_shipment_locations(db: AsyncSession, shipment):
@@ -92,8 +165,6 @@ class LocalidadesService:
         Também preenche os campos JSON 'origem' e 'destino' baseados em rem_cMun e dest_cMun.
         Usa fallback para extrair UF do código IBGE quando a tabela municipios está vazia.
         """
-        print(f"\n[DEBUG] set_shipment_locations INICIADO para shipment_id={shipment.id}")
-        
         # Mapping config: field -> (ibge_source_attr, uf_attr, estado_codigo_attr, municipio_codigo_attr, municipio_nome_attr)
         mapping = {
             'rem': ('rem_cMun', 'rem_uf', 'rem_estado_codigo_ibge', 'rem_municipio_codigo_ibge', 'rem_municipio_nome'),
@@ -110,87 +181,52 @@ class LocalidadesService:
         for key, (src_attr, uf_attr, estado_attr, municipio_attr, municipio_nome_attr) in mapping.items():
             try:
                 val = getattr(shipment, src_attr, None)
-                print(f"  [DEBUG] Processando '{key}': {src_attr}={val}")
-                
                 if val is None:
-                    print(f"    [DEBUG] {src_attr} é None, pulando...")
                     continue
-                    
+
                 # normalize numeric IBGE if provided as string
                 try:
                     codigo = int(str(val).strip())
-                except Exception as e:
-                    print(f"    [DEBUG] Erro ao converter para int: {e}")
+                except (TypeError, ValueError):
                     codigo = None
 
                 if codigo:
-                    print(f"    [DEBUG] Código IBGE extraído: {codigo}")
-                    
-                    # Tenta buscar no banco primeiro
+                    # Busca no cache de municípios (sem consulta ao banco no caminho quente)
                     muni_codigo, muni_nome, est_codigo, est_sigla = await LocalidadesService._find_municipio_info_by_codigo(db, codigo)
-                    print(f"    [DEBUG] Resultado DB: muni_codigo={muni_codigo}, muni_nome={muni_nome}, est_codigo={est_codigo}, est_sigla={est_sigla}")
-                    
+
                     # Fallback: extrair UF do código IBGE (2 primeiros dígitos = código do estado)
                     if est_sigla is None and codigo >= 1000000:
                         estado_codigo = codigo // 100000  # Extrai os 2 primeiros dígitos
                         est_sigla = CODIGO_IBGE_TO_UF.get(estado_codigo)
                         est_codigo = estado_codigo
                         muni_codigo = codigo
-                        print(f"    [DEBUG] Usando FALLBACK: estado_codigo={estado_codigo}, est_sigla={est_sigla}")
-                    
+                        logger.debug(f"Municipio {codigo} not in cache, UF {est_sigla} taken from the IBGE code")
+
                     if muni_codigo is not None:
                         setattr(shipment, municipio_attr, muni_codigo)
-                        print(f"    [DEBUG] setattr({municipio_attr}, {muni_codigo})")
-                        
                     if muni_nome:
                         setattr(shipment, municipio_nome_attr, muni_nome)
-                        print(f"    [DEBUG] setattr({municipio_nome_attr}, {muni_nome})")
-                        
                     if est_codigo is not None:
                         setattr(shipment, estado_attr, est_codigo)
-                        print(f"    [DEBUG] setattr({estado_attr}, {est_codigo})")
-                        
                     if est_sigla:
                         setattr(shipment, uf_attr, est_sigla)
-                        print(f"    [DEBUG] setattr({uf_attr}, {est_sigla})")
-                    
+
                     # Capturar dados para campos JSON consolidados
                     if key == 'rem' and est_sigla:
                         origem_data = {"uf": est_sigla, "municipio": muni_nome or str(codigo)}
-                        print(f"    [DEBUG] origem_data definido: {origem_data}")
                     elif key == 'dest' and est_sigla:
                         destino_data = {"uf": est_sigla, "municipio": muni_nome or str(codigo)}
-                        print(f"    [DEBUG] destino_data definido: {destino_data}")
-                else:
-                    print(f"    [DEBUG] codigo é None, pulando...")
-                        
+
             except Exception as e:
                 # Best-effort: do not raise; just log and continue
-                print(f"[WARN] set_shipment_locations failed for {key}: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.opt(exception=e).warning(f"set_shipment_locations failed for {key}: {e}")
                 continue
 
         # Preencher campos JSON consolidados
-        print(f"\n  [DEBUG] Antes de atribuir JSON: origem_data={origem_data}, destino_data={destino_data}")
-        print(f"  [DEBUG] Antes de atribuir: shipment.origem={getattr(shipment, 'origem', 'ATTR_NOT_EXIST')}")
-        print(f"  [DEBUG] Antes de atribuir: shipment.destino={getattr(shipment, 'destino', 'ATTR_NOT_EXIST')}")
-        
         if origem_data:
             shipment.origem = origem_data
-            print(f"  [DEBUG] shipment.origem atribuído: {shipment.origem}")
-        else:
-            print(f"  [DEBUG] origem_data é None/falsy, não atribuindo")
-            
         if destino_data:
             shipment.destino = destino_data
-            print(f"  [DEBUG] shipment.destino atribuído: {shipment.destino}")
-        else:
-            print(f"  [DEBUG] destino_data é None/falsy, não atribuindo")
-        
-        print(f"  [DEBUG] Depois de atribuir: shipment.origem={getattr(shipment, 'origem', 'ATTR_NOT_EXIST')}")
-        print(f"  [DEBUG] Depois de atribuir: shipment.destino={getattr(shipment, 'destino', 'ATTR_NOT_EXIST')}")
-        print(f"[DEBUG] set_shipment_locations FINALIZADO para shipment_id={shipment.id}\n")
 
 
     # ===============================================================
@@ -204,6 +240,9 @@ class LocalidadesService:
 
         url: URL = async_engine.url
 
+        if url.get_backend_name() == "sqlite":
+            return url.set(drivername="sqlite").render_as_string(hide_password=False)
+
         return (
             f"postgresql+psycopg2://{url.username}:{url.password}"
             f"@{url.host}:{url.port}/{url.database}"
@@ -218,54 +257,137 @@ class LocalidadesService:
     async def _postgis_available(db: AsyncSession) -> bool:
         """Detect if the PostGIS extension is installed in the connected DB.
 
-        Best-effort: returns False if the check fails for any reason.
+        Best-effort: returns False if the check fails for any reason. The result is cached
+        per process and reset by invalidar_indice_raio (end of each sync).
         """
+        if LocalidadesService._postgis is None:
+            if db.get_bind().dialect.name != "postgresql":
+                LocalidadesService._postgis = False
+            else:
+                try:
+                    result = await db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'postgis' LIMIT 1"))
+                    LocalidadesService._postgis = result.scalar_one_or_none() is not None
+                except Exception:
+                    return False
+        return LocalidadesService._postgis
+
+    @staticmethod
+    async def _load_indice_raio(db: AsyncSession) -> CentroidIndex:
+        """Carrega os centróides de todos os municípios (uma consulta) no índice em memória."""
         try:
-            result = await db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'postgis' LIMIT 1"))
-            return result.scalar_one_or_none() is not None
-        except Exception:
-            return False
+            # Savepoint: a failing query must not abort the caller's transaction
+            async with db.begin_nested():
+                result = await db.execute(
+                    select(
+                        Municipio.uuid, Municipio.codigo_ibge, Municipio.nome,
+                        Municipio.latitude, Municipio.longitude, Municipio.raio_envolvente_km,
+                        Estado.uuid, Estado.nome, Estado.sigla,
+                    )
+                    .join(Estado, Municipio.estado_uuid == Estado.uuid)
+                    .where(Municipio.latitude.isnot(None), Municipio.longitude.isnot(None))
+                )
+                rows = [
+                    {
+                        "uuid": m_uuid, "codigo_ibge": codigo, "nome": nome,
+                        "latitude": lat, "longitude": lon, "raio_envolvente_km": envolvente,
+                        "estado": {"uuid": e_uuid, "nome": e_nome, "sigla": e_sigla},
+                    }
+                    for m_uuid, codigo, nome, lat, lon, envolvente, e_uuid, e_nome, e_sigla in result.all()
+                ]
+        except Exception as e:
+            logger.warning(f"Failed to load centroid index: {type(e).__name__}: {e}")
+            rows = []
+        indice = CentroidIndex(rows)
+        LocalidadesService._indice_raio = indice
+        logger.info(f"{len(indice)} centróides de municípios carregados")
+        return indice
+
+    @staticmethod
+    async def carregar_indice_raio(db: AsyncSession) -> CentroidIndex:
+        """Índice de centróides da consulta por raio, carregado no primeiro uso."""
+        indice = LocalidadesService._indice_raio
+        if indice is None:
+            async with LocalidadesService._indice_raio_lock:
+                indice = LocalidadesService._indice_raio
+                if indice is None:
+                    indice = await LocalidadesService._load_indice_raio(db)
+        return indice
 
     @staticmethod
-    async def get_municipios_por_raio(db: AsyncSession, codigo_ibge: int, raio_km: float):
+    def invalidar_indice_raio() -> None:
+        """Descarta o índice de centróides (e a detecção de PostGIS); recarregados no próximo uso."""
+        LocalidadesService._indice_raio = None
+        LocalidadesService._postgis = None
+
+    @staticmethod
+    async def get_municipios_por_raio(
+        db: AsyncSession, codigo_ibge: int, raio_km: float, refinar: Optional[bool] = None,
+    ):
         """
         Retorna municípios dentro de um raio (em km) a partir de um município base.
 
-        Raises PostGisUnavailableError when PostGIS isn't available.
+        Por padrão responde pelo índice de centróides em memória (qualquer banco): entram os
+        municípios cujo centróide está a até raio_km do centróide da base. Com refinar
+        (padrão: LOCALIDADES_RAIO_REFINAR) os candidatos do índice são testados com
+        ST_DWithin nos polígonos. Sem centróide importado para a base, usa só o PostGIS.
+
+        Raises PostGisUnavailableError when the answer needs PostGIS and it isn't available.
         """
+        if refinar is None:
+            refinar = settings.localidades_raio_refinar
+
+        indice = await LocalidadesService.carregar_indice_raio(db)
+        if codigo_ibge in indice and not refinar:
+            return indice.dentro_do_raio(codigo_ibge, raio_km)
 
         # Ensure PostGIS is available before running spatial queries
         if not await LocalidadesService._postgis_available(db):
+            if codigo_ibge not in indice and not await db.scalar(
+                select(exists().where(Municipio.codigo_ibge == codigo_ibge))
+            ):
+                return None
             raise LocalidadesService.PostGisUnavailableError(
                 "Spatial features not available: PostGIS extension is not enabled"
+                + ("" if codigo_ibge in indice else " and the municipio has no imported centroid")
             )
 
-        result = await db.execute(
-            select(Municipio.geometria).where(Municipio.codigo_ibge == codigo_ibge)
-        )
-        geom_base = result.scalar_one_or_none()
-
-        if not geom_base:
-            return None
-
         stmt = (
             select(Municipio)
-            .options(joinedload(Municipio.estado))
-            .where(
-                func.ST_DWithin(
-                    Municipio.geometria,
-                    func.ST_Transform(geom_base, 3857),
-                    raio_km * 1000
-                )
-            )
+            .options(joinedload(Municipio.estado), defer(Municipio.geometria))
+            .where(*LocalidadesService._filtro_raio_postgis(codigo_ibge, raio_km))
             .order_by(Municipio.nome)
         )
+        if codigo_ibge in indice:
+            stmt = stmt.where(Municipio.codigo_ibge.in_(indice.candidatos(codigo_ibge, raio_km)))
+        elif not await db.scalar(
+            select(exists().where(Municipio.codigo_ibge == codigo_ibge, Municipio.geometria.isnot(None)))
+        ):
+            return None
 
         result = await db.execute(stmt)
-        results = result.scalars().all()
-        for r in results:
-            r.codigo_ibge = str(r.codigo_ibge)
-        return results
+        return result.scalars().all()
+
+    @staticmethod
+    def _filtro_raio_postgis(codigo_ibge: int, raio_km: float) -> list:
+        """Condições "polígono a até raio_km do polígono da base", da mais barata para a exata.
+
+        1. bbox da geometria simplificada (&&, índice GiST) contra a bbox da base simplificada
+           expandida por raio + 2 * tolerância: cada simplificada fica a até uma tolerância da
+           original, então nenhum município dentro do raio é descartado
+        2. ST_DWithin na geometria completa, só para os que passaram pelo pré-filtro
+        """
+        raio_m = raio_km * 1000
+        folga_m = 2 * settings.localidades_simplificacao_m
+        # Alias: sem ele a subconsulta seria correlacionada com o município da consulta externa
+        base = aliased(Municipio)
+        base_simplificada = (
+            select(base.geometria_simplificada).where(base.codigo_ibge == codigo_ibge).scalar_subquery()
+        )
+        base_geometria = select(base.geometria).where(base.codigo_ibge == codigo_ibge).scalar_subquery()
+        return [
+            Municipio.geometria_simplificada.op("&&")(func.ST_Expand(base_simplificada, raio_m + folga_m)),
+            func.ST_DWithin(Municipio.geometria, base_geometria, raio_m),
+        ]
 
     # CONSULTAS
     @staticmethod
@@ -312,9 +434,10 @@ class LocalidadesService:
     # FUNÇÃO SÍNCRONA — SHAPEFILE
     # ===============================================================
     @staticmethod
-    def _importar_municipios_do_shapefile_sync(db_url: str):
+    def _importar_municipios_do_shapefile_sync(db_url: str, postgis: bool = True):
+        """Grava o shapefile em municipios_temp_geometria: centróides sempre, geometria com PostGIS."""
         try:
-            print(f"[SHP] Lendo: {SHAPEFILE_MUNICIPIOS_PATH}")
+            logger.info(f"Lendo shapefile {SHAPEFILE_MUNICIPIOS_PATH}")
             gdf = gpd.read_file(SHAPEFILE_MUNICIPIOS_PATH)
 
             gdf = gdf.rename(columns={
@@ -330,173 +453,252 @@ class LocalidadesService:
             if gdf.crs is None or gdf.crs.to_epsg() != 4674:
                 gdf = gdf.set_crs(epsg=4674, allow_override=True)
 
-            # Converte para CRS métrico (EPSG:3857) para permitir consultas espaciais eficientes
-            gdf = gdf.to_crs(epsg=3857)
+            # Centróide e raio envolvente (maior distância do centróide ao contorno) na
+            # projeção policônica do Brasil (EPSG:5880, métrica); centróide gravado em graus
+            metrico = gdf.geometry.to_crs(epsg=5880)
+            centroides = metrico.centroid
+            gdf["raio_envolvente_km"] = metrico.hausdorff_distance(centroides) / 1000.0
+            centroides = centroides.to_crs(epsg=4674)
+            gdf["latitude"] = centroides.y
+            gdf["longitude"] = centroides.x
 
             engine = create_engine(db_url)
 
             with engine.begin() as conn:
-                gdf.to_postgis(
-                    name="municipios_temp_geometria",
-                    con=conn,
-                    if_exists="replace",
-                    schema="public",
-                    index=True,
-                    chunksize=1000,
-                )
+                if postgis:
+                    # Converte para CRS métrico (EPSG:3857) para permitir consultas espaciais eficientes
+                    gdf.to_crs(epsg=3857).to_postgis(
+                        name="municipios_temp_geometria",
+                        con=conn,
+                        if_exists="replace",
+                        schema="public",
+                        index=True,
+                        chunksize=1000,
+                    )
+                else:
+                    pd.DataFrame(gdf[[c.name for c in _TEMP_GEOMETRIA.columns]]).to_sql(
+                        name="municipios_temp_geometria",
+                        con=conn,
+                        if_exists="replace",
+                        index=False,
+                        chunksize=1000,
+                    )
 
-            print("[SHP] Importação concluída.")
+            logger.info("Importação do shapefile concluída")
             return True
 
         except Exception as e:
-            print(f"[ERRO SHP] {type(e).__name__}: {e}")
+            logger.error(f"Shapefile import failed: {type(e).__name__}: {e}")
             return False
 
     # ===============================================================
     # SINCRONIZAÇÃO COMPLETA
     # ===============================================================
     @staticmethod
-    async def sincronizar_com_ibge(db: AsyncSession):
+    async def _carregar_staging(db: AsyncSession, staging: Table, rows: list[dict]) -> None:
+        """(Re)cria a tabela temporária na conexão da sessão e carrega as linhas (executemany)."""
+        conn = await db.connection()
+        await conn.execute(text(f"DROP TABLE IF EXISTS {staging.name}"))
+        await conn.run_sync(staging.create)
+        if rows:
+            await db.execute(staging.insert(), rows)
 
-        print("=== SINCRONIZAÇÃO DE LOCALIDADES ===")
+    @staticmethod
+    async def _upsert_from_select(db: AsyncSession, target: Table, source: Select, update_columns: list[str]) -> dict:
+        """INSERT ... SELECT ... ON CONFLICT (codigo_ibge) DO UPDATE, só nas linhas que mudaram.
 
-        db_url_sync = LocalidadesService._get_sync_db_url(db)
+        Args:
+            source: SELECT com as colunas de target (uuid, codigo_ibge e update_columns)
 
-        async with httpx.AsyncClient(timeout=60) as client:
+        Returns:
+            Contagens {"inserted", "updated", "unchanged"}
+        """
+        src = source.subquery()
+        same = and_(*(target.c[col] == src.c[col] for col in update_columns))
+        total, matched, unchanged = (await db.execute(
+            select(
+                func.count(),
+                func.count(target.c.codigo_ibge),
+                func.coalesce(func.sum(case((same, 1), else_=0)), 0),
+            ).select_from(src.outerjoin(target, target.c.codigo_ibge == src.c.codigo_ibge))
+        )).one()
+
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+
+        columns = ["uuid", "codigo_ibge", *update_columns]
+        # WHERE true: no SQLite, INSERT ... SELECT seguido de ON CONFLICT exige uma cláusula WHERE
+        stmt = upsert(target).from_select(columns, select(*(src.c[col] for col in columns)).where(true()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[target.c.codigo_ibge],
+            set_={col: stmt.excluded[col] for col in update_columns},
+            where=or_(*(target.c[col] != stmt.excluded[col] for col in update_columns)),
+        )
+        await db.execute(stmt)
+        return {"inserted": total - matched, "updated": matched - unchanged, "unchanged": unchanged}
 
-            # ----------------------------------------------------------
-            # ESTADOS
-            # ----------------------------------------------------------
-            estados = (await client.get(IBGE_ESTADOS_URL)).json()
-            estado_map = {}
+    @staticmethod
+    async def _sincronizar_estados(db: AsyncSession, estados: list[dict]) -> dict:
+        """Upsert set-based dos estados (sem commit)."""
+        rows = {e["id"]: {"uuid": uuid.uuid4(), "codigo_ibge": e["id"], "sigla": e["sigla"], "nome": e["nome"]} for e in estados}
+        await LocalidadesService._carregar_staging(db, _ESTADOS_STAGING, list(rows.values()))
+        try:
+            return await LocalidadesService._upsert_from_select(
+                db, Estado.__table__, select(_ESTADOS_STAGING), ["sigla", "nome"],
+            )
+        finally:
+            await db.execute(text(f"DROP TABLE IF EXISTS {_ESTADOS_STAGING.name}"))
 
-            for e in estados:
-                result = await db.execute(
-                    select(Estado).where(Estado.codigo_ibge == e["id"])
-                )
-                estado = result.scalar_one_or_none()
+    @staticmethod
+    async def _sincronizar_municipios(db: AsyncSession, municipios: list[dict]) -> dict:
+        """Upsert set-based dos municípios (sem commit, sem geometria).
 
-                if not estado:
-                    estado = Estado(
-                        codigo_ibge=e["id"],
-                        sigla=e["sigla"],
-                        nome=e["nome"],
-                    )
-                    db.add(estado)
-                else:
-                    estado.sigla = e["sigla"]
-                    estado.nome = e["nome"]
+        Municípios sem UF ou de estado desconhecido são ignorados e contados em "ignored".
+        """
+        rows = {}
+        for m in municipios:
+            if m["uf_id"] is not None:
+                rows[m["id"]] = {"uuid": uuid.uuid4(), "codigo_ibge": m["id"], "nome": m["nome"], "estado_codigo": m["uf_id"]}
+        await LocalidadesService._carregar_staging(db, _MUNICIPIOS_STAGING, list(rows.values()))
+
+        stg, estados = _MUNICIPIOS_STAGING, Estado.__table__
+        source = (
+            select(stg.c.uuid, stg.c.codigo_ibge, stg.c.nome, estados.c.uuid.label("estado_uuid"))
+            .join(estados, estados.c.codigo_ibge == stg.c.estado_codigo)
+        )
+        try:
+            counts = await LocalidadesService._upsert_from_select(
+                db, Municipio.__table__, source, ["nome", "estado_uuid"],
+            )
+        finally:
+            await db.execute(text(f"DROP TABLE IF EXISTS {stg.name}"))
+        counts["ignored"] = len(municipios) - sum(counts.values())
+        return counts
 
-                estado_map[e["id"]] = estado
+    # Fases da sincronização; cada uma faz o próprio commit, então a sincronização em
+    # background (LocalidadesSyncJob) pode retomar a partir da fase que falhou
+    @staticmethod
+    async def sincronizar_estados(db: AsyncSession, snapshot: LocalidadesSnapshot) -> dict:
+        """Fase "estados": grava os estados do snapshot."""
+        contagens = await LocalidadesService._sincronizar_estados(db, snapshot.estados)
+        await db.commit()
+        logger.info(f"Estados sincronizados: {contagens}")
+        return contagens
 
-            await db.commit()
-            print("✔ Estados sincronizados")
-
-            # ----------------------------------------------------------
-            # MUNICÍPIOS (SEM GEOMETRIA)
-            # ----------------------------------------------------------
-            municipios = (await client.get(IBGE_MUNIS_URL)).json()
-
-            # Detect PostGIS availability for later decisions
-            has_postgis = await LocalidadesService._postgis_available(db)
-
-            for m in municipios:
-                microrregiao = m.get("microrregiao")
-                mesorregiao = microrregiao.get("mesorregiao") if isinstance(microrregiao, dict) else {}
-                uf = mesorregiao.get("UF") if isinstance(mesorregiao, dict) else {}
-                uf_uuid = uf.get("id") if isinstance(uf, dict) else None
-                if not uf_uuid:
-                    continue
+    @staticmethod
+    async def sincronizar_municipios(db: AsyncSession, snapshot: LocalidadesSnapshot) -> dict:
+        """Fase "municipios": grava os municípios do snapshot (sem geometria)."""
+        contagens = await LocalidadesService._sincronizar_municipios(db, snapshot.municipios)
+        await db.commit()
+        LocalidadesService.invalidar_cache_municipios()
+        LocalidadesService.invalidar_indice_raio()
+        logger.info(f"Municípios sincronizados: {contagens}")
+        return contagens
 
-                estado = estado_map.get(uf_uuid)
-                if not estado:
-                    continue
+    @staticmethod
+    async def importar_shapefile(db: AsyncSession) -> bool:
+        """Fase "shapefile": carrega o shapefile em municipios_temp_geometria (em thread)."""
+        logger.info("Importando geometria")
+        postgis = await LocalidadesService._postgis_available(db)
+        return await asyncio.to_thread(
+            LocalidadesService._importar_municipios_do_shapefile_sync,
+            LocalidadesService._get_sync_db_url(db),
+            postgis,
+        )
 
-                try:
-                    # Prevent premature autoflush (which can trigger geometry binders) while we read/modify
-                    with db.no_autoflush:
-                        result = await db.execute(
-                            select(Municipio).options(defer(Municipio.geometria))
-                            .where(Municipio.codigo_ibge == m["id"])
-                        )
-                        municipio = result.scalar_one_or_none()
-
-                    if not municipio:
-                        # If PostGIS is not available, avoid GeoAlchemy geometry binders by using raw INSERT
-                        if not has_postgis:
-                            import uuid as _uuid
-                            await db.execute(text(
-                                "INSERT INTO municipios (uuid, codigo_ibge, nome, estado_uuid) VALUES (:uuid, :codigo_ibge, :nome, :estado_uuid)"
-                            ), {
-                                "uuid": str(_uuid.uuid4()),
-                                "codigo_ibge": m["id"],
-                                "nome": m["nome"],
-                                "estado_uuid": str(estado.uuid),
-                            })
-                        else:
-                            db.add(Municipio(
-                                codigo_ibge=m["id"],
-                                nome=m["nome"],
-                                estado_uuid=estado.uuid,
-                            ))
-                    else:
-                        # Update existing - use raw UPDATE when PostGIS unavailable to avoid geometry binders
-                        if not has_postgis:
-                            await db.execute(text(
-                                "UPDATE municipios SET nome = :nome, estado_uuid = :estado WHERE codigo_ibge = :codigo_ibge"
-                            ), {"nome": m["nome"], "estado": str(estado.uuid), "codigo_ibge": m["id"]})
-                        else:
-                            municipio.nome = m["nome"]
-                            municipio.estado_uuid = estado.uuid
-
-                except Exception as e:
-                    # Log and skip this municipio; continue with the rest
-                    print(f"[WARN] failed to process municipio {m.get('id')} - {e}")
-                    continue
+    @staticmethod
+    async def atualizar_geometria(db: AsyncSession) -> dict:
+        """Fase "geometria": copia centróides e geometria de municipios_temp_geometria.
 
-            await db.commit()
-            print("✔ Municípios sincronizados")
+        Os centróides são copiados em qualquer banco; a geometria, só com PostGIS.
 
-        # --------------------------------------------------------------
-        # GEOMETRIA
-        # --------------------------------------------------------------
-        print("✔ Importando geometria...")
-        ok = await asyncio.to_thread(
-            LocalidadesService._importar_municipios_do_shapefile_sync,
-            db_url_sync,
+        Returns:
+            {"postgis": bool, "updated": municípios com geometria atualizada,
+             "centroides": municípios com centróide atualizado}
+        """
+        postgis = await LocalidadesService._postgis_available(db)
+        conn = await db.connection()
+        if not await conn.run_sync(lambda c: inspect(c).has_table(_TEMP_GEOMETRIA.name)):
+            logger.warning("municipios_temp_geometria not found; skipping geometry update")
+            return {"postgis": postgis, "updated": 0, "centroides": 0}
+
+        m, t = Municipio.__table__, _TEMP_GEOMETRIA
+        mesmo_codigo = t.c.codigo_ibge == m.c.codigo_ibge
+        centroides = await db.execute(
+            update(m)
+            .where(exists().where(mesmo_codigo))
+            .values({
+                col: select(t.c[col]).where(mesmo_codigo).scalar_subquery()
+                for col in ("latitude", "longitude", "raio_envolvente_km")
+            })
         )
 
-        if not ok:
-            print("[WARN] shapefile import failed, skipping geometry import")
-            return
+        updated = 0
+        if postgis:
+            # Geometria completa e simplificada (pré-filtro da consulta por raio) na mesma passada
+            result = await db.execute(
+                text("""
+                    UPDATE municipios m
+                    SET geometria = g.geometria,
+                        geometria_simplificada = ST_Multi(ST_SimplifyPreserveTopology(g.geometria, :tolerancia))
+                    FROM (
+                        SELECT codigo_ibge, ST_Multi(ST_Transform(geometry, 3857)) AS geometria
+                        FROM municipios_temp_geometria
+                    ) g
+                    WHERE m.codigo_ibge = g.codigo_ibge;
+                """),
+                {"tolerancia": settings.localidades_simplificacao_m},
+            )
+            updated = result.rowcount
+        else:
+            logger.warning("PostGIS not available; skipping geometry SQL update")
+        await db.execute(text("DROP TABLE IF EXISTS municipios_temp_geometria;"))
+        await db.commit()
+        if postgis:
+            # Estatísticas das geometrias novas para o planejador usar os índices GiST
+            await db.execute(text("ANALYZE municipios;"))
+            await db.commit()
+        LocalidadesService.invalidar_indice_raio()
+        return {"postgis": postgis, "updated": updated, "centroides": centroides.rowcount}
 
-        # Only run geometry import SQL if PostGIS is available
-        if not has_postgis:
-            print("[WARN] PostGIS not available; skipping geometry SQL update")
-            try:
-                await db.execute(text("DROP TABLE IF EXISTS municipios_temp_geometria;"))
-                await db.commit()
-            except Exception:
-                pass
-            print("=== SINCRONIZAÇÃO FINALIZADA COM SUCESSO (sem geometria) ===")
-            return
+    @staticmethod
+    async def sincronizar_com_ibge(db: AsyncSession, fonte: Optional[LocalidadesSource] = None) -> dict:
+        """Sincroniza estados e municípios e importa a geometria do shapefile.
+
+        Executa todas as fases na requisição; POST /sincronizar usa o LocalidadesSyncService.
+
+        Args:
+            fonte: Origem dos dados (padrão: LOCALIDADES_FONTE, ver localidades_sources)
+
+        Returns:
+            Contagens {"estados": {...}, "municipios": {...}} de inserted/updated/unchanged
+        """
+        logger.info("Sincronização de localidades iniciada")
+
+        snapshot = await (fonte or fonte_padrao()).carregar()
+
+        # Staging + um INSERT ... ON CONFLICT por tabela
+        contagens = {
+            "estados": await LocalidadesService.sincronizar_estados(db, snapshot),
+            "municipios": await LocalidadesService.sincronizar_municipios(db, snapshot),
+        }
+
+        if not await LocalidadesService.importar_shapefile(db):
+            logger.warning("Shapefile import failed, skipping geometry import")
+            return contagens
 
         try:
-            await db.execute(text("""
-                UPDATE municipios m
-                SET geometria = ST_Multi(ST_Transform(t.geometry, 3857))
-                FROM municipios_temp_geometria t
-                WHERE m.codigo_ibge = t.codigo_ibge;
-            """))
-
-            await db.execute(text("DROP TABLE IF EXISTS municipios_temp_geometria;"))
-            await db.commit()
-            print("=== SINCRONIZAÇÃO FINALIZADA COM SUCESSO ===")
+            geometria = await LocalidadesService.atualizar_geometria(db)
+            logger.info("Sincronização de localidades finalizada%s" % ("" if geometria["postgis"] else " (sem geometria)"))
         except Exception as e:
-            print(f"[WARN] failed to assign geometries: {e}")
+            logger.warning(f"Failed to assign geometries: {e}")
+            await db.rollback()
             try:
                 await db.execute(text("DROP TABLE IF EXISTS municipios_temp_geometria;"))
                 await db.commit()
             except Exception:
                 pass
-            print("=== SINCRONIZAÇÃO FINALIZADA COM SUCESSO (geometria parcial/missing) ===")
\ No newline at end of file
+            logger.info("Sincronização de localidades finalizada (geometria parcial/missing)")
+        return contagens
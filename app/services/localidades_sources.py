@@ -0,0 +1,210 @@
+"""Fontes dos dados de estados e municípios usados na sincronização de localidades.
+
+Fontes disponíveis (LOCALIDADES_FONTE):
+- "ibge": API de localidades do IBGE (padrão)
+- "arquivo": snapshot local em JSON ({"estados": [...], "municipios": [...]}, no formato da
+  API do IBGE) ou CSV (codigo_ibge, nome, uf_codigo, uf_sigla, uf_nome)
+- "snapshot": snapshot versionado em LOCALIDADES_SNAPSHOT_URL, guardado em
+  LOCALIDADES_CACHE_DIR e revalidado com If-None-Match (sem rede, usa o cache)
+
+Todas devolvem um LocalidadesSnapshot normalizado, com versao = SHA-256 do conteúdo
+normalizado: a mesma lista de estados/municípios tem a mesma versão em qualquer fonte.
+"""
+
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import os
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import httpx
+from loguru import logger
+
+from app.core.config import settings
+
+IBGE_ESTADOS_URL = "https://servicodados.ibge.gov.br/api/v1/localidades/estados"
+IBGE_MUNIS_URL = "https://servicodados.ibge.gov.br/api/v1/localidades/municipios"
+
+FONTE_IBGE = "ibge"
+FONTE_ARQUIVO = "arquivo"
+FONTE_SNAPSHOT = "snapshot"
+
+
+class LocalidadesSnapshot(NamedTuple):
+    """Estados ({"id", "sigla", "nome"}) e municípios ({"id", "nome", "uf_id"}) normalizados."""
+    estados: list[dict]
+    municipios: list[dict]
+    versao: str
+
+
+def _municipio_uf_id(m: dict) -> Optional[int]:
+    """Código IBGE do estado de um município do JSON do IBGE (None se ausente)."""
+    microrregiao = m.get("microrregiao")
+    mesorregiao = microrregiao.get("mesorregiao") if isinstance(microrregiao, dict) else None
+    uf = mesorregiao.get("UF") if isinstance(mesorregiao, dict) else None
+    if not isinstance(uf, dict):
+        # Municípios novos podem vir sem microrregião; a região imediata também traz a UF
+        imediata = m.get("regiao-imediata")
+        intermediaria = imediata.get("regiao-intermediaria") if isinstance(imediata, dict) else None
+        uf = intermediaria.get("UF") if isinstance(intermediaria, dict) else None
+    return uf.get("id") if isinstance(uf, dict) else None
+
+
+def montar_snapshot(estados: list[dict], municipios: list[dict]) -> LocalidadesSnapshot:
+    """Normaliza listas no formato da API do IBGE e calcula a versão."""
+    estados = [{"id": int(e["id"]), "sigla": e["sigla"], "nome": e["nome"]} for e in estados]
+    municipios = [
+        {"id": int(m["id"]), "nome": m["nome"], "uf_id": m.get("uf_id", _municipio_uf_id(m))}
+        for m in municipios if m.get("id") is not None
+    ]
+    canonical = json.dumps([estados, municipios], ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return LocalidadesSnapshot(estados, municipios, hashlib.sha256(canonical.encode()).hexdigest())
+
+
+def snapshot_de_bytes(content: bytes, formato: str = "json") -> LocalidadesSnapshot:
+    """Lê um snapshot JSON ou CSV (ver docstring do módulo)."""
+    if formato == "csv":
+        estados, municipios = {}, []
+        for row in csv.DictReader(io.StringIO(content.decode("utf-8-sig"))):
+            uf_id = int(row["uf_codigo"])
+            estados.setdefault(uf_id, {"id": uf_id, "sigla": row["uf_sigla"], "nome": row["uf_nome"]})
+            municipios.append({"id": int(row["codigo_ibge"]), "nome": row["nome"], "uf_id": uf_id})
+        return montar_snapshot(list(estados.values()), municipios)
+    data = json.loads(content)
+    return montar_snapshot(data.get("estados") or [], data.get("municipios") or [])
+
+
+def _formato(path: str) -> str:
+    return "csv" if Path(path).suffix.lower() == ".csv" else "json"
+
+
+class LocalidadesSource(ABC):
+    """Fonte de localidades: carregar() devolve o snapshot atual."""
+
+    nome = ""
+
+    @abstractmethod
+    async def carregar(self) -> LocalidadesSnapshot:
+        """Devolve o snapshot atual da fonte."""
+
+
+class IbgeApiSource(LocalidadesSource):
+    """API de localidades do IBGE (baixa estados e municípios a cada carga)."""
+
+    nome = FONTE_IBGE
+
+    def __init__(
+        self,
+        estados_url: str = IBGE_ESTADOS_URL,
+        municipios_url: str = IBGE_MUNIS_URL,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.estados_url = estados_url
+        self.municipios_url = municipios_url
+        self._client = client
+
+    async def carregar(self) -> LocalidadesSnapshot:
+        if self._client is not None:
+            return await self._carregar(self._client)
+        async with httpx.AsyncClient(timeout=60) as client:
+            return await self._carregar(client)
+
+    async def _carregar(self, client: httpx.AsyncClient) -> LocalidadesSnapshot:
+        estados = await self._get_json(client, self.estados_url)
+        municipios = await self._get_json(client, self.municipios_url)
+        return montar_snapshot(estados, municipios)
+
+    @staticmethod
+    async def _get_json(client: httpx.AsyncClient, url: str):
+        """GET com erro para status 4xx/5xx: um corpo de erro não vira snapshot."""
+        resp = await client.get(url)
+        resp.raise_for_status()
+        return resp.json()
+
+
+class SnapshotFileSource(LocalidadesSource):
+    """Snapshot local em JSON ou CSV (pela extensão do arquivo)."""
+
+    nome = FONTE_ARQUIVO
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    async def carregar(self) -> LocalidadesSnapshot:
+        content = await asyncio.to_thread(self.path.read_bytes)
+        return snapshot_de_bytes(content, _formato(str(self.path)))
+
+
+class CachedSnapshotSource(LocalidadesSource):
+    """Snapshot remoto versionado, guardado em disco e revalidado por ETag.
+
+    O arquivo só é baixado de novo quando o servidor responde 200 ao If-None-Match;
+    sem rede (ou com erro HTTP) o último snapshot em cache é usado.
+    """
+
+    nome = FONTE_SNAPSHOT
+
+    def __init__(self, url: str, cache_dir: str, client: Optional[httpx.AsyncClient] = None):
+        self.url = url
+        self.cache_dir = Path(cache_dir)
+        self._client = client
+        name = Path(httpx.URL(url).path).name or "localidades.json"
+        self.cache_path = self.cache_dir / name
+        self.meta_path = self.cache_dir / f"{name}.meta.json"
+
+    async def carregar(self) -> LocalidadesSnapshot:
+        meta = await asyncio.to_thread(self._ler_meta)
+        cached = meta is not None and self.cache_path.is_file()
+        headers = {"If-None-Match": meta["etag"]} if cached and meta.get("etag") else {}
+        try:
+            resp = await self._get(headers)
+            if resp.status_code == 304 and cached:
+                logger.info("Localidades snapshot %s not modified (etag %s)", self.url, meta.get("etag"))
+            else:
+                resp.raise_for_status()
+                await asyncio.to_thread(self._gravar, resp.content, resp.headers.get("etag"))
+                logger.info("Localidades snapshot %s downloaded (%d bytes)", self.url, len(resp.content))
+        except httpx.HTTPError as e:
+            if not cached:
+                raise
+            logger.warning("Localidades snapshot %s unavailable (%s), using cached copy", self.url, e)
+
+        content = await asyncio.to_thread(self.cache_path.read_bytes)
+        return snapshot_de_bytes(content, _formato(self.url))
+
+    async def _get(self, headers: dict) -> httpx.Response:
+        if self._client is not None:
+            return await self._client.get(self.url, headers=headers)
+        async with httpx.AsyncClient(timeout=60) as client:
+            return await client.get(self.url, headers=headers)
+
+    def _ler_meta(self) -> Optional[dict]:
+        try:
+            return json.loads(self.meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _gravar(self, content: bytes, etag: Optional[str]) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_name(f".{uuid.uuid4().hex}.part")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, self.cache_path)
+        meta = {"etag": etag, "sha256": hashlib.sha256(content).hexdigest(), "size": len(content)}
+        self.meta_path.write_text(json.dumps(meta))
+
+
+def fonte_padrao() -> LocalidadesSource:
+    """Fonte configurada em LOCALIDADES_FONTE."""
+    fonte = (settings.localidades_fonte or FONTE_IBGE).lower()
+    if fonte == FONTE_ARQUIVO:
+        return SnapshotFileSource(settings.localidades_arquivo)
+    if fonte == FONTE_SNAPSHOT:
+        return CachedSnapshotSource(settings.localidades_snapshot_url, settings.localidades_cache_dir)
+    if fonte != FONTE_IBGE:
+        logger.warning("Unknown localidades source %s, using %s", fonte, FONTE_IBGE)
+    return IbgeApiSource()
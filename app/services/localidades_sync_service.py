@@ -0,0 +1,243 @@
+"""Sincronização de localidades com o IBGE em background (POST /sincronizar).
+
+Responsabilidades:
+- Rejeitar sincronizações concorrentes (advisory lock no Postgres; lock do processo nos demais bancos)
+- Executar as fases (estados, municipios, shapefile, geometria) fora da requisição,
+  gravando a fase atual e o resultado de cada fase concluída
+- Retomar um job que falhou (ou cujo processo morreu) a partir da fase interrompida
+- Não refazer nada quando a versão do snapshot de localidades é a da última sincronização
+"""
+
+import asyncio
+import datetime
+from typing import Optional
+
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from loguru import logger
+
+from app.db import AsyncSessionLocal, engine
+from app.models.localidades_sync_job import (
+    LocalidadesSyncJob, SYNC_PHASES, SYNC_QUEUED, SYNC_RUNNING, SYNC_DONE, SYNC_FAILED,
+)
+from app.schemas.localidade import LocalidadesSyncJobRead
+from app.services.localidades_service import LocalidadesService
+from app.services.localidades_sources import LocalidadesSnapshot, LocalidadesSource, fonte_padrao
+
+# Chave do pg_try_advisory_lock da sincronização de localidades
+ADVISORY_LOCK_KEY = 7_143_210_001
+
+# Sem advisory lock (SQLite): garante uma sincronização por processo
+_local_lock = asyncio.Lock()
+# Referências fortes às tasks em background (o event loop guarda só referências fracas)
+_running_tasks: set[asyncio.Task] = set()
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class SyncAlreadyRunning(Exception):
+    """Já existe uma sincronização de localidades em andamento."""
+
+
+class _SyncLock:
+    """Lock exclusivo da sincronização, mantido enquanto o job roda em background."""
+
+    def __init__(self, conn: Optional[AsyncConnection] = None):
+        self.conn = conn
+
+    async def release(self) -> None:
+        if self.conn is None:
+            _local_lock.release()
+            return
+        try:
+            await self.conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        finally:
+            await self.conn.close()
+
+
+class LocalidadesSyncService:
+    """Criação, execução e consulta dos jobs de sincronização de localidades."""
+
+    def __init__(self, session_factory=None, lock_engine=None, fonte: Optional[LocalidadesSource] = None):
+        """Inicializa o serviço.
+
+        Args:
+            session_factory: Fábrica de sessões das fases (padrão: AsyncSessionLocal)
+            lock_engine: Engine da conexão que segura o advisory lock (padrão: app.db.engine)
+            fonte: Origem de estados/municípios (padrão: LOCALIDADES_FONTE)
+        """
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.lock_engine = lock_engine or engine
+        self.fonte = fonte or fonte_padrao()
+        self.task: Optional[asyncio.Task] = None
+        self._snapshot: Optional[LocalidadesSnapshot] = None
+
+    @staticmethod
+    async def get_job(db: AsyncSession, job_id: int) -> Optional[LocalidadesSyncJob]:
+        return await db.get(LocalidadesSyncJob, job_id)
+
+    @staticmethod
+    def to_read(job: LocalidadesSyncJob) -> LocalidadesSyncJobRead:
+        """Converte o job para o schema de resposta."""
+        return LocalidadesSyncJobRead(
+            job_id=job.id,
+            status=job.status,
+            phase=job.phase,
+            progress=job.progress,
+            attempts=job.attempts,
+            error=job.error,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
+
+    async def start(self, user: Optional[str] = None, forcar: bool = False) -> LocalidadesSyncJob:
+        """Reserva o lock e inicia (ou retoma) a sincronização em background.
+
+        Args:
+            user: Usuário que pediu a sincronização
+            forcar: Executa todas as fases mesmo com o snapshot inalterado
+
+        Raises:
+            SyncAlreadyRunning: outra sincronização segura o lock
+        """
+        lock = await self._try_lock()
+        if lock is None:
+            raise SyncAlreadyRunning("Sincronização de localidades já em andamento")
+        try:
+            job = await self._create_or_resume(user)
+        except BaseException:
+            await lock.release()
+            raise
+        self.task = asyncio.create_task(self._run_locked(job.id, lock, forcar))
+        _running_tasks.add(self.task)
+        self.task.add_done_callback(_running_tasks.discard)
+        return job
+
+    async def run(self, job_id: int, forcar: bool = False) -> str:
+        """Executa as fases pendentes do job (a partir de job.phase).
+
+        Um job novo termina sem executar nenhuma fase quando a versão do snapshot é
+        a mesma da última sincronização concluída (a menos que forcar seja True).
+
+        Returns:
+            Status final do job (done ou failed)
+        """
+        async with self.session_factory() as db:
+            job = await db.get(LocalidadesSyncJob, job_id)
+            phase, progress = job.phase or SYNC_PHASES[0], dict(job.progress or {})
+        await self._update(job_id, status=SYNC_RUNNING, started_at=_now(), error=None,
+                           attempts=LocalidadesSyncJob.attempts + 1)
+
+        if phase == SYNC_PHASES[0]:
+            try:
+                snapshot = await self._carregar_snapshot()
+                applied = await self._versao_aplicada(job_id)
+            except Exception as e:
+                logger.exception("Localidades sync job id=%s failed loading %s source: %s", job_id, self.fonte.nome, e)
+                await self._update(job_id, status=SYNC_FAILED, error=f"{e.__class__.__name__}: {e}", finished_at=_now())
+                return SYNC_FAILED
+            progress.update(fonte=self.fonte.nome, versao=snapshot.versao)
+            if not forcar and snapshot.versao == applied:
+                progress.update({p: {"skipped": True} for p in SYNC_PHASES})
+                await self._update(job_id, status=SYNC_DONE, phase=None, progress=progress, finished_at=_now())
+                logger.info("Localidades sync job id=%s skipped: snapshot %s unchanged", job_id, snapshot.versao[:12])
+                return SYNC_DONE
+
+        for phase in SYNC_PHASES[SYNC_PHASES.index(phase):]:
+            await self._update(job_id, phase=phase)
+            logger.info("Localidades sync job id=%s phase %s started", job_id, phase)
+            try:
+                async with self.session_factory() as db:
+                    progress[phase] = await self._run_phase(db, phase)
+            except Exception as e:
+                logger.exception("Localidades sync job id=%s failed in phase %s: %s", job_id, phase, e)
+                await self._update(job_id, status=SYNC_FAILED, error=f"{e.__class__.__name__}: {e}", finished_at=_now())
+                return SYNC_FAILED
+            await self._update(job_id, progress=dict(progress))
+
+        await self._update(job_id, status=SYNC_DONE, phase=None, finished_at=_now())
+        logger.info("Localidades sync job id=%s done: %s", job_id, progress)
+        return SYNC_DONE
+
+    async def _run_phase(self, db: AsyncSession, phase: str) -> dict:
+        if phase == "estados":
+            return await LocalidadesService.sincronizar_estados(db, await self._carregar_snapshot())
+        if phase == "municipios":
+            return await LocalidadesService.sincronizar_municipios(db, await self._carregar_snapshot())
+        if phase == "shapefile":
+            if not await LocalidadesService.importar_shapefile(db):
+                raise RuntimeError("Falha ao importar o shapefile de municípios")
+            return {"ok": True}
+        return await LocalidadesService.atualizar_geometria(db)
+
+    async def _create_or_resume(self, user: Optional[str]) -> LocalidadesSyncJob:
+        """Com o lock em mãos, um job não concluído é de uma execução que falhou ou morreu: retoma."""
+        async with self.session_factory() as db:
+            async with db.begin():
+                job = (await db.execute(
+                    select(LocalidadesSyncJob).order_by(LocalidadesSyncJob.id.desc()).limit(1)
+                )).scalar_one_or_none()
+                if job is None or job.status == SYNC_DONE:
+                    job = LocalidadesSyncJob(api_user=user, status=SYNC_QUEUED, phase=SYNC_PHASES[0], progress={}, attempts=0)
+                    db.add(job)
+                else:
+                    logger.info("Localidades sync job id=%s resuming at phase %s", job.id, job.phase)
+                    job.status = SYNC_QUEUED
+            await db.refresh(job)
+        return job
+
+    async def _carregar_snapshot(self) -> LocalidadesSnapshot:
+        """Snapshot da fonte, carregado uma vez por execução (as fases estados e municipios o compartilham)."""
+        if self._snapshot is None:
+            self._snapshot = await self.fonte.carregar()
+        return self._snapshot
+
+    async def _versao_aplicada(self, job_id: int) -> Optional[str]:
+        """Versão do snapshot da última sincronização concluída (exceto este job)."""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(LocalidadesSyncJob.progress)
+                .where(LocalidadesSyncJob.status == SYNC_DONE, LocalidadesSyncJob.id != job_id)
+                .order_by(LocalidadesSyncJob.id.desc())
+                .limit(1)
+            )
+            progress = result.scalar_one_or_none()
+        return (progress or {}).get("versao")
+
+    async def _run_locked(self, job_id: int, lock: _SyncLock, forcar: bool = False) -> None:
+        try:
+            await self.run(job_id, forcar)
+        except Exception as e:
+            logger.exception("Localidades sync job id=%s error: %s", job_id, e)
+        finally:
+            await lock.release()
+
+    async def _try_lock(self) -> Optional[_SyncLock]:
+        if self.lock_engine.dialect.name != "postgresql":
+            if _local_lock.locked():
+                return None
+            await _local_lock.acquire()
+            return _SyncLock()
+
+        # Advisory lock de sessão: fica com esta conexão até o fim do job (ou até ela cair)
+        conn = await self.lock_engine.connect()
+        try:
+            acquired = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}
+            )).scalar()
+            await conn.commit()
+        except BaseException:
+            await conn.close()
+            raise
+        if not acquired:
+            await conn.close()
+            return None
+        return _SyncLock(conn)
+
+    async def _update(self, job_id: int, **values) -> None:
+        async with self.session_factory() as db:
+            async with db.begin():
+                await db.execute(update(LocalidadesSyncJob).where(LocalidadesSyncJob.id == job_id).values(**values))
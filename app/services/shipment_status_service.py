@@ -3,34 +3,41 @@ from __future__ import annotations
 import base64
 import datetime
 import json
-from pathlib import Path
 from typing import Any, Optional
 
-import httpx
 from fastapi import HTTPException, UploadFile
 from loguru import logger
-from sqlalchemy import select
+from sqlalchemy import insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload
 
-from app.models.shipment import ShipmentInvoice
+from app.models.shipment import Shipment, ShipmentInvoice, ShipmentInvoiceTracking
 from app.schemas.shipment import (
     AttachmentIn,
     ShipmentStatus,
+    ShipmentStatusBatchRequest,
     ShipmentStatusRequest,
     ShipmentStatusResponse,
     ShipmentStatusResult,
 )
+from app.services.attachment_fetcher import RemoteAttachmentFetcher
 from app.services.attachments_service import AttachmentService
 from app.services.constants import VALID_CODES, VALID_CODES_SET
+from app.services.tracking_outbox_service import TrackingOutboxService, notify_dispatcher
 from app.services.tracking_service import TrackingService
 from app.utils.db_utils import commit_or_raise
 
 
 class ShipmentStatusService:
-    def __init__(self, attachment_svc: Optional[AttachmentService] = None, tracking_svc: Optional[TrackingService] = None):
+    def __init__(
+        self,
+        attachment_svc: Optional[AttachmentService] = None,
+        tracking_svc: Optional[TrackingService] = None,
+        fetcher: Optional[RemoteAttachmentFetcher] = None,
+    ):
         self.attachment_svc = attachment_svc or AttachmentService()
         self.tracking_svc = tracking_svc or TrackingService()
+        self.fetcher = fetcher or RemoteAttachmentFetcher(self.attachment_svc)
 
     @staticmethod
     async def parse_request(
@@ -132,8 +139,8 @@ class ShipmentStatusService:
         payload: ShipmentStatusRequest,
         anexo_file: Optional[UploadFile] = None,
     ) -> ShipmentStatusResponse:
-        # Load invoice with parent shipment
-        q = select(ShipmentInvoice).where(ShipmentInvoice.id == invoice_id).options(selectinload(ShipmentInvoice.shipment))
+        # Load invoice with parent shipment (one SELECT ... JOIN)
+        q = select(ShipmentInvoice).where(ShipmentInvoice.id == invoice_id).options(joinedload(ShipmentInvoice.shipment))
         res = await db.execute(q)
         invoice = res.scalars().first()
         if not invoice:
@@ -145,12 +152,15 @@ class ShipmentStatusService:
         # Persist status on parent shipment if available
         if getattr(invoice, "shipment", None):
             invoice.shipment.status = novo_status_model.model_dump()
+            # Colunas indexadas usadas pelos filtros e pelo GET /cargas/stats
+            invoice.shipment.status_code = novo_status_model.code
+            invoice.shipment.status_type = novo_status_model.type
             db.add(invoice.shipment)
 
         # Collect attachments (from file upload and/or JSON payload)
         anexos_final = []
-        anexos_final.extend(await self._from_payload(payload.anexos))
-        anexos_final.extend(await self._from_file(anexo_file))
+        anexos_final.extend(await self._from_payload(payload.anexos, db))
+        anexos_final.extend(await self._from_file(anexo_file, db))
 
         # Attach recebedor into attachment payload if present
         recebedor_validado = payload.recebedor.dict() if hasattr(payload.recebedor, "dict") else payload.recebedor
@@ -168,9 +178,6 @@ class ShipmentStatusService:
             invoice.__dict__["recebedor_xNome"] = recebedor_validado.get("xNome")
             invoice.__dict__["recebedor_nFone"] = recebedor_validado.get("nFone")
 
-        await commit_or_raise(db)
-        await db.refresh(invoice)
-
         # Fallback recebedor from DB if not provided
         if not recebedor_validado:
             recebedor_validado = self._recebedor_from_db(invoice)
@@ -179,14 +186,16 @@ class ShipmentStatusService:
             invoice.shipment.rem_nDoc if getattr(invoice, "shipment", None) and getattr(invoice.shipment, "rem_nDoc", None) else None
         )
 
-        # Send tracking
-        success, resp_text = await self.tracking_svc.enviar(
+        # Evento para a Brudam vai para o outbox na mesma transação do status;
+        # o envio (com retentativas) fica com o TrackingOutboxDispatcher
+        documento = TrackingService.montar_documento(
             chave_documento=invoice.access_key,
             codigo_evento=payload.code,
             anexos=anexos_final,
             recebedor=recebedor_validado,
             remetente_cnpj=remetente_validado,
         )
+        evento = TrackingOutboxService.enqueue(db, [documento], payload.code, shipment_invoice_id=invoice.id)
 
         # Register internal tracking
         await self.tracking_svc.registrar(
@@ -195,30 +204,116 @@ class ShipmentStatusService:
             payload.code,
             descricao=VALID_CODES[payload.code]["message"],
             data_evento=datetime.datetime.now(datetime.timezone.utc),
+            commit=False,
         )
 
+        # Status, recebedor, outbox and tracking in a single transaction. IDs of the
+        # new rows come back from INSERT ... RETURNING, so no refresh is needed.
+        await commit_or_raise(db)
+        notify_dispatcher()
+
         return ShipmentStatusResponse(
             status="ok",
             codigo_enviado=payload.code,
-            results=[ShipmentStatusResult(cte=str(invoice.id), ok=success, vblog_response=(resp_text or "")[:500])],
+            results=[ShipmentStatusResult(cte=str(invoice.id), ok=True, evento_id=evento.id)],
+        )
+
+    async def change_status_batch(self, db: AsyncSession, payload: ShipmentStatusBatchRequest) -> ShipmentStatusResponse:
+        """Aplica um código de status a várias notas com um número fixo de comandos.
+
+        Uma consulta IN para as notas, um UPDATE para os shipments, um INSERT
+        multi-row para os trackings e um único evento no outbox com todos os
+        documentos (enviado à Brudam em um só POST), tudo em uma transação.
+
+        Args:
+            db: Sessão da requisição
+            payload: IDs das notas e código de status
+
+        Returns:
+            ShipmentStatusResponse com um resultado por ID (ok=False para notas inexistentes)
+        """
+        ids = list(dict.fromkeys(payload.ids))
+        novo_status_model = ShipmentStatus(code=payload.code)
+        agora = datetime.datetime.now(datetime.timezone.utc)
+
+        res = await db.execute(
+            select(
+                ShipmentInvoice.id,
+                ShipmentInvoice.shipment_id,
+                ShipmentInvoice.access_key,
+                ShipmentInvoice.remetente_ndoc,
+                Shipment.rem_nDoc,
+            )
+            .outerjoin(Shipment, Shipment.id == ShipmentInvoice.shipment_id)
+            .where(ShipmentInvoice.id.in_(ids))
+        )
+        encontradas = {row.id: row for row in res.all()}
+
+        evento = None
+        if encontradas:
+            shipment_ids = {row.shipment_id for row in encontradas.values()}
+            await db.execute(
+                update(Shipment)
+                .where(Shipment.id.in_(shipment_ids))
+                .values(
+                    status=novo_status_model.model_dump(),
+                    status_code=novo_status_model.code,
+                    status_type=novo_status_model.type,
+                )
+            )
+            await db.execute(insert(ShipmentInvoiceTracking), [
+                {
+                    "shipment_invoice_id": invoice_id,
+                    "codigo_evento": payload.code,
+                    "descricao": novo_status_model.message,
+                    "data_evento": agora,
+                }
+                for invoice_id in encontradas
+            ])
+            documentos = [
+                TrackingService.montar_documento(
+                    chave_documento=row.access_key,
+                    codigo_evento=payload.code,
+                    data_evento=agora,
+                    remetente_cnpj=row.remetente_ndoc or row.rem_nDoc,
+                )
+                for row in encontradas.values()
+            ]
+            evento = TrackingOutboxService.enqueue(db, documentos, payload.code)
+
+        await commit_or_raise(db)
+        if evento is not None:
+            notify_dispatcher()
+        logger.info("Batch status %s applied to %d of %d invoices", payload.code, len(encontradas), len(ids))
+
+        return ShipmentStatusResponse(
+            status="ok" if len(encontradas) == len(ids) else "partial",
+            codigo_enviado=payload.code,
+            results=[
+                ShipmentStatusResult(cte=str(invoice_id), ok=True, evento_id=evento.id)
+                if invoice_id in encontradas
+                else ShipmentStatusResult(cte=str(invoice_id), ok=False, vblog_response="Carga não encontrada")
+                for invoice_id in ids
+            ],
         )
 
-    async def _from_file(self, anexo_file: Optional[UploadFile]):
+    async def _from_file(self, anexo_file: Optional[UploadFile], db: Optional[AsyncSession] = None):
         anexos = []
         if not anexo_file:
             return anexos
-        content = await anexo_file.read()
-        saved = self.attachment_svc.save_file(content, original_name=getattr(anexo_file, "filename", None))
-        b64 = base64.b64encode(content).decode()
-        anexos.append({"arquivo": {"nome": saved["url"], "dados": b64}})
+        # Cópia em blocos para o disco; o base64 só é gerado no envio (TrackingService)
+        saved = await self.attachment_svc.save_upload(anexo_file, db=db)
+        anexos.append(self.attachment_svc.anexo_ref(saved))
         return anexos
 
-    async def _from_payload(self, anexos_payload: Optional[list[AttachmentIn]]):
+    async def _from_payload(self, anexos_payload: Optional[list[AttachmentIn]], db: Optional[AsyncSession] = None):
         anexos = []
         if not anexos_payload:
             return anexos
 
         # anexos_payload may come as list of dicts; rely on pydantic coercion when possible
+        # Each entry is a saved attachment (base64) or a URL downloaded below, keeping the order
+        entries = []
         for item in anexos_payload:
             try:
                 arquivo = item["arquivo"] if isinstance(item, dict) else getattr(item, "arquivo", {})
@@ -229,19 +324,17 @@ class ShipmentStatusService:
             dados = arquivo.get("dados") if isinstance(arquivo, dict) else getattr(arquivo, "dados", None)
 
             if dados:
-                saved = self.attachment_svc.save_base64(dados, original_name=None)
-                anexos.append({"arquivo": {"nome": saved["url"], "dados": dados}})
+                entries.append(await self.attachment_svc.save_bytes(base64.b64decode(dados), db=db))
             elif nome and str(nome).startswith("http"):
-                try:
-                    async with httpx.AsyncClient() as client:
-                        resp = await client.get(nome)
-                    if resp.status_code < 300:
-                        content = resp.content
-                        saved = self.attachment_svc.save_file(content, original_name=Path(nome).name)
-                        b64 = base64.b64encode(content).decode()
-                        anexos.append({"arquivo": {"nome": saved["url"], "dados": b64}})
-                except Exception:
-                    continue
+                entries.append(str(nome))
+
+        urls = [entry for entry in entries if isinstance(entry, str)]
+        downloaded = await self.fetcher.fetch_many(urls, db=db) if urls else {}
+
+        for entry in entries:
+            saved = downloaded.get(entry) if isinstance(entry, str) else entry
+            if saved is not None:
+                anexos.append(self.attachment_svc.anexo_ref(saved))
         return anexos
 
     @staticmethod
@@ -11,14 +11,16 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.shipment import ShipmentInvoice
 from app.schemas.shipment import UploadXmlResponse
+from app.services.blob_service import BlobService
 from app.services.upload_cte_service import BrudamError, UploadCteService
 
 
 class ShipmentXmlService:
     """Service for handling XML upload and CTe processing."""
 
-    def __init__(self, upload_cte_svc: Optional[UploadCteService] = None):
+    def __init__(self, upload_cte_svc: Optional[UploadCteService] = None, blob_svc: Optional[BlobService] = None):
         self.upload_cte_svc = upload_cte_svc or UploadCteService()
+        self.blob_svc = blob_svc or BlobService()
 
     @staticmethod
     def extract_chave_from_cte_bytes(content_bytes: bytes) -> Optional[str]:
@@ -73,12 +75,14 @@ class ShipmentXmlService:
         if not xml_files or len(xml_files) == 0:
             raise HTTPException(400, "Nenhum arquivo XML enviado")
 
+        contents = []
         xmls_b64 = []
         found_chaves = []
 
         # Encode and extract chaves from all files
         for xml_file in xml_files:
             content = await xml_file.read()
+            contents.append(content)
             xml_b64 = base64.b64encode(content).decode("utf-8")
             xmls_b64.append(xml_b64)
 
@@ -86,8 +90,8 @@ class ShipmentXmlService:
             if chave:
                 found_chaves.append(chave)
 
-        # Save XMLs and detected chave (first found) to DB
-        invoice.xmls_b64 = xmls_b64
+        # Save XMLs (compressed, in stored_blobs) and detected chave (first found) to DB
+        await self.blob_svc.set_invoice_xmls(db, invoice, contents)
         if found_chaves:
             invoice.cte_chave = found_chaves[0]
         db.add(invoice)
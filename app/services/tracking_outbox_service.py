@@ -0,0 +1,244 @@
+"""Outbox de eventos de tracking para a Brudam.
+
+Responsabilidades:
+- Gravar o evento na mesma transação da troca de status (enqueue, sem commit)
+- Reservar eventos pendentes para um único dispatcher (SELECT ... FOR UPDATE SKIP LOCKED)
+- Enviar com limite de concorrência, reagendando falhas com backoff exponencial
+- Mover para "dead" os eventos rejeitados pela Brudam ou sem sucesso após N tentativas
+"""
+
+import asyncio
+import datetime
+import random
+from typing import Optional
+
+import httpx
+from sqlalchemy import select, update, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
+
+from app.core.config import settings
+from app.db import AsyncSessionLocal
+from app.models.tracking_outbox import TrackingOutbox, OUTBOX_PENDING, OUTBOX_SENDING, OUTBOX_SENT, OUTBOX_DEAD
+from app.services.tracking_service import TrackingService
+
+# 4xx que indicam falha transitória (os demais 4xx não mudam com nova tentativa)
+_RETRYABLE_4XX = {408, 425, 429}
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class TrackingOutboxService:
+    """Enfileiramento e entrega dos eventos de tracking."""
+
+    def __init__(self, session_factory=None, tracking_svc: Optional[TrackingService] = None):
+        """Inicializa o serviço.
+
+        Args:
+            session_factory: Fábrica de sessões usada na entrega (padrão: AsyncSessionLocal)
+            tracking_svc: Cliente da Brudam (padrão: TrackingService)
+        """
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.tracking_svc = tracking_svc or TrackingService()
+
+    @staticmethod
+    def enqueue(db: AsyncSession, documentos: list, codigo_evento: str, shipment_invoice_id: Optional[int] = None) -> TrackingOutbox:
+        """Adiciona o evento à sessão; é gravado no commit da transação do chamador.
+
+        Args:
+            db: Sessão da troca de status
+            documentos: Itens "documentos" do payload (TrackingService.montar_documento)
+            codigo_evento: Código do evento enviado
+            shipment_invoice_id: Nota do evento (None para eventos de várias notas)
+
+        Returns:
+            TrackingOutbox adicionado à sessão
+        """
+        event = TrackingOutbox(
+            shipment_invoice_id=shipment_invoice_id,
+            codigo_evento=str(codigo_evento),
+            documentos=documentos,
+            status=OUTBOX_PENDING,
+            attempts=0,
+            next_attempt_at=_now(),
+        )
+        db.add(event)
+        return event
+
+    @staticmethod
+    async def stats(db: AsyncSession) -> dict:
+        """Quantidade de eventos por status."""
+        result = await db.execute(select(TrackingOutbox.status, func.count()).group_by(TrackingOutbox.status))
+        return {status: count for status, count in result.all()}
+
+    @staticmethod
+    def backoff(attempts: int) -> float:
+        """Espera (s) antes da próxima tentativa: base * 2^(tentativas-1), com jitter e teto."""
+        delay = settings.tracking_outbox_backoff_base * (2 ** max(0, attempts - 1))
+        return min(settings.tracking_outbox_backoff_max, delay) * random.uniform(0.8, 1.0)
+
+    async def claim_batch(self, limit: Optional[int] = None) -> list[int]:
+        """Reserva eventos vencidos para este dispatcher.
+
+        Eventos em "sending" há mais de TRACKING_OUTBOX_STALE_SECONDS (processo
+        morto no meio do envio) voltam a ser elegíveis.
+
+        Returns:
+            IDs reservados (vazio se não há nada a enviar)
+        """
+        now = _now()
+        stale_before = now - datetime.timedelta(seconds=settings.tracking_outbox_stale_seconds)
+        async with self.session_factory() as db:
+            async with db.begin():
+                result = await db.execute(
+                    select(TrackingOutbox.id)
+                    .where(or_(
+                        and_(TrackingOutbox.status == OUTBOX_PENDING, TrackingOutbox.next_attempt_at <= now),
+                        and_(TrackingOutbox.status == OUTBOX_SENDING, TrackingOutbox.claimed_at < stale_before),
+                    ))
+                    .order_by(TrackingOutbox.next_attempt_at, TrackingOutbox.id)
+                    .limit(limit or settings.tracking_outbox_batch)
+                    .with_for_update(skip_locked=True)
+                )
+                ids = list(result.scalars().all())
+                if ids:
+                    await db.execute(
+                        update(TrackingOutbox)
+                        .where(TrackingOutbox.id.in_(ids))
+                        .values(status=OUTBOX_SENDING, claimed_at=now)
+                    )
+        return ids
+
+    async def deliver(self, event_id: int) -> Optional[str]:
+        """Envia um evento reservado e registra o resultado.
+
+        O resultado só é gravado se a reserva ainda é desta chamada (status sending e
+        o mesmo claimed_at): uma reserva vencida e assumida por outro dispatcher não é
+        sobrescrita.
+
+        Returns:
+            Novo status do evento (sent, pending ou dead), ou None se o evento não
+            está reservado ou a reserva foi perdida
+        """
+        async with self.session_factory() as db:
+            event = await db.get(TrackingOutbox, event_id)
+            if event is None or event.status != OUTBOX_SENDING or event.claimed_at is None:
+                logger.warning("Tracking outbox id=%s is not claimed, skipping delivery", event_id)
+                return None
+            documentos, attempts, claimed_at = event.documentos, event.attempts + 1, event.claimed_at
+
+        values = {"attempts": attempts, "claimed_at": None}
+        try:
+            success, status_code, text = await self.tracking_svc.enviar_documentos(documentos)
+            values["response"] = (text or "")[:2000]
+            error = None if success else f"HTTP {status_code}: {(text or '')[:500]}"
+            permanent = not success and 400 <= status_code < 500 and status_code not in _RETRYABLE_4XX
+        except (httpx.HTTPError, OSError) as e:
+            success, permanent = False, False
+            error = f"{e.__class__.__name__}: {e}"
+
+        if success:
+            values.update(status=OUTBOX_SENT, sent_at=_now(), last_error=None)
+        elif permanent or attempts >= settings.tracking_outbox_max_attempts:
+            values.update(status=OUTBOX_DEAD, last_error=error)
+            logger.error("Tracking outbox id=%s dead after %d attempts: %s", event_id, attempts, error)
+        else:
+            delay = self.backoff(attempts)
+            values.update(status=OUTBOX_PENDING, last_error=error,
+                          next_attempt_at=_now() + datetime.timedelta(seconds=delay))
+            logger.warning("Tracking outbox id=%s attempt %d failed (%s), retrying in %.0fs", event_id, attempts, error, delay)
+
+        async with self.session_factory() as db:
+            async with db.begin():
+                result = await db.execute(
+                    update(TrackingOutbox)
+                    .where(
+                        TrackingOutbox.id == event_id,
+                        TrackingOutbox.status == OUTBOX_SENDING,
+                        TrackingOutbox.claimed_at == claimed_at,
+                    )
+                    .values(**values)
+                )
+        if result.rowcount != 1:
+            logger.warning("Tracking outbox id=%s claim was taken over, result %s discarded", event_id, values["status"])
+            return None
+        return values["status"]
+
+    async def run_once(self) -> int:
+        """Reserva um lote e envia com até TRACKING_OUTBOX_CONCURRENCY envios simultâneos.
+
+        Returns:
+            Quantidade de eventos processados (0 se não havia nada vencido)
+        """
+        ids = await self.claim_batch()
+        if not ids:
+            return 0
+        semaphore = asyncio.Semaphore(max(1, settings.tracking_outbox_concurrency))
+
+        async def deliver(event_id: int):
+            async with semaphore:
+                try:
+                    await self.deliver(event_id)
+                except Exception as e:
+                    # Fica em "sending" e volta à fila após TRACKING_OUTBOX_STALE_SECONDS
+                    logger.exception("Tracking outbox id=%s delivery error: %s", event_id, e)
+
+        await asyncio.gather(*(deliver(event_id) for event_id in ids))
+        return len(ids)
+
+
+class TrackingOutboxDispatcher:
+    """Loop em background que entrega o outbox de tracking durante a vida da aplicação."""
+
+    def __init__(self, service: Optional[TrackingOutboxService] = None):
+        self.service = service or TrackingOutboxService()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self._wakeup = asyncio.Event()
+
+    def start(self) -> None:
+        """Inicia o dispatcher no event loop atual."""
+        global _dispatcher
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._loop())
+        _dispatcher = self
+        logger.info("Tracking outbox dispatcher started (concurrency=%d)", settings.tracking_outbox_concurrency)
+
+    async def stop(self) -> None:
+        """Sinaliza parada e aguarda o lote em andamento terminar."""
+        global _dispatcher
+        self._stopping.set()
+        self._wakeup.set()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        if _dispatcher is self:
+            _dispatcher = None
+
+    def notify(self) -> None:
+        """Acorda o loop sem esperar o próximo poll (novo evento gravado)."""
+        self._wakeup.set()
+
+    async def _loop(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            try:
+                if await self.service.run_once():
+                    continue
+            except Exception as e:
+                logger.exception("Tracking outbox dispatcher error: %s", e)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.tracking_outbox_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+_dispatcher: Optional[TrackingOutboxDispatcher] = None
+
+
+def notify_dispatcher() -> None:
+    """Acorda o dispatcher deste processo, se houver (chamado após o commit do evento)."""
+    if _dispatcher is not None:
+        _dispatcher.notify()
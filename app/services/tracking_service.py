@@ -1,9 +1,15 @@
 import os
+import re
+import json
+import uuid
 import datetime
 from typing import Optional, Tuple
 import httpx
+from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.http_clients import BRUDAM, get_http_client
 from app.models.shipment import ShipmentInvoiceTracking
+from app.services.attachments_service import ANEXO_REF_KEY, AttachmentService
 
 from app.services.constants import VALID_CODES, VALID_CODES_SET
 
@@ -11,15 +17,17 @@ from app.services.constants import VALID_CODES, VALID_CODES_SET
 class TrackingService:
     """Combined tracking service: sends events to VBLOG-like endpoint and persists tracking records."""
 
-    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, attachment_svc: Optional[AttachmentService] = None):
         self.usuario = os.getenv("BRUDAM_USUARIO")
         self.senha = os.getenv("BRUDAM_SENHA")
         self.endpoint = os.getenv("BRUDAM_URL_TRACKING")
         self._client = client
+        self._attachment_svc = attachment_svc
 
     async def _get_client(self) -> httpx.AsyncClient:
+        # Cliente injetado (testes) ou o pool compartilhado da aplicação
         if self._client is None or getattr(self._client, "is_closed", False):
-            self._client = httpx.AsyncClient(timeout=10.0)
+            return get_http_client(BRUDAM)
         return self._client
 
     def montar_payload(
@@ -33,6 +41,34 @@ class TrackingService:
         recebedor: Optional[dict] = None,
         remetente_cnpj: str = None,
     ) -> dict:
+        documento = self.montar_documento(
+            chave_documento=chave_documento,
+            codigo_evento=codigo_evento,
+            data_evento=data_evento,
+            obs=obs,
+            tipo=tipo,
+            anexos=anexos,
+            recebedor=recebedor,
+            remetente_cnpj=remetente_cnpj,
+        )
+        return self.montar_envelope([documento])
+
+    def montar_envelope(self, documentos: list) -> dict:
+        """Envolve documentos já montados com o bloco de autenticação."""
+        return {"auth": {"usuario": self.usuario, "senha": self.senha}, "documentos": documentos}
+
+    @staticmethod
+    def montar_documento(
+        chave_documento: str,
+        codigo_evento: str,
+        data_evento: Optional[datetime.datetime] = None,
+        obs: Optional[str] = None,
+        tipo: str = "NFE",
+        anexos: Optional[list] = None,
+        recebedor: Optional[dict] = None,
+        remetente_cnpj: str = None,
+    ) -> dict:
+        """Monta um item da lista "documentos" do payload de tracking."""
 
         # permissive validation
         data_fmt = (data_evento or datetime.datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
@@ -58,7 +94,7 @@ class TrackingService:
         if anexos:
             documento["anexos"] = anexos
 
-        return {"auth": {"usuario": self.usuario, "senha": self.senha}, "documentos": [documento]}
+        return documento
 
     async def enviar(
         self,
@@ -83,16 +119,79 @@ class TrackingService:
             remetente_cnpj=remetente_cnpj,
         )
 
+        success, _, text = await self._post(payload)
+        return success, text
+
+    async def enviar_documentos(self, documentos: list) -> Tuple[bool, int, str]:
+        """Envia documentos já montados (ex.: gravados no outbox) em um único POST.
+
+        Anexos que referenciam arquivos locais (ANEXO_REF_KEY) têm o base64
+        gerado em streaming durante o envio, sem carregar o arquivo em memória.
+
+        Returns:
+            (sucesso, status HTTP, corpo da resposta)
+        """
+        payload = self.montar_envelope(documentos)
+        parts, paths = self._split_anexo_refs(payload)
+        if not paths:
+            return await self._post(payload)
+        return await self._post_stream(parts, paths)
+
+    def _split_anexo_refs(self, payload: dict) -> Tuple[list, list]:
+        """Serializa o payload trocando cada anexo local por um marcador.
+
+        Returns:
+            (pedaços de JSON em bytes, caminhos dos arquivos entre eles); sem
+            anexos locais, ([], [])
+        """
+        if self._attachment_svc is None:
+            self._attachment_svc = AttachmentService()
+        marker = f"@@anexo-{uuid.uuid4().hex}@@"
+        paths = []
+        documentos = []
+        for documento in payload["documentos"]:
+            anexos = []
+            for anexo in documento.get("anexos") or []:
+                arquivo = dict(anexo.get("arquivo") or {})
+                ref = arquivo.pop(ANEXO_REF_KEY, None)
+                if ref is not None:
+                    path = self._attachment_svc.resolve_path(ref)
+                    if path is None:
+                        logger.warning("Tracking attachment %s not found, sending without dados", ref)
+                    else:
+                        arquivo["dados"] = marker
+                        paths.append(path)
+                anexos.append({**anexo, "arquivo": arquivo})
+            documentos.append({**documento, "anexos": anexos} if anexos else documento)
+        if not paths:
+            return [], []
+        text = json.dumps({**payload, "documentos": documentos})
+        return [part.encode() for part in re.split(re.escape(marker), text)], paths
+
+    async def _post_stream(self, parts: list, paths: list) -> Tuple[bool, int, str]:
+        length = sum(len(part) for part in parts) + sum(AttachmentService.base64_length(p) for p in paths)
+
+        async def body():
+            for i, part in enumerate(parts):
+                yield part
+                if i < len(paths):
+                    async for chunk in AttachmentService.aiter_base64(paths[i]):
+                        yield chunk.encode("ascii")
+
+        client = await self._get_client()
+        headers = {"Content-Type": "application/json", "Content-Length": str(length)}
+        resp = await client.post(self.endpoint, content=body(), headers=headers)
+        return resp.status_code < 300, resp.status_code, resp.text
+
+    async def _post(self, payload: dict) -> Tuple[bool, int, str]:
         client = await self._get_client()
         headers = {"Content-Type": "application/json"}
 
         resp = await client.post(self.endpoint, json=payload, headers=headers)
-        text = resp.text
-        success = resp.status_code < 300
-        return success, text
+        return resp.status_code < 300, resp.status_code, resp.text
 
     @staticmethod
-    async def registrar(session: AsyncSession, shipment_invoice_id: int, codigo_evento: str, descricao: str | None = None, data_evento: Optional[datetime.datetime] = None):
+    async def registrar(session: AsyncSession, shipment_invoice_id: int, codigo_evento: str, descricao: str | None = None, data_evento: Optional[datetime.datetime] = None, commit: bool = True):
         """Persist a tracking record in DB (async).
 
         Params:
@@ -101,6 +200,8 @@ class TrackingService:
             codigo_evento: event code (string)
             descricao: optional description
             data_evento: optional datetime
+            commit: when False the record is only added to the caller's transaction
+                (its id comes from the INSERT ... RETURNING at flush time)
         """
         if data_evento is None:
             data_evento = datetime.datetime.now()
@@ -111,6 +212,8 @@ class TrackingService:
             data_evento=data_evento,
         )
         session.add(tr)
+        if not commit:
+            return tr
         await session.commit()
         await session.refresh(tr)
         return tr
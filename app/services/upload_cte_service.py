@@ -1,9 +1,15 @@
 import os
+import asyncio
+import base64
 import datetime
-from typing import Optional, Tuple
+import time
+from typing import Awaitable, Callable, Optional, Tuple
 import httpx
 import json
+from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.http_clients import BRUDAM, get_http_client
 from app.models.shipment import ShipmentInvoiceTracking
 
 class BrudamError(Exception):
@@ -22,6 +28,91 @@ class BrudamError(Exception):
 from app.services.constants import VALID_CODES, VALID_CODES_SET
 
 
+def _jwt_exp(token: str) -> Optional[float]:
+    """Lê o claim "exp" (epoch) de um JWT sem validar a assinatura; None se não for JWT."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except Exception:
+        return None
+
+
+class BrudamTokenCache:
+    """Token de login da Brudam compartilhado entre instâncias de UploadCteService.
+
+    - O token vale até o "exp" do JWT (ou BRUDAM_TOKEN_TTL segundos) ou até um 401
+    - Logins concorrentes viram um só (single-flight): quem chega durante um
+      login em andamento espera o resultado dele
+    - Nos últimos BRUDAM_TOKEN_REFRESH_MARGIN segundos de validade o token
+      ainda é devolvido, e um login novo é disparado em background
+    """
+
+    def __init__(self):
+        self._tokens: dict[tuple, tuple[str, float]] = {}
+        self._locks: dict[tuple, asyncio.Lock] = {}
+        self._refreshing: dict[tuple, asyncio.Task] = {}
+
+    async def get(self, key: tuple, login: Callable[[], Awaitable[str]]) -> str:
+        """Devolve o token em cache para key, fazendo login (uma única vez) se necessário."""
+        cached = self._tokens.get(key)
+        if cached is not None:
+            token, expires_at = cached
+            remaining = expires_at - time.time()
+            if remaining > 0:
+                if remaining <= settings.brudam_token_refresh_margin:
+                    self._refresh_in_background(key, login, token)
+                return token
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Outro chamador pode ter feito o login enquanto esperávamos o lock
+            cached = self._tokens.get(key)
+            if cached is not None and cached[1] > time.time():
+                return cached[0]
+            return await self._login(key, login)
+
+    def invalidate(self, key: tuple, token: str) -> None:
+        """Descarta o token (ex.: 401), a menos que outro login já o tenha substituído."""
+        cached = self._tokens.get(key)
+        if cached is not None and cached[0] == token:
+            del self._tokens[key]
+
+    def clear(self) -> None:
+        self._tokens.clear()
+
+    async def _login(self, key: tuple, login: Callable[[], Awaitable[str]]) -> str:
+        token = await login()
+        exp = _jwt_exp(token)
+        expires_at = exp if exp is not None else time.time() + settings.brudam_token_ttl
+        self._tokens[key] = (token, expires_at)
+        logger.info("Brudam login token cached for %.0fs", expires_at - time.time())
+        return token
+
+    def _refresh_in_background(self, key: tuple, login: Callable[[], Awaitable[str]], token: str) -> None:
+        task = self._refreshing.get(key)
+        if task is not None and not task.done():
+            return
+
+        async def refresh():
+            lock = self._locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                cached = self._tokens.get(key)
+                if cached is not None and cached[0] != token:
+                    return  # já renovado por outro caminho
+                try:
+                    await self._login(key, login)
+                except Exception as e:
+                    # O token atual continua válido até expirar; o próximo get tenta de novo
+                    logger.warning("Brudam background login failed: %s", e)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+
+_token_cache = BrudamTokenCache()
+
+
 class UploadCteService:
 
     def __init__(self, client: Optional[httpx.AsyncClient] = None):
@@ -32,10 +123,15 @@ class UploadCteService:
         self._client = client
 
     async def _get_client(self) -> httpx.AsyncClient:
+        # Cliente injetado (testes) ou o pool compartilhado da aplicação
         if self._client is None or getattr(self._client, "is_closed", False):
-            self._client = httpx.AsyncClient(timeout=10.0)
+            return get_http_client(BRUDAM)
         return self._client
     
+    async def get_token(self) -> str:
+        """Token de acesso em cache (login só quando não há token válido)."""
+        return await _token_cache.get((self.endpoint_login, self.usuario), self.login)
+
     async def login(self) -> str:
 
         client = await self._get_client()
@@ -84,12 +180,18 @@ class UploadCteService:
         client = await self._get_client()
 
         # login may raise BrudamError on failure
-        token = await self.login()
+        token = await self.get_token()
 
         headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
 
         try:
             resp = await client.post(self.endpoint, json=payload, headers=headers)
+            if resp.status_code == 401:
+                # Token revogado/expirado antes do previsto: descarta e tenta uma vez com login novo
+                _token_cache.invalidate((self.endpoint_login, self.usuario), token)
+                token = await self.get_token()
+                headers["Authorization"] = f"Bearer {token}"
+                resp = await client.post(self.endpoint, json=payload, headers=headers)
             # If status >= 400, capture body for debugging and raise
             if resp.status_code >= 400:
                 try:
@@ -1,100 +1,143 @@
+from operator import attrgetter, itemgetter
 from typing import Optional
 
+from app.models.shipment import Shipment
+from app.schemas.notfis import Actor, Carga, Horarios, MinutaHeader, NotaFiscalItem
+
 
 def _safe_get(obj, attr, default=None):
     return getattr(obj, attr, default) if obj is not None else default
 
 
+def _known_attrs(source_type) -> set:
+    """Atributos que toda instância de source_type tem (campos Pydantic ou colunas ORM)."""
+    if hasattr(source_type, "model_fields"):
+        return set(source_type.model_fields)
+    return set(source_type.__table__.columns.keys())
+
+
+class FieldMap:
+    """Mapa (destino, atributo de origem) compilado uma única vez, no import.
+
+    Para instâncias exatas de source_type os valores saem de uma só vez:
+    modelos Pydantic pelo __dict__ (operator.itemgetter), modelos ORM pelos
+    atributos (operator.attrgetter), para que colunas expiradas ou adiadas
+    passem pelo descriptor do SQLAlchemy. Destinos sem atributo na origem
+    ficam None. Outros objetos (ou None) caem no getattr tolerante de antes.
+    """
+
+    __slots__ = ("source_type", "pairs", "_targets", "_items", "_attrs", "_absent")
+
+    def __init__(self, source_type, pairs):
+        known = _known_attrs(source_type)
+        self.source_type = source_type
+        self.pairs = tuple(pairs)
+        attrs = [attr for _, attr in self.pairs if attr in known]
+        self._targets = tuple(target for target, attr in self.pairs if attr in known)
+        pydantic = hasattr(source_type, "model_fields")
+        if not attrs:
+            self._items = self._attrs = None
+        elif len(attrs) == 1:
+            # itemgetter/attrgetter com um único nome devolvem o valor e não uma tupla
+            item, attr = itemgetter(attrs[0]), attrgetter(attrs[0])
+            self._items = (lambda d: (item(d),)) if pydantic else None
+            self._attrs = lambda obj: (attr(obj),)
+        else:
+            self._items = itemgetter(*attrs) if pydantic else None
+            self._attrs = attrgetter(*attrs)
+        self._absent = {target: None for target, attr in self.pairs if attr not in known}
+
+    def fill(self, out: dict, obj) -> dict:
+        """Grava em out os valores de obj para cada destino do mapa."""
+        if obj is None:
+            for target, _ in self.pairs:
+                out[target] = None
+        elif type(obj) is self.source_type and self._attrs is not None:
+            if self._items is not None:
+                try:
+                    values = self._items(obj.__dict__)
+                except KeyError:
+                    # Instância montada com model_construct sem algum campo
+                    values = self._attrs(obj)
+            else:
+                values = self._attrs(obj)
+            out.update(zip(self._targets, values))
+            if self._absent:
+                out.update(self._absent)
+        else:
+            for target, attr in self.pairs:
+                out[target] = getattr(obj, attr, None)
+        return out
+
+    def to_dict(self, obj) -> dict:
+        return self.fill({}, obj)
+
+
+def _actor_pairs(prefix: str) -> list:
+    """Campos do Actor que têm coluna f"{prefix}_{campo}" em Shipment."""
+    columns = _known_attrs(Shipment)
+    return [(f"{prefix}_{field}", field) for field in Actor.model_fields if f"{prefix}_{field}" in columns]
+
+
+_MINUTA_MAP = FieldMap(MinutaHeader, [
+    ("c_tab", "cTab"),
+    ("tp_emi", "tpEmi"),
+    ("emission_status", "cStatus"),
+    ("c_aut", "cAut"),
+    ("n_doc_emit", "nDocEmit"),
+    ("d_emi", "dEmi"),
+    ("c_orig_calc", "cOrigCalc"),
+    ("c_dest_calc", "cDestCalc"),
+])
+_CARGA_MAP = FieldMap(Carga, [("pbru", "pBru"), ("pcub", "pCub"), ("qvol", "qVol"), ("vtot", "vTot")])
+_TOMADOR_MAP = FieldMap(Actor, [("tomador_cnpj", "nDoc"), ("tomador_nDoc", "nDoc"), ("tomador_xNome", "xNome")])
+_REM_MAP = FieldMap(Actor, _actor_pairs("rem"))
+_DEST_MAP = FieldMap(Actor, _actor_pairs("dest"))
+_RECEBEDOR_MAP = FieldMap(Actor, _actor_pairs("recebedor"))
+_HORARIOS_MAP = FieldMap(Horarios, [(field, field) for field in Horarios.model_fields if field in _known_attrs(Shipment)])
+
+_NOTA_MAP = FieldMap(NotaFiscalItem, [
+    ("n_ped", "nPed"),
+    ("invoice_number", "nDoc"),
+    ("invoice_series", "serie"),
+    ("d_emi", "dEmi"),
+    ("v_bc", "vBC"),
+    ("v_icms", "vICMS"),
+    ("v_bcst", "vBCST"),
+    ("v_st", "vST"),
+    ("v_prod", "vProd"),
+    ("invoice_value", "vNF"),
+    ("ncfop", "nCFOP"),
+    ("pbru", "pBru"),
+    ("qvol", "qVol"),
+    ("access_key", "chave"),
+    ("tp_doc", "tpDoc"),
+    ("x_esp", "xEsp"),
+    ("x_nat", "xNat"),
+])
+
+
 def minuta_to_shipment_payload(minuta, rem, dest, toma, receb, raw_payload: str) -> dict:
     carga = _safe_get(minuta, "carga")
     horarios = _safe_get(minuta, "horarios")
+    c_serv = _safe_get(minuta, "cServ")
 
-    payload = {
-        "service_code": str(_safe_get(minuta, "cServ")) if _safe_get(minuta, "cServ") is not None else None,
-        "c_tab": _safe_get(minuta, "cTab"),
-        "tp_emi": _safe_get(minuta, "tpEmi"),
-        "emission_status": _safe_get(minuta, "cStatus"),
-        "c_aut": _safe_get(minuta, "cAut"),
-        "n_doc_emit": _safe_get(minuta, "nDocEmit"),
-        "d_emi": _safe_get(minuta, "dEmi"),
-        "c_orig_calc": _safe_get(minuta, "cOrigCalc"),
-        "c_dest_calc": _safe_get(minuta, "cDestCalc"),
-
-        # carga
-        "pbru": _safe_get(carga, "pBru"),
-        "pcub": _safe_get(carga, "pCub"),
-        "qvol": _safe_get(carga, "qVol"),
-        "vtot": _safe_get(carga, "vTot"),
-
-        # actors (basic)
-        "tomador_cnpj": _safe_get(toma, "nDoc"),
-        "tomador_nDoc": _safe_get(toma, "nDoc"),
-        "tomador_xNome": _safe_get(toma, "xNome"),
-
-        # rem (full details)
-        "rem_nDoc": _safe_get(rem, "nDoc"),
-        "rem_xNome": _safe_get(rem, "xNome"),
-        "rem_IE": _safe_get(rem, "IE"),
-        "rem_cFiscal": _safe_get(rem, "cFiscal"),
-        "rem_xFant": _safe_get(rem, "xFant"),
-        "rem_xLgr": _safe_get(rem, "xLgr"),
-        "rem_nro": _safe_get(rem, "nro"),
-        "rem_xCpl": _safe_get(rem, "xCpl"),
-        "rem_xBairro": _safe_get(rem, "xBairro"),
-        "rem_cMun": _safe_get(rem, "cMun"),
-        "rem_CEP": _safe_get(rem, "CEP"),
-        "rem_cPais": _safe_get(rem, "cPais"),
-        "rem_nFone": _safe_get(rem, "nFone"),
-        "rem_email": _safe_get(rem, "email"),
-
-        # dest (full details)
-        "dest_nDoc": _safe_get(dest, "nDoc"),
-        "dest_xNome": _safe_get(dest, "xNome"),
-        "dest_IE": _safe_get(dest, "IE"),
-        "dest_cFiscal": _safe_get(dest, "cFiscal"),
-        "dest_xFant": _safe_get(dest, "xFant"),
-        "dest_xLgr": _safe_get(dest, "xLgr"),
-        "dest_nro": _safe_get(dest, "nro"),
-        "dest_xCpl": _safe_get(dest, "xCpl"),
-        "dest_xBairro": _safe_get(dest, "xBairro"),
-        "dest_cMun": _safe_get(dest, "cMun"),
-        "dest_CEP": _safe_get(dest, "CEP"),
-        "dest_cPais": _safe_get(dest, "cPais"),
-        "dest_nFone": _safe_get(dest, "nFone"),
-        "dest_email": _safe_get(dest, "email"),
-
-        # recebedor (optional)
-        "recebedor_nDoc": _safe_get(receb, "nDoc"),
-        "recebedor_xNome": _safe_get(receb, "xNome"),
-        "recebedor_IE": _safe_get(receb, "IE"),
-        "recebedor_cFiscal": _safe_get(receb, "cFiscal"),
-        "recebedor_xLgr": _safe_get(receb, "xLgr"),
-        "recebedor_nro": _safe_get(receb, "nro"),
-        "recebedor_xCpl": _safe_get(receb, "xCpl"),
-        "recebedor_xBairro": _safe_get(receb, "xBairro"),
-        "recebedor_cMun": _safe_get(receb, "cMun"),
-        "recebedor_CEP": _safe_get(receb, "CEP"),
-        "recebedor_cPais": _safe_get(receb, "cPais"),
-        "recebedor_nFone": _safe_get(receb, "nFone"),
-        "recebedor_email": _safe_get(receb, "email"),
-
-        # horarios (if provided on minuta)
-        "et_origem": _safe_get(horarios, "et_origem"),
-        "chegada_coleta": _safe_get(horarios, "chegada_coleta"),
-        "saida_coleta": _safe_get(horarios, "saida_coleta"),
-        "eta_destino": _safe_get(horarios, "eta_destino"),
-        "chegada_destino": _safe_get(horarios, "chegada_destino"),
-        "finalizacao": _safe_get(horarios, "finalizacao"),
-
-        # derived
-        "total_weight": float(_safe_get(carga, "pBru")) if carga and _safe_get(carga, "pBru") else None,
-        "total_value": float(_safe_get(carga, "vTot")) if carga and _safe_get(carga, "vTot") else None,
-        "volumes_qty": int(_safe_get(carga, "qVol")) if carga and _safe_get(carga, "qVol") else None,
-        "raw_payload": raw_payload,
-    }
-
-    # Remove keys with None to avoid overriding DB defaults unnecessarily
-    return {k: v for k, v in payload.items()}
+    payload = {"service_code": str(c_serv) if c_serv is not None else None}
+    _MINUTA_MAP.fill(payload, minuta)
+    _CARGA_MAP.fill(payload, carga)
+    _TOMADOR_MAP.fill(payload, toma)
+    _REM_MAP.fill(payload, rem)
+    _DEST_MAP.fill(payload, dest)
+    _RECEBEDOR_MAP.fill(payload, receb)
+    _HORARIOS_MAP.fill(payload, horarios)
+
+    # derived
+    payload["total_weight"] = float(payload["pbru"]) if carga and payload["pbru"] else None
+    payload["total_value"] = float(payload["vtot"]) if carga and payload["vtot"] else None
+    payload["volumes_qty"] = int(payload["qvol"]) if carga and payload["qvol"] else None
+    payload["raw_payload"] = raw_payload
+
+    return payload
 
 
 def nota_to_invoice_payload(nf, shipment_id: Optional[int] = None) -> dict:
@@ -106,27 +149,10 @@ def nota_to_invoice_payload(nf, shipment_id: Optional[int] = None) -> dict:
     elif hasattr(nf_rem, "nDoc"):
         remetente_ndoc = getattr(nf_rem, "nDoc")
 
-    payload = {
-        "shipment_id": shipment_id,
-        "n_ped": _safe_get(nf, "nPed"),
-        "invoice_number": _safe_get(nf, "nDoc"),
-        "invoice_series": _safe_get(nf, "serie"),
-        "d_emi": _safe_get(nf, "dEmi"),
-        "v_bc": _safe_get(nf, "vBC"),
-        "v_icms": _safe_get(nf, "vICMS"),
-        "v_bcst": _safe_get(nf, "vBCST"),
-        "v_st": _safe_get(nf, "vST"),
-        "v_prod": _safe_get(nf, "vProd"),
-        "invoice_value": _safe_get(nf, "vNF"),
-        "ncfop": _safe_get(nf, "nCFOP"),
-        "pbru": _safe_get(nf, "pBru"),
-        "qvol": _safe_get(nf, "qVol"),
-        "access_key": _safe_get(nf, "chave"),
-        "tp_doc": _safe_get(nf, "tpDoc"),
-        "x_esp": _safe_get(nf, "xEsp"),
-        "x_nat": _safe_get(nf, "xNat"),
-        "cte_chave": (_safe_get(nf, "cte", {}) or {}).get("Chave") if _safe_get(nf, "cte") else None,
-        "remetente_ndoc": remetente_ndoc,
-    }
-
-    return {k: v for k, v in payload.items()} 
+    payload = {"shipment_id": shipment_id}
+    _NOTA_MAP.fill(payload, nf)
+    cte = _safe_get(nf, "cte")
+    payload["cte_chave"] = (cte or {}).get("Chave") if cte else None
+    payload["remetente_ndoc"] = remetente_ndoc
+
+    return payload
@@ -0,0 +1,51 @@
+"""Compressão do payload bruto das minutas (EMISSAO_RAW_PAYLOAD)."""
+
+import gzip
+from typing import Optional
+
+from loguru import logger
+
+try:
+    import zstandard
+except ImportError:  # zstd é opcional; sem ele usamos gzip
+    zstandard = None
+
+
+RAW_PAYLOAD_TEXT = "text"
+RAW_PAYLOAD_GZIP = "gzip"
+RAW_PAYLOAD_ZSTD = "zstd"
+RAW_PAYLOAD_OFF = "off"
+RAW_PAYLOAD_MODES = (RAW_PAYLOAD_TEXT, RAW_PAYLOAD_GZIP, RAW_PAYLOAD_ZSTD, RAW_PAYLOAD_OFF)
+
+_warned_zstd_missing = False
+
+
+def resolve_encoding(mode: Optional[str]) -> str:
+    """Normaliza o modo configurado; zstd sem o pacote 'zstandard' cai para gzip."""
+    global _warned_zstd_missing
+    mode = (mode or RAW_PAYLOAD_TEXT).lower()
+    if mode not in RAW_PAYLOAD_MODES:
+        logger.warning("Unknown raw payload mode %s, using %s", mode, RAW_PAYLOAD_TEXT)
+        return RAW_PAYLOAD_TEXT
+    if mode == RAW_PAYLOAD_ZSTD and zstandard is None:
+        if not _warned_zstd_missing:
+            logger.warning("zstandard is not installed, raw payloads will be stored with gzip")
+            _warned_zstd_missing = True
+        return RAW_PAYLOAD_GZIP
+    return mode
+
+
+def compress_raw_payload(data: bytes, encoding: str) -> bytes:
+    """Comprime o payload bruto com o encoding informado (gzip ou zstd)."""
+    if encoding == RAW_PAYLOAD_ZSTD:
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress_raw_payload(data: bytes, encoding: str) -> bytes:
+    """Inverso de compress_raw_payload."""
+    if encoding == RAW_PAYLOAD_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Payload comprimido com zstd, mas o pacote 'zstandard' não está instalado")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
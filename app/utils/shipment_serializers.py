@@ -3,6 +3,7 @@ from __future__ import annotations
 from typing import Any, Dict, Optional
 
 from app.models.shipment import Shipment, ShipmentInvoice
+from app.utils.mappers import FieldMap
 from app.schemas.shipment import (
     ActorOut,
     HorariosOut,
@@ -13,35 +14,53 @@ from app.schemas.shipment import (
 )
 
 
+_NORMALIZED_ACTOR_FIELDS = (
+    ("UF", "uf"),
+    ("municipioCodigoIbge", "municipio_codigo_ibge"),
+    ("municipioNome", "municipio_nome"),
+)
+_ACTOR_FIELDS = tuple(f for f in ActorOut.model_fields if f not in dict(_NORMALIZED_ACTOR_FIELDS))
+
+
+def _actor_map(prefix: str, include_normalized: bool) -> FieldMap:
+    pairs = [(field, f"{prefix}_{field}") for field in _ACTOR_FIELDS]
+    if include_normalized:
+        pairs += [(field, f"{prefix}_{suffix}") for field, suffix in _NORMALIZED_ACTOR_FIELDS]
+    return FieldMap(Shipment, pairs)
+
+
+# Mapas coluna -> campo gerados uma vez; colunas inexistentes (ex.: tomador_IE) saem como None
+_ACTOR_MAPS = {
+    ("rem", True): _actor_map("rem", True),
+    ("dest", True): _actor_map("dest", True),
+    ("tomador", False): _actor_map("tomador", False),
+    ("recebedor", True): _actor_map("recebedor", True),
+}
+_HORARIOS_MAP = FieldMap(Shipment, [(field, field) for field in HorariosOut.model_fields])
+
+
+def _list_columns() -> tuple:
+    """Colunas de Shipment lidas por shipment_to_read(include_locations=False)."""
+    columns = Shipment.__table__.columns
+    names = ["id", "external_ref", "service_code", "total_weight", "total_value", "volumes_qty", "status"]
+    for field_map in (*_ACTOR_MAPS.values(), _HORARIOS_MAP):
+        names += [attr for _, attr in field_map.pairs if attr in columns and attr not in names]
+    return tuple(getattr(Shipment, name) for name in names)
+
+
+# Usado pelo GET /cargas para carregar só o que a listagem serializa (sem raw_payload etc.)
+SHIPMENT_LIST_COLUMNS = _list_columns()
+INVOICE_LIST_COLUMNS = (ShipmentInvoice.id, ShipmentInvoice.access_key, ShipmentInvoice.cte_chave, ShipmentInvoice.remetente_ndoc)
+
+
 def _actor_from(shipment: Shipment, prefix: str, include_normalized: bool = True) -> Optional[ActorOut]:
     if shipment is None:
         return None
 
-    data: Dict[str, Any] = {
-        "nDoc": getattr(shipment, f"{prefix}_nDoc", None),
-        "IE": getattr(shipment, f"{prefix}_IE", None),
-        "cFiscal": getattr(shipment, f"{prefix}_cFiscal", None),
-        "xNome": getattr(shipment, f"{prefix}_xNome", None),
-        "xFant": getattr(shipment, f"{prefix}_xFant", None),
-        "xLgr": getattr(shipment, f"{prefix}_xLgr", None),
-        "nro": getattr(shipment, f"{prefix}_nro", None),
-        "xCpl": getattr(shipment, f"{prefix}_xCpl", None),
-        "xBairro": getattr(shipment, f"{prefix}_xBairro", None),
-        "cMun": getattr(shipment, f"{prefix}_cMun", None),
-        "CEP": getattr(shipment, f"{prefix}_CEP", None),
-        "cPais": getattr(shipment, f"{prefix}_cPais", None),
-        "nFone": getattr(shipment, f"{prefix}_nFone", None),
-        "email": getattr(shipment, f"{prefix}_email", None),
-    }
-
-    if include_normalized:
-        data.update(
-            {
-                "UF": getattr(shipment, f"{prefix}_uf", None),
-                "municipioCodigoIbge": getattr(shipment, f"{prefix}_municipio_codigo_ibge", None),
-                "municipioNome": getattr(shipment, f"{prefix}_municipio_nome", None),
-            }
-        )
+    field_map = _ACTOR_MAPS.get((prefix, include_normalized))
+    if field_map is None:
+        field_map = _ACTOR_MAPS[(prefix, include_normalized)] = _actor_map(prefix, include_normalized)
+    data: Dict[str, Any] = field_map.to_dict(shipment)
 
     # If every value is None, return None to avoid noisy payloads
     if all(value is None for value in data.values()):
@@ -54,14 +73,7 @@ def _horarios_from(shipment: Shipment) -> Optional[HorariosOut]:
     if shipment is None:
         return None
 
-    data = {
-        "et_origem": shipment.et_origem,
-        "chegada_coleta": shipment.chegada_coleta,
-        "saida_coleta": shipment.saida_coleta,
-        "eta_destino": shipment.eta_destino,
-        "chegada_destino": shipment.chegada_destino,
-        "finalizacao": shipment.finalizacao,
-    }
+    data = _HORARIOS_MAP.to_dict(shipment)
 
     if all(value is None for value in data.values()):
         return None
@@ -0,0 +1,118 @@
+"""Benchmark of the /emissao write path: rows/second per EmissaoService mode.
+
+Generates a synthetic Notfis batch and runs it through every requested mode
+against a scratch database, printing shipments + invoices written per second.
+
+Usage:
+    python scripts/bench_emissao.py --minutas 500 --notas 3
+    python scripts/bench_emissao.py --modes serial bulk --database-url postgresql+asyncpg://...
+
+By default location enrichment is skipped so only the write path is measured;
+pass --with-locations to include it. --raw-payload / --audit-log override
+EMISSAO_RAW_PAYLOAD / EMISSAO_AUDIT_LOG for the run.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (register tables)
+from app.core.config import settings
+from app.db import Base
+from app.schemas.notfis import NotfisPayload
+from app.services.emissao_service import EmissaoService, MODOS_EMISSAO
+from app.services.localidades_service import LocalidadesService
+from app.utils.raw_payload import RAW_PAYLOAD_MODES
+
+
+def build_payload(minutas: int, notas: int) -> NotfisPayload:
+    actor = {
+        "nDoc": "12345678901234", "IE": "ISENTO", "cFiscal": 1, "xNome": "BENCH LTDA",
+        "xFant": "BENCH", "xLgr": "RUA BENCH", "nro": "1", "xBairro": "CENTRO",
+        "cMun": "3550308", "CEP": "01001000", "cPais": 1058,
+    }
+    documentos = []
+    for m in range(minutas):
+        documentos.append({
+            "minuta": {
+                "toma": "0", "nDocEmit": f"BENCH{m}", "dEmi": "2026-01-23", "cServ": 1,
+                "cTab": "TAB", "tpEmi": 1, "cStatus": 1, "cAut": f"ROM{m}",
+                "carga": {"pBru": "10.5", "pCub": "1.0", "qVol": "3", "vTot": "1500.00"},
+                "cOrigCalc": "3550308", "cDestCalc": "3304557",
+            },
+            "rem": actor,
+            "dest": actor,
+            "documentos": [
+                {
+                    "serie": "1", "nDoc": str(n), "dEmi": "2026-01-23", "vBC": "100.00",
+                    "vICMS": "18.00", "vBCST": "0.00", "vST": "0.00", "vProd": "100.00",
+                    "vNF": "120.00", "nCFOP": "5102", "pBru": "1.0", "qVol": "1",
+                    "chave": f"{m:022d}{n:022d}", "tpDoc": "NFE", "xEsp": "VOL", "xNat": "VENDA",
+                }
+                for n in range(notas)
+            ],
+        })
+    return NotfisPayload.model_validate({"documentos": documentos})
+
+
+async def run(database_url: str, modes: list[str], minutas: int, notas: int):
+    engine = create_async_engine(database_url, echo=False)
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    payload = build_payload(minutas, notas)
+    rows = minutas * (notas + 1)
+    print(f"{minutas} minutas x {notas} notas = {rows} rows per run")
+
+    for modo in modes:
+        async with Session() as db:
+            start = time.perf_counter()
+            result = await EmissaoService(db, session_factory=Session).process_payload(payload, "bench", modo=modo)
+            elapsed = time.perf_counter() - start
+        failed = sum(1 for r in result.data if r.status == 0)
+        print(f"{modo:>10}: {elapsed:8.3f}s  {rows / elapsed:10.0f} rows/s  (falhas={failed})")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--minutas", type=int, default=500)
+    parser.add_argument("--notas", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", default=list(MODOS_EMISSAO), choices=MODOS_EMISSAO)
+    parser.add_argument("--database-url", default=None, help="Default: scratch SQLite file")
+    parser.add_argument("--with-locations", action="store_true")
+    parser.add_argument("--raw-payload", choices=RAW_PAYLOAD_MODES, default=None)
+    parser.add_argument("--audit-log", choices=("full", "summary", "off"), default=None)
+    args = parser.parse_args()
+
+    if args.raw_payload:
+        settings.emissao_raw_payload = args.raw_payload
+    if args.audit_log:
+        settings.emissao_audit_log = args.audit_log
+
+    if not args.with_locations:
+        async def _skip(db, shipment):
+            return None
+        LocalidadesService.set_shipment_locations = staticmethod(_skip)
+
+    # Keep the per-minuta audit log line out of the measurement output
+    from loguru import logger
+    logger.remove()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_emissao.db')}"
+    asyncio.run(run(database_url, args.modes, args.minutas, args.notas))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Micro-benchmark of the minuta -> Shipment and Shipment -> ShipmentRead mappings.
+
+Prints mappings/second for each direction and compares the compiled FieldMap
+with the per-field getattr loop it replaces. No database is needed.
+
+Usage:
+    python scripts/bench_mappers.py --seconds 1
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.models.shipment import Shipment
+from app.utils.mappers import FieldMap, minuta_to_shipment_payload, nota_to_invoice_payload
+from app.utils.shipment_serializers import _ACTOR_MAPS, shipment_to_read
+from bench_emissao import build_payload
+
+
+def _rate(fn, seconds: float) -> float:
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            fn()
+        count += 100
+    return count / (time.perf_counter() - start)
+
+
+def _getattr_loop(field_map: FieldMap, obj) -> dict:
+    return {target: getattr(obj, attr, None) for target, attr in field_map.pairs}
+
+
+def run(seconds: float):
+    minuta = build_payload(1, 3).documentos[0]
+    shipment = Shipment(id=1, **minuta_to_shipment_payload(minuta.minuta, minuta.rem, minuta.dest, minuta.rem, minuta.rem, None))
+    shipment.invoices = []
+    # Como uma instância vinda do banco: todas as colunas carregadas
+    for column in Shipment.__table__.columns.keys():
+        if column not in shipment.__dict__:
+            setattr(shipment, column, None)
+
+    rem_map = _ACTOR_MAPS[("rem", True)]
+    rates = {
+        "minuta->shipment": _rate(lambda: minuta_to_shipment_payload(minuta.minuta, minuta.rem, minuta.dest, minuta.rem, minuta.rem, None), seconds),
+        "nota->invoice": _rate(lambda: nota_to_invoice_payload(minuta.documentos[0], 1), seconds),
+        "shipment->read": _rate(lambda: shipment_to_read(shipment), seconds),
+        "actor map (FieldMap)": _rate(lambda: rem_map.to_dict(shipment), seconds),
+        "actor map (getattr)": _rate(lambda: _getattr_loop(rem_map, shipment), seconds),
+    }
+    for name, rate in rates.items():
+        print(f"{name:>22} {rate:>12,.0f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=1.0, help="Duração de cada medição")
+    args = parser.parse_args()
+    run(args.seconds)
+
+
+if __name__ == '__main__':
+    main()
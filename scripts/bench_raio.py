@@ -0,0 +1,116 @@
+"""Benchmark of GET /municipios/{codigo}/raio: latency per radius for each query strategy.
+
+Runs against a database with municipios already synchronized (geometry imported by
+POST /sincronizar and migration 0012 applied), printing the median latency in ms of:
+
+- antes:        ST_DWithin on the full MULTIPOLYGON, index scans disabled (query before 0012)
+- gist:         same ST_DWithin, with the GiST index on geometria
+- simplificada: bbox prefilter on geometria_simplificada (GiST) + exact ST_DWithin (current query)
+- centroides:   in-memory centroid index (default path, no PostGIS needed)
+
+Usage:
+    python scripts/bench_raio.py --database-url postgresql+asyncpg://... --raios 10 50 100 300
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import aliased, sessionmaker
+
+from app.core.config import settings
+from app.models.localidades import Municipio
+from app.services.localidades_service import LocalidadesService
+
+
+def _dwithin_completo(codigo_ibge: int, raio_km: float):
+    base = aliased(Municipio)
+    geom_base = select(base.geometria).where(base.codigo_ibge == codigo_ibge).scalar_subquery()
+    return select(Municipio.codigo_ibge).where(func.ST_DWithin(Municipio.geometria, geom_base, raio_km * 1000))
+
+
+def _prefiltro_simplificada(codigo_ibge: int, raio_km: float):
+    return select(Municipio.codigo_ibge).where(*LocalidadesService._filtro_raio_postgis(codigo_ibge, raio_km))
+
+
+async def _medir_sql(Session, stmt_fn, codigos, raio_km, sem_indice=False) -> tuple[float, int]:
+    tempos, total = [], 0
+    for codigo in codigos:
+        async with Session() as db:
+            async with db.begin():
+                if sem_indice:
+                    await db.execute(text("SET LOCAL enable_indexscan = off"))
+                    await db.execute(text("SET LOCAL enable_bitmapscan = off"))
+                start = time.perf_counter()
+                total += len((await db.execute(stmt_fn(codigo, raio_km))).all())
+                tempos.append((time.perf_counter() - start) * 1000)
+    return statistics.median(tempos), total
+
+
+def _medir_centroides(indice, codigos, raio_km) -> tuple[float, int]:
+    tempos, total = [], 0
+    for codigo in codigos:
+        start = time.perf_counter()
+        total += len(indice.dentro_do_raio(codigo, raio_km) or [])
+        tempos.append((time.perf_counter() - start) * 1000)
+    return statistics.median(tempos), total
+
+
+async def run(database_url: str, raios: list[float], amostras: int, seed: int):
+    engine = create_async_engine(database_url, echo=False)
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with Session() as db:
+        postgis = await LocalidadesService._postgis_available(db)
+        if not postgis:
+            print("PostGIS não disponível: só a estratégia por centróides é medida")
+        codigos = (await db.execute(
+            select(Municipio.codigo_ibge).where(Municipio.latitude.isnot(None))
+        )).scalars().all()
+        indice = await LocalidadesService.carregar_indice_raio(db)
+
+    if not codigos:
+        print("Nenhum município com centróide: rode POST /sincronizar antes")
+        await engine.dispose()
+        return
+
+    codigos = random.Random(seed).sample(list(codigos), min(amostras, len(codigos)))
+    print(f"{len(codigos)} municípios base, tolerância da simplificação {settings.localidades_simplificacao_m} m")
+    print(f"{'raio km':>8} {'antes':>10} {'gist':>10} {'simplificada':>13} {'centroides':>11}  resultados/base")
+
+    for raio_km in raios:
+        colunas = []
+        if postgis:
+            colunas.append(await _medir_sql(Session, _dwithin_completo, codigos, raio_km, sem_indice=True))
+            colunas.append(await _medir_sql(Session, _dwithin_completo, codigos, raio_km))
+            colunas.append(await _medir_sql(Session, _prefiltro_simplificada, codigos, raio_km))
+        else:
+            colunas.extend([(float("nan"), 0)] * 3)
+        colunas.append(_medir_centroides(indice, codigos, raio_km))
+        medias = "/".join(f"{total / len(codigos):.0f}" for _, total in colunas)
+        print(f"{raio_km:>8g} {colunas[0][0]:>10.2f} {colunas[1][0]:>10.2f} {colunas[2][0]:>13.2f} "
+              f"{colunas[3][0]:>11.3f}  {medias}")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--raios", nargs="+", type=float, default=[10, 50, 100, 300])
+    parser.add_argument("--amostras", type=int, default=50, help="Municípios base sorteados por raio")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.database_url, args.raios, args.amostras, args.seed))
+
+
+if __name__ == '__main__':
+    main()
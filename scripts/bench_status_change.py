@@ -0,0 +1,97 @@
+"""Benchmark of POST /cargas/{id}/status: statements, commits and time per status change.
+
+Seeds shipments + invoices in a scratch database and runs
+ShipmentStatusService.change_status for each invoice, counting the SQL
+statements and COMMITs issued (engine "before_cursor_execute"/"commit" events).
+The Brudam send goes through the tracking outbox, so no HTTP is involved.
+
+Usage:
+    python scripts/bench_status_change.py --changes 500
+    python scripts/bench_status_change.py --database-url postgresql+asyncpg://...
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (register tables)
+from app.db import Base
+from app.models.shipment import Shipment, ShipmentInvoice
+from app.schemas.shipment import ShipmentStatusRequest
+from app.services.shipment_status_service import ShipmentStatusService
+
+
+async def seed(Session, changes: int) -> list[int]:
+    async with Session() as db:
+        shipments = [Shipment(service_code="1", emission_status=1, rem_nDoc="12345678901234") for _ in range(changes)]
+        db.add_all(shipments)
+        await db.flush()
+        invoices = [
+            ShipmentInvoice(shipment_id=s.id, access_key=f"{s.id:044d}", remetente_ndoc="12345678901234")
+            for s in shipments
+        ]
+        db.add_all(invoices)
+        await db.commit()
+        return [inv.id for inv in invoices]
+
+
+async def run(database_url: str, changes: int):
+    engine = create_async_engine(database_url, echo=False)
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    invoice_ids = await seed(Session, changes)
+    counts = Counter()
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counts[statement.split()[0].upper()] += 1
+
+    def on_commit(conn):
+        counts["COMMIT"] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    event.listen(engine.sync_engine, "commit", on_commit)
+
+    service = ShipmentStatusService()
+    payload = ShipmentStatusRequest(code="25", recebedor={"nDoc": "98765432100", "xNome": "BENCH"})
+    start = time.perf_counter()
+    for invoice_id in invoice_ids:
+        async with Session() as db:
+            await service.change_status(db=db, invoice_id=invoice_id, payload=payload)
+    elapsed = time.perf_counter() - start
+
+    statements = sum(v for k, v in counts.items() if k != "COMMIT")
+    print(f"{changes} status changes in {elapsed:.3f}s ({changes / elapsed:.0f}/s)")
+    print(f"statements/change: {statements / changes:.2f}  commits/change: {counts['COMMIT'] / changes:.2f}")
+    print("  " + "  ".join(f"{k}={v / changes:.2f}" for k, v in sorted(counts.items()) if k != "COMMIT"))
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--changes", type=int, default=500)
+    parser.add_argument("--database-url", default=None, help="Default: scratch SQLite file")
+    args = parser.parse_args()
+
+    from loguru import logger
+    logger.remove()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_status.db')}"
+    asyncio.run(run(database_url, args.changes))
+
+
+if __name__ == '__main__':
+    main()
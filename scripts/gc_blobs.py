@@ -0,0 +1,33 @@
+"""Remove files in BLOB_DIR that no stored_blobs row references (BLOB_STORAGE=fs).
+
+Files are written before the transaction that references them commits; a process that
+dies in between leaves them behind. Safe to run at any time (e.g. from cron).
+
+Usage:
+    python scripts/gc_blobs.py --min-age 3600
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import AsyncSessionLocal
+from app.services.blob_service import BlobService
+
+
+async def run(min_age: float) -> int:
+    async with AsyncSessionLocal() as db:
+        return await BlobService().collect_garbage(db, min_age_seconds=min_age)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--min-age", type=float, default=3600, help="Only files older than this (seconds)")
+    args = parser.parse_args()
+    print(f"{asyncio.run(run(args.min_age))} unreferenced blob files removed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+
+from app.db import AsyncSessionLocal
+from app.models.attachment import AttachmentBlob
+from app.services.attachment_fetcher import RemoteAttachmentCache, RemoteAttachmentFetcher
+from app.services.attachments_service import AttachmentService
+
+
+def _fetcher(tmp_path, handler, **kwargs) -> RemoteAttachmentFetcher:
+    svc = AttachmentService(storage_dir=str(tmp_path), base_url="/attachments", store="cas")
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return RemoteAttachmentFetcher(svc, client=client, cache=RemoteAttachmentCache(), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_fetch_many_runs_in_parallel_under_limit(tmp_path):
+    in_flight = {"now": 0, "max": 0, "requests": 0}
+
+    async def handler(request):
+        in_flight["requests"] += 1
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.02)
+        in_flight["now"] -= 1
+        return httpx.Response(200, content=request.url.path.encode())
+
+    fetcher = _fetcher(tmp_path, handler, concurrency=3)
+    urls = [f"http://files.test/pod{i}.jpg" for i in range(6)]
+
+    results = await fetcher.fetch_many(urls + [urls[0]])
+
+    assert in_flight == {"now": 0, "max": 3, "requests": 6}
+    assert all(results[url]["filename"].endswith(".jpg") for url in urls)
+    assert (tmp_path / results[urls[2]]["filename"]).read_bytes() == b"/pod2.jpg"
+
+
+@pytest.mark.asyncio
+async def test_fetch_many_enforces_max_bytes(tmp_path):
+    async def handler(request):
+        if request.url.path == "/declared.jpg":
+            return httpx.Response(200, content=b"x" * 2000)
+        # Sem Content-Length: o limite é aplicado durante o streaming
+        async def chunks():
+            for _ in range(4):
+                yield b"x" * 500
+
+        return httpx.Response(200, content=chunks())
+
+    fetcher = _fetcher(tmp_path, handler, max_bytes=1000)
+
+    results = await fetcher.fetch_many(["http://files.test/declared.jpg", "http://files.test/chunked.jpg"])
+
+    assert results == {"http://files.test/declared.jpg": None, "http://files.test/chunked.jpg": None}
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_fetch_many_revalidates_cached_url_with_etag(tmp_path):
+    content = b"comprovante de entrega"
+    seen = []
+
+    async def handler(request):
+        seen.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=content, headers={"ETag": '"v1"'})
+
+    fetcher = _fetcher(tmp_path, handler)
+    url = "http://files.test/pod.pdf"
+
+    async with AsyncSessionLocal() as db:
+        first = await fetcher.fetch_many([url], db=db)
+        second = await fetcher.fetch_many([url], db=db)
+        await db.commit()
+        blob = await db.get(AttachmentBlob, hashlib.sha256(content).hexdigest())
+
+    assert seen == [None, '"v1"']
+    assert first[url]["filename"] == second[url]["filename"]
+    assert blob.filename == first[url]["filename"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_many_skips_invalid_url(tmp_path):
+    async def handler(request):
+        return httpx.Response(200, content=b"comprovante")
+
+    fetcher = _fetcher(tmp_path, handler)
+    valid, invalid = "http://files.test/pod.pdf", "https://[::1/x"
+
+    async with AsyncSessionLocal() as db:
+        results = await fetcher.fetch_many([invalid, valid], db=db)
+        await db.commit()
+
+    assert results[invalid] is None
+    assert (tmp_path / results[valid]["filename"]).read_bytes() == b"comprovante"
+
+
+@pytest.mark.asyncio
+async def test_fetch_many_discards_staged_files_when_storing_fails(tmp_path, monkeypatch):
+    async def handler(request):
+        return httpx.Response(200, content=request.url.path.encode())
+
+    fetcher = _fetcher(tmp_path, handler)
+    calls = []
+
+    async def failing_commit(staged, original_name=None, db=None):
+        calls.append(staged)
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(fetcher.attachment_svc, "commit_staged", failing_commit)
+
+    with pytest.raises(OSError):
+        await fetcher.fetch_many(["http://files.test/a.pdf", "http://files.test/b.pdf"])
+
+    assert len(calls) == 1
+    assert list(tmp_path.iterdir()) == []
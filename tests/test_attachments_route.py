@@ -0,0 +1,82 @@
+import hashlib
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.deps.security import is_front
+from app.api.routes import attachments as attachments_route
+from app.services.attachments_service import AttachmentService
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(attachments_route, "AttachmentService", lambda: AttachmentService(storage_dir=str(tmp_path)))
+    app = FastAPI()
+    app.include_router(attachments_route.router)
+    app.dependency_overrides[is_front] = lambda: True
+    with TestClient(app) as c:
+        yield c
+
+
+def test_serves_cas_file_with_strong_etag(client, tmp_path):
+    content = os.urandom(5000)
+    sha = hashlib.sha256(content).hexdigest()
+    (tmp_path / f"{sha}.pdf").write_bytes(content)
+
+    resp = client.get(f"/attachments/{sha}.pdf")
+
+    assert resp.status_code == 200
+    assert resp.content == content
+    assert resp.headers["etag"] == f'"{sha}"'
+    assert resp.headers["content-type"] == "application/pdf"
+    assert resp.headers["accept-ranges"] == "bytes"
+    assert "last-modified" in resp.headers
+    assert resp.headers["cache-control"] == "private, max-age=31536000, immutable"
+
+    again = client.get(f"/attachments/{sha}.pdf", headers={"If-None-Match": f'"{sha}"'})
+    assert again.status_code == 304 and again.content == b""
+
+    since = client.get(f"/attachments/{sha}.pdf", headers={"If-Modified-Since": resp.headers["last-modified"]})
+    assert since.status_code == 304
+
+
+def test_range_request_returns_partial_content(client, tmp_path):
+    content = bytes(range(256)) * 40
+    (tmp_path / "nota.bin").write_bytes(content)
+
+    resp = client.get("/attachments/nota.bin", headers={"Range": "bytes=100-199"})
+
+    assert resp.status_code == 206
+    assert resp.content == content[100:200]
+    assert resp.headers["content-range"] == f"bytes 100-199/{len(content)}"
+
+
+def test_missing_or_traversal_returns_404(client, tmp_path):
+    (tmp_path / ".abc.part").write_bytes(b"x")
+
+    assert client.get("/attachments/nao-existe.pdf").status_code == 404
+    assert client.get("/attachments/.abc.part").status_code == 404
+    assert client.get("/attachments/..%2Fconftest.py").status_code == 404
+
+
+def test_x_accel_redirect_delegates_to_proxy(client, tmp_path, monkeypatch):
+    (tmp_path / "a.jpg").write_bytes(b"jpeg")
+    monkeypatch.setattr(attachments_route, "ATTACHMENT_X_ACCEL_PREFIX", "/_protected_attachments/")
+
+    resp = client.get("/attachments/a.jpg")
+
+    assert resp.status_code == 200 and resp.content == b""
+    assert resp.headers["x-accel-redirect"] == "/_protected_attachments/a.jpg"
+    assert resp.headers["content-type"] == "image/jpeg"
+
+
+def test_requires_front_user(tmp_path, monkeypatch):
+    monkeypatch.setattr(attachments_route, "AttachmentService", lambda: AttachmentService(storage_dir=str(tmp_path)))
+    (tmp_path / "comprovante.jpg").write_bytes(b"jpg")
+    app = FastAPI()
+    app.include_router(attachments_route.router)
+
+    with TestClient(app) as c:
+        assert c.get("/attachments/comprovante.jpg").status_code == 401
@@ -0,0 +1,109 @@
+import base64
+import hashlib
+import json
+import os
+from io import BytesIO
+
+import httpx
+import pytest
+from fastapi import UploadFile
+
+from app.services.attachments_service import AttachmentService
+from app.services.tracking_service import TrackingService
+
+
+@pytest.mark.asyncio
+async def test_save_upload_streams_to_disk_and_hashes(tmp_path):
+    content = os.urandom(300_001)
+    svc = AttachmentService(storage_dir=str(tmp_path), base_url="/attachments")
+
+    saved = await svc.save_upload(UploadFile(filename="foto.jpg", file=BytesIO(content)), chunk_size=64 * 1024)
+
+    assert saved["sha256"] == hashlib.sha256(content).hexdigest()
+    assert saved["size"] == len(content)
+    assert saved["url"] == f"/attachments/{saved['filename']}" and saved["filename"].endswith(".jpg")
+    assert (tmp_path / saved["filename"]).read_bytes() == content
+    assert [p.name for p in tmp_path.iterdir()] == [saved["filename"]]
+
+
+def test_iter_base64_matches_full_encoding(tmp_path):
+    path = tmp_path / "a.bin"
+    content = os.urandom(10_000)
+    path.write_bytes(content)
+
+    chunks = list(AttachmentService.iter_base64(path, chunk_size=1000))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == base64.b64encode(content).decode()
+    assert AttachmentService.base64_length(path) == len("".join(chunks))
+
+
+@pytest.mark.asyncio
+async def test_enviar_documentos_streams_local_attachments(tmp_path):
+    content = os.urandom(50_000)
+    svc = AttachmentService(storage_dir=str(tmp_path), base_url="/attachments")
+    saved = svc.save_file(content, "comprovante.pdf")
+    captured = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        captured["body"] = await request.aread()
+        captured["length"] = request.headers["Content-Length"]
+        return httpx.Response(200, text="OK")
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    tracking = TrackingService(client=client, attachment_svc=svc)
+    tracking.endpoint = "http://brudam.test/tracking"
+    anexo = {**svc.anexo_ref(saved), "recebedor": {"nDoc": "1"}}
+    documento = tracking.montar_documento("3524CHAVE", "1", anexos=[anexo])
+
+    ok, status, text = await tracking.enviar_documentos([documento])
+
+    assert (ok, status, text) == (True, 200, "OK")
+    body = json.loads(captured["body"])
+    arquivo = body["documentos"][0]["anexos"][0]["arquivo"]
+    assert arquivo == {"nome": saved["url"], "dados": base64.b64encode(content).decode()}
+    assert body["documentos"][0]["anexos"][0]["recebedor"] == {"nDoc": "1"}
+    assert int(captured["length"]) == len(captured["body"])
+
+
+@pytest.mark.asyncio
+async def test_content_addressed_store_writes_identical_bytes_once(tmp_path):
+    from app.db import AsyncSessionLocal
+    from app.models.attachment import AttachmentBlob
+
+    content = os.urandom(20_000)
+    sha256 = hashlib.sha256(content).hexdigest()
+    svc = AttachmentService(storage_dir=str(tmp_path), base_url="/attachments", store="cas")
+
+    async with AsyncSessionLocal() as db:
+        first = await svc.save_upload(UploadFile(filename="POD.JPG", file=BytesIO(content)), db=db, chunk_size=4096)
+        second = await svc.save_upload(UploadFile(filename="outro.png", file=BytesIO(content)), db=db)
+        third = await svc.save_bytes(content, "x.jpg", db=db)
+        await db.commit()
+
+        assert first["filename"] == second["filename"] == third["filename"] == f"{sha256}.jpg"
+        assert [p.name for p in tmp_path.iterdir()] == [f"{sha256}.jpg"]
+        assert (await db.get(AttachmentBlob, sha256)).filename == f"{sha256}.jpg"
+        assert svc.get_base64_from_url(first["url"]) == base64.b64encode(content).decode()
+
+
+@pytest.mark.asyncio
+async def test_content_addressed_store_places_files_only_on_commit(tmp_path):
+    from app.db import AsyncSessionLocal
+    from app.models.attachment import AttachmentBlob
+
+    content = os.urandom(5_000)
+    svc = AttachmentService(storage_dir=str(tmp_path), base_url="/attachments", store="cas")
+
+    async with AsyncSessionLocal() as db:
+        saved = await svc.save_bytes(content, "pod.pdf", db=db)
+        await svc.save_upload(UploadFile(filename="pod.pdf", file=BytesIO(content)), db=db)
+        assert svc.resolve_path(saved["filename"]) is None
+        await db.rollback()
+
+        assert list(tmp_path.iterdir()) == []
+        assert await db.get(AttachmentBlob, saved["sha256"]) is None
+
+        saved = await svc.save_bytes(content, "pod.pdf", db=db)
+        await db.commit()
+    assert [p.name for p in tmp_path.iterdir()] == [saved["filename"]]
@@ -0,0 +1,152 @@
+import base64
+import gzip
+import hashlib
+import os
+from io import BytesIO
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import select
+
+from app.api.routes.prefat import get_prefat, get_prefat_by_id
+from app.db import AsyncSessionLocal
+from app.models.blob import StoredBlob
+from app.models.prefat import Prefat
+from app.models.shipment import Shipment, ShipmentInvoice
+from app.services.blob_service import BlobService, pack_parts, unpack_parts
+from app.services.shipment_xml_service import ShipmentXmlService
+
+
+def test_pack_parts_roundtrip():
+    parts = [b"<a/>", b"", os.urandom(1000)]
+    assert unpack_parts(pack_parts(parts)) == parts
+    assert unpack_parts(b"") == []
+
+
+@pytest.mark.asyncio
+async def test_put_compresses_in_db_tier():
+    data = b"<cteProc>" + b"x" * 50_000 + b"</cteProc>"
+    svc = BlobService(storage="db", encoding="gzip")
+    async with AsyncSessionLocal() as db:
+        blob = await svc.put(db, data)
+        await db.commit()
+
+        assert blob.sha256 == hashlib.sha256(data).hexdigest() and blob.size == len(data)
+        assert blob.stored_size < len(data) // 10 and blob.location is None
+        assert gzip.decompress(blob.data) == data
+        assert await svc.get(db, blob.id) == data
+
+
+@pytest.mark.asyncio
+async def test_put_fs_tier_writes_file(tmp_path):
+    data = os.urandom(4096)
+    svc = BlobService(storage="fs", blob_dir=str(tmp_path))
+    async with AsyncSessionLocal() as db:
+        blob = await svc.put(db, data)
+        await db.commit()
+
+        assert blob.data is None and (tmp_path / blob.location).is_file()
+        assert await svc.get(db, blob.id) == data
+
+        await svc.delete(db, blob.id)
+        await db.commit()
+        assert not (tmp_path / blob.location).exists()
+        assert await svc.get(db, blob.id) is None
+
+
+@pytest.mark.asyncio
+async def test_upload_xmls_stores_blob_reference_only():
+    xmls = [b"<cteProc><chCTe>12345678901234567890123456789012345678901234</chCTe></cteProc>", b"<outro/>"]
+    async with AsyncSessionLocal() as db:
+        shipment = Shipment(service_code="1", emission_status=1)
+        db.add(shipment)
+        await db.flush()
+        invoice = ShipmentInvoice(shipment_id=shipment.id)
+        db.add(invoice)
+        await db.commit()
+
+        upload_cte = Mock()
+        upload_cte.enviar = AsyncMock(return_value=(True, "ok"))
+        svc = ShipmentXmlService(upload_cte_svc=upload_cte)
+
+        files = [UploadFile(filename=f"{i}.xml", file=BytesIO(x)) for i, x in enumerate(xmls)]
+        result = await svc.upload_xmls(db=db, invoice_id=invoice.id, xml_files=files)
+        first_blob = invoice.xmls_blob_id
+
+        assert result.xmls_b64 == [base64.b64encode(x).decode() for x in xmls]
+        assert invoice.xmls_size == len(pack_parts(xmls))
+        assert await svc.blob_svc.invoice_xmls(db, invoice) == xmls
+
+        # Novo upload substitui o blob anterior
+        await svc.upload_xmls(db=db, invoice_id=invoice.id, xml_files=[UploadFile(filename="n.xml", file=BytesIO(b"<n/>"))])
+        assert invoice.xmls_blob_id != first_blob
+        assert await db.get(StoredBlob, first_blob) is None
+        assert await svc.blob_svc.invoice_xmls(db, invoice) == [b"<n/>"]
+
+
+@pytest.mark.asyncio
+async def test_prefat_routes_load_file_on_demand():
+    content = b"000PROCEDA" * 200
+    async with AsyncSessionLocal() as db:
+        prefat = Prefat()
+        await BlobService().set_prefat_file(db, prefat, content)
+        db.add(prefat)
+        await db.commit()
+
+        one = await get_prefat_by_id(prefat.id, db=db, current_user="u")
+        assert base64.b64decode(one["prefat_base64"]) == content
+        assert one["size"] == len(content) and one["sha256"] == hashlib.sha256(content).hexdigest()
+
+        listed = await get_prefat(incluir_arquivo=False, db=db, current_user="u")
+        assert all("prefat_base64" not in p for p in listed)
+        listed = await get_prefat(db=db, current_user="u")
+        assert base64.b64decode(next(p for p in listed if p["id"] == prefat.id)["prefat_base64"]) == content
+
+        row = (await db.execute(select(Prefat.__table__).where(Prefat.id == prefat.id))).mappings().one()
+        assert set(row) == {"id", "blob_id", "size", "sha256", "created_at"}
+
+
+@pytest.mark.asyncio
+async def test_fs_tier_files_follow_the_transaction(tmp_path):
+    svc = BlobService(storage="fs", blob_dir=str(tmp_path))
+    async with AsyncSessionLocal() as db:
+        kept = await svc.put(db, b"original")
+        await db.commit()
+        kept_id, kept_path = kept.id, tmp_path / kept.location
+
+        # Rollback: o arquivo novo não tem referência e some; o antigo continua
+        discarded_path = tmp_path / (await svc.put(db, b"descartado")).location
+        await svc.delete(db, kept_id)
+        assert discarded_path.is_file() and kept_path.is_file()
+        await db.rollback()
+        assert not discarded_path.exists()
+        assert kept_path.is_file()
+        assert await svc.get(db, kept_id) == b"original"
+
+        # Commit: só então o arquivo removido é apagado
+        await svc.delete(db, kept_id)
+        assert kept_path.is_file()
+        await db.commit()
+        assert not kept_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_collect_garbage_removes_only_unreferenced_old_files(tmp_path):
+    svc = BlobService(storage="fs", blob_dir=str(tmp_path))
+    async with AsyncSessionLocal() as db:
+        blob = await svc.put(db, b"referenciado")
+        await db.commit()
+    orphan = tmp_path / "orfao.gz"
+    orphan.write_bytes(b"x")
+    recent = tmp_path / "recente.gz"
+    recent.write_bytes(b"y")
+    old = os.path.getmtime(orphan) - 7200
+    for path in (orphan, tmp_path / blob.location):
+        os.utime(path, (old, old))
+
+    async with AsyncSessionLocal() as db:
+        assert await svc.collect_garbage(db, min_age_seconds=3600) == 1
+
+    assert not orphan.exists()
+    assert recent.is_file() and (tmp_path / blob.location).is_file()
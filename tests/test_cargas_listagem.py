@@ -0,0 +1,93 @@
+import pytest
+from fastapi import Response
+
+from app.api.routes.cargas import listar_cargas, estatisticas_cargas
+from app.db import AsyncSessionLocal
+from app.models.shipment import Shipment, ShipmentInvoice
+
+
+async def _seed(rem_nDoc: str, count: int) -> list[int]:
+    ids = []
+    async with AsyncSessionLocal() as db:
+        for i in range(count):
+            shipment = Shipment(service_code='1', emission_status=1, rem_nDoc=rem_nDoc,
+                                dest_uf='SP' if i % 2 == 0 else 'RJ', raw_payload='{}')
+            db.add(shipment)
+            await db.flush()
+            db.add(ShipmentInvoice(shipment_id=shipment.id, access_key=f"{rem_nDoc}{i:040d}"[-44:]))
+            ids.append(shipment.id)
+        await db.commit()
+    return ids
+
+
+@pytest.mark.asyncio
+async def test_listar_cargas_keyset_pagination():
+    ids = await _seed('LIST0001', 5)
+
+    async with AsyncSessionLocal() as db:
+        response = Response()
+        first = await listar_cargas(rem_nDoc='LIST0001', limit=2, response=response, current_user='u', db=db)
+        cursor = int(response.headers['X-Next-After-Id'])
+        second = await listar_cargas(rem_nDoc='LIST0001', limit=2, after_id=cursor, response=Response(), current_user='u', db=db)
+        last_response = Response()
+        last = await listar_cargas(rem_nDoc='LIST0001', limit=2, after_id=second[-1].id, response=last_response, current_user='u', db=db)
+
+    assert [s.id for s in first + second + last] == ids
+    assert cursor == ids[1]
+    assert 'X-Next-After-Id' not in last_response.headers
+    assert [inv.access_key for inv in first[0].invoices] == [f"LIST0001{0:040d}"[-44:]]
+
+
+@pytest.mark.asyncio
+async def test_listar_cargas_filters():
+    ids = await _seed('LIST0002', 4)
+
+    async with AsyncSessionLocal() as db:
+        rj = await listar_cargas(rem_nDoc='LIST0002', dest_uf='rj', response=Response(), current_user='u', db=db)
+        by_key = await listar_cargas(access_key=f"LIST0002{2:040d}"[-44:], response=Response(), current_user='u', db=db)
+        by_status = await listar_cargas(rem_nDoc='LIST0002', status_code='10', response=Response(), current_user='u', db=db)
+        other_status = await listar_cargas(rem_nDoc='LIST0002', status_code='1', response=Response(), current_user='u', db=db)
+
+    assert [s.id for s in rj] == [ids[1], ids[3]]
+    assert [s.id for s in by_key] == [ids[2]]
+    assert [s.id for s in by_status] == ids
+    assert other_status == []
+
+
+@pytest.mark.asyncio
+async def test_estatisticas_cargas_por_status():
+    async with AsyncSessionLocal() as db:
+        before = await estatisticas_cargas(current_user='u', db=db)
+
+    ids = await _seed('LIST0003', 3)
+    async with AsyncSessionLocal() as db:
+        shipment = await db.get(Shipment, ids[0])
+        shipment.status_code, shipment.status_type = '6', 'PENDENCIA'
+        await db.commit()
+
+    async with AsyncSessionLocal() as db:
+        after = await estatisticas_cargas(current_user='u', db=db)
+        pendencias = await estatisticas_cargas(status_type='PENDENCIA', current_user='u', db=db)
+
+    assert after.total == before.total + 3
+    assert after.por_categoria['Emissao'] == before.por_categoria.get('Emissao', 0) + 2
+    assert after.por_categoria['PENDENCIA'] == before.por_categoria.get('PENDENCIA', 0) + 1
+    assert set(pendencias.por_categoria) == {'PENDENCIA'}
+    endereco = next(item for item in pendencias.por_codigo if item.codigo == '6')
+    assert endereco.descricao == 'ENDERECO INCORRETO'
+
+
+def test_listar_cargas_cursor_header_exposed_to_cors():
+    from fastapi.testclient import TestClient
+
+    from app.api.deps.security import is_front
+    from app.main import app
+
+    app.dependency_overrides[is_front] = lambda: True
+    try:
+        resp = TestClient(app).get('/cargas/', params={'limit': 1}, headers={'Origin': 'http://localhost:5173'})
+    finally:
+        app.dependency_overrides.pop(is_front, None)
+
+    assert resp.status_code == 200
+    assert 'X-Next-After-Id' in resp.headers['access-control-expose-headers']
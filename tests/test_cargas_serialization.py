@@ -1,4 +1,5 @@
 import pytest
+from fastapi import Response
 from sqlalchemy import select
 from app.models.localidades import Estado, Municipio
 from app.models.shipment import Shipment
@@ -22,6 +23,7 @@ async def test_list_cargas_includes_normalized_locations():
             muni = Municipio(codigo_ibge=1100015, nome='Test City', estado_uuid=state.uuid)
             db.add(muni)
         await db.commit()
+        LocalidadesService.invalidar_cache_municipios()
 
         # Create a shipment and set locations
         shipment = Shipment(service_code='1', emission_status=1, rem_cMun='1100015', dest_cMun='1100015', c_orig_calc='1100015', c_dest_calc='1100015')
@@ -31,7 +33,7 @@ async def test_list_cargas_includes_normalized_locations():
         await LocalidadesService.set_shipment_locations(db, shipment)
         await db.commit()
 
-        res = await listar_cargas(current_user='integracao_logistica', db=db)
+        res = await listar_cargas(response=Response(), current_user='integracao_logistica', db=db)
         assert isinstance(res, list)
         assert len(res) >= 1
         s = res[0]
@@ -60,6 +62,7 @@ async def test_get_carga_includes_normalized_locations():
             muni = Municipio(codigo_ibge=1200015, nome='Other City', estado_uuid=state.uuid)
             db.add(muni)
         await db.commit()
+        LocalidadesService.invalidar_cache_municipios()
 
         shipment = Shipment(service_code='1', emission_status=1, rem_cMun='1200015', dest_cMun='1200015', c_orig_calc='1200015', c_dest_calc='1200015')
         db.add(shipment)
@@ -0,0 +1,87 @@
+"""Testes da fila de jobs do /emissao?async=1 contra o banco de testes (SQLite)."""
+
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.api.routes.emissao import receive_emission, get_emission_job
+from app.db import AsyncSessionLocal
+from app.core.config import settings
+from app.models.emissao_job import EmissaoJob, JOB_QUEUED, JOB_RUNNING
+from app.models.shipment import Shipment
+from app.schemas.notfis import NotfisPayload
+from app.services.emissao_job_service import EmissaoJobService
+
+
+def _payload(prefix: str, minutas: int) -> NotfisPayload:
+    actor = {
+        "nDoc": "12345678901234", "IE": "123456789", "cFiscal": 1,
+        "xNome": "Empresa Teste LTDA", "xFant": "Empresa Teste", "xLgr": "Rua Teste",
+        "nro": "123", "xBairro": "Centro", "cMun": "3550308", "CEP": "01310100", "cPais": 1058,
+    }
+    return NotfisPayload.model_validate({"documentos": [
+        {
+            "minuta": {
+                "toma": "0", "nDocEmit": f"{prefix}-{m}", "dEmi": "2026-01-23", "cServ": "1",
+                "cTab": "TAB01", "tpEmi": 1, "cStatus": 0, "cAut": "AUT123",
+                "carga": {"pBru": "100.5", "pCub": "50.0", "qVol": "10", "vTot": "5000.00"},
+                "cOrigCalc": "3550308", "cDestCalc": "3304557",
+            },
+            "rem": actor,
+            "dest": actor,
+            "documentos": [{
+                "serie": "1", "nDoc": "1", "dEmi": "2026-01-23", "vBC": "1000.00",
+                "vICMS": "180.00", "vBCST": "0.00", "vST": "0.00", "vProd": "1000.00",
+                "vNF": 1000.0, "nCFOP": "5102", "pBru": "10.5", "qVol": "2",
+                "chave": f"{prefix}{m:040d}", "tpDoc": "NFe", "xEsp": "CAIXA", "xNat": "VENDA",
+            }],
+        }
+        for m in range(minutas)
+    ]})
+
+
+@pytest.mark.asyncio
+async def test_async_emissao_queues_job_and_worker_completes_it():
+    payload = _payload("JOBA", 3)
+
+    async with AsyncSessionLocal() as db:
+        resp = await receive_emission(payload, modo=None, async_=True, idempotency_key=None, current_user="test_user", db=db)
+    assert resp.status_code == 202
+    queued = json.loads(resp.body)
+    assert queued["status"] == JOB_QUEUED
+    assert queued["total"] == 3
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock), \
+            patch.object(settings, 'emissao_job_chunk', 2):
+        service = EmissaoJobService()
+        assert await service.run_once() is True
+        assert await service.run_once() is False
+
+    async with AsyncSessionLocal() as db:
+        job = await get_emission_job(queued["job_id"], current_user="test_user", db=db)
+        assert job.status == "done"
+        assert job.processed == 3
+        assert job.result.status == 1
+        shipments = [await db.get(Shipment, r.id) for r in job.result.data]
+    assert [s.n_doc_emit for s in shipments] == ["JOBA-0", "JOBA-1", "JOBA-2"]
+
+
+@pytest.mark.asyncio
+async def test_claim_skips_running_jobs_and_hides_other_users():
+    async with AsyncSessionLocal() as db:
+        running = await EmissaoJobService.enqueue(db, _payload("JOBB", 1), "test_user")
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            (await db.get(EmissaoJob, running.id)).status = JOB_RUNNING
+            (await db.get(EmissaoJob, running.id)).started_at = None
+
+    async with AsyncSessionLocal() as db:
+        other = await EmissaoJobService.enqueue(db, _payload("JOBC", 1), "other_user")
+
+    service = EmissaoJobService()
+    assert await service.claim_next() == other.id
+    assert await service.claim_next() is None
+
+    async with AsyncSessionLocal() as db:
+        resp = await get_emission_job(other.id, current_user="test_user", db=db)
+    assert resp.status_code == 404
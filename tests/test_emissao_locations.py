@@ -23,6 +23,7 @@ async def test_emissao_sets_location_fields(monkeypatch):
             muni = Municipio(codigo_ibge=1100015, nome='Test City', estado_uuid=state.uuid)
             db.add(muni)
         await db.commit()
+        LocalidadesService.invalidar_cache_municipios()
 
         # Build a Shipment with rem_cMun and dest_cMun and origem/destino codes
         shipment = Shipment(service_code='1', emission_status=1, rem_cMun='1100015', dest_cMun='1100015', c_orig_calc='1100015', c_dest_calc='1100015')
@@ -0,0 +1,369 @@
+"""Testes dos modos bulk, concurrent e stream, da idempotência e do payload bruto do EmissaoService contra o banco de testes (SQLite)."""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import select
+
+from app.api.routes.emissao import receive_emission, receive_emission_stream
+from app.db import AsyncSessionLocal
+from app.core.config import settings
+from app.models.shipment import Shipment, ShipmentInvoice, ShipmentRawPayload
+from app.models.idempotency import EmissaoIdempotencyKey
+from app.services.emissao_service import EmissaoService, MODO_BULK, MODO_CONCURRENT
+from app.schemas.notfis import NotfisPayload, MinutaStructure
+from app.utils.raw_payload import decompress_raw_payload
+
+
+def _minuta(n_doc_emit: str, chaves: list[str], pbru: str = "100.5") -> dict:
+    actor = {
+        "nDoc": "12345678901234", "IE": "123456789", "cFiscal": 1,
+        "xNome": "Empresa Teste LTDA", "xFant": "Empresa Teste", "xLgr": "Rua Teste",
+        "nro": "123", "xBairro": "Centro", "cMun": "3550308", "CEP": "01310100", "cPais": 1058,
+    }
+    return {
+        "minuta": {
+            "toma": "0", "nDocEmit": n_doc_emit, "dEmi": "2026-01-23", "cServ": "1",
+            "cTab": "TAB01", "tpEmi": 1, "cStatus": 0, "cAut": "AUT123",
+            "carga": {"pBru": pbru, "pCub": "50.0", "qVol": "10", "vTot": "5000.00"},
+            "cOrigCalc": "3550308", "cDestCalc": "3304557",
+        },
+        "rem": actor,
+        "dest": actor,
+        "documentos": [
+            {
+                "serie": "1", "nDoc": str(i + 1), "dEmi": "2026-01-23", "vBC": "1000.00",
+                "vICMS": "180.00", "vBCST": "0.00", "vST": "0.00", "vProd": "1000.00",
+                "vNF": 1000.0, "nCFOP": "5102", "pBru": "10.5", "qVol": "2",
+                "chave": chave, "tpDoc": "NFe", "xEsp": "CAIXA", "xNat": "VENDA",
+            }
+            for i, chave in enumerate(chaves)
+        ],
+    }
+
+
+@pytest.mark.asyncio
+async def test_bulk_persists_shipments_and_invoices_in_order():
+    payload = NotfisPayload.model_validate({"documentos": [
+        _minuta("BULK-A", ["1" * 44, "2" * 44]),
+        _minuta("BULK-B", ["3" * 44]),
+    ]})
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock):
+        async with AsyncSessionLocal() as db:
+            result = await EmissaoService(db).process_payload(payload, "test_user", modo=MODO_BULK)
+
+    assert result.status == 1
+    assert [r.invoice_count for r in result.data] == [2, 1]
+    ids = [r.id for r in result.data]
+
+    async with AsyncSessionLocal() as db:
+        shipments = (await db.execute(select(Shipment).where(Shipment.id.in_(ids)))).scalars().all()
+        by_id = {s.id: s for s in shipments}
+        assert by_id[ids[0]].n_doc_emit == "BULK-A"
+        assert by_id[ids[1]].n_doc_emit == "BULK-B"
+        assert by_id[ids[0]].status["code"] == "10"
+
+        invoices = (await db.execute(select(ShipmentInvoice).where(ShipmentInvoice.shipment_id == ids[0]))).scalars().all()
+        assert sorted(i.access_key for i in invoices) == ["1" * 44, "2" * 44]
+        assert all(i.remetente_ndoc == "12345678901234" for i in invoices)
+
+
+@pytest.mark.asyncio
+async def test_bulk_reports_invalid_minuta_and_nota_individually():
+    payload = NotfisPayload.model_validate({"documentos": [
+        _minuta("BULK-C", ["4" * 44, "5" * 44]),
+        _minuta("BULK-D", ["6" * 44], pbru="abc"),
+    ]})
+    # Nota inválida após a validação do Pydantic (double-check do service)
+    payload.documentos[0].documentos[1].chave = "123"
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock):
+        async with AsyncSessionLocal() as db:
+            result = await EmissaoService(db).process_payload(payload, "test_user", modo=MODO_BULK)
+
+    assert result.get_http_status() == 207
+    assert result.data[0].status == 1
+    assert result.data[0].invoice_count == 1
+    assert result.data[0].invoice_failures == 1
+    assert result.data[1].status == 0
+    assert result.data[1].id is None
+
+
+@pytest.mark.asyncio
+async def test_bulk_falls_back_to_serial_when_batch_insert_fails():
+    payload = NotfisPayload.model_validate({"documentos": [_minuta("BULK-E", ["7" * 44])]})
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock):
+        with patch.object(EmissaoService, '_bulk_insert', new_callable=AsyncMock, side_effect=Exception("batch failed")):
+            async with AsyncSessionLocal() as db:
+                result = await EmissaoService(db).process_payload(payload, "test_user", modo=MODO_BULK)
+
+    assert result.status == 1
+    assert result.data[0].id is not None
+    assert result.data[0].invoice_count == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_fallback_reuses_raw_payload_and_audit():
+    payload = NotfisPayload.model_validate({"documentos": [_minuta("BULK-F", ["4703" * 11])]})
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock), \
+            patch.object(settings, 'emissao_raw_payload', 'gzip'), \
+            patch.object(EmissaoService, '_bulk_insert', new_callable=AsyncMock, side_effect=Exception("batch failed")), \
+            patch.object(EmissaoService, '_audit_log', wraps=EmissaoService._audit_log) as audit_log, \
+            patch.object(EmissaoService, '_raw_payload_blob', wraps=EmissaoService._raw_payload_blob) as raw_blob:
+        async with AsyncSessionLocal() as db:
+            result = await EmissaoService(db).process_payload(payload, "test_user", modo=MODO_BULK)
+
+    assert result.data[0].status == 1
+    assert audit_log.call_count == 1
+    assert raw_blob.call_count == 1
+    async with AsyncSessionLocal() as db:
+        blob = await db.get(ShipmentRawPayload, result.data[0].id)
+    assert json.loads(decompress_raw_payload(blob.data, blob.encoding))["minuta"]["nDocEmit"] == "BULK-F"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_keeps_input_order_with_one_session_per_worker():
+    payload = NotfisPayload.model_validate({"documentos": [
+        _minuta(f"CONC-{i}", [f"{i:044d}"]) for i in range(5)
+    ]})
+    payload.documentos[3].documentos[0].chave = "123"
+
+    opened = []
+
+    def factory():
+        session = AsyncSessionLocal()
+        opened.append(session)
+        return session
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock):
+        with patch('app.services.emissao_service.settings.emissao_concorrencia', 2):
+            async with AsyncSessionLocal() as db:
+                result = await EmissaoService(db, session_factory=factory).process_payload(payload, "test_user", modo=MODO_CONCURRENT)
+
+    assert len(opened) == 2
+    assert [r.status for r in result.data] == [1, 1, 1, 1, 1]
+    assert result.data[3].invoice_failures == 1
+
+    async with AsyncSessionLocal() as db:
+        for i, r in enumerate(result.data):
+            shipment = await db.get(Shipment, r.id)
+            assert shipment.n_doc_emit == f"CONC-{i}"
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.mark.asyncio
+async def test_stream_processes_each_line_in_order():
+    lines = [
+        json.dumps(_minuta("STREAM-A", ["8" * 44])),
+        "",
+        json.dumps({"minuta": {}}),
+        json.dumps(_minuta("STREAM-B", ["9" * 44])),
+    ]
+    body = "\n".join(lines).encode()
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock):
+        async with AsyncSessionLocal() as db:
+            service = EmissaoService(db)
+            # Blocos pequenos: linhas chegam partidas entre vários chunks
+            results = [r async for r in service.process_stream(_chunks(body, 97), "test_user")]
+
+    assert [r.status for r in results] == [1, 0, 1]
+    assert results[1].message.startswith("Erro de validação")
+
+    async with AsyncSessionLocal() as db:
+        assert (await db.get(Shipment, results[0].id)).n_doc_emit == "STREAM-A"
+        assert (await db.get(Shipment, results[2].id)).n_doc_emit == "STREAM-B"
+
+
+@pytest.mark.asyncio
+async def test_stream_endpoint_returns_ndjson():
+    body = (json.dumps(_minuta("STREAM-C", ["6" * 43 + "0"])) + "\n").encode()
+    request = MagicMock()
+    request.stream = lambda: _chunks(body, 64)
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock), \
+            patch('app.api.routes.emissao.ensure_db_initialized', new_callable=AsyncMock):
+        resp = await receive_emission_stream(request, current_user="test_user")
+        assert resp.media_type == "application/x-ndjson"
+        lines = [chunk async for chunk in resp.body_iterator]
+
+    results = [json.loads(line) for line in lines]
+    assert len(results) == 1
+    assert results[0]["status"] == 1
+    assert isinstance(results[0]["id"], int)
+
+
+@pytest.mark.asyncio
+async def test_replayed_minuta_returns_original_shipment():
+    chaves = ["41" * 22, "42" * 22]
+    payload = NotfisPayload.model_validate({"documentos": [_minuta("IDEM-A", chaves)]})
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock):
+        async with AsyncSessionLocal() as db:
+            first = await EmissaoService(db).process_payload(payload, "test_user")
+        async with AsyncSessionLocal() as db:
+            service = EmissaoService(db)
+            with patch.object(service, '_bulk_insert', new_callable=AsyncMock) as bulk_insert:
+                replay = await service.process_payload(payload, "test_user", modo=MODO_BULK)
+
+    bulk_insert.assert_not_called()
+    assert replay.data[0].status == 1
+    assert replay.data[0].id == first.data[0].id
+    assert replay.data[0].invoice_count == 2
+
+    async with AsyncSessionLocal() as db:
+        invoices = (await db.execute(select(ShipmentInvoice).where(ShipmentInvoice.access_key.in_(chaves)))).scalars().all()
+        assert len(invoices) == 2
+
+
+@pytest.mark.asyncio
+async def test_new_minuta_rejects_already_imported_nota():
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock):
+        async with AsyncSessionLocal() as db:
+            first = await EmissaoService(db).process_payload(
+                NotfisPayload.model_validate({"documentos": [_minuta("IDEM-B", ["43" * 22])]}), "test_user")
+        async with AsyncSessionLocal() as db:
+            second = await EmissaoService(db).process_payload(
+                NotfisPayload.model_validate({"documentos": [_minuta("IDEM-C", ["43" * 22, "46" * 22])]}), "test_user")
+
+    assert second.data[0].status == 1
+    assert second.data[0].id != first.data[0].id
+    assert second.data[0].invoice_count == 1
+    assert second.data[0].invoice_failures == 1
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_returns_stored_response():
+    payload = NotfisPayload.model_validate({"documentos": [_minuta("IDEM-D", ["45" * 22])]})
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock):
+        async with AsyncSessionLocal() as db:
+            first = await receive_emission(payload, modo=None, async_=False, idempotency_key="retry-1", current_user="test_user", db=db)
+        async with AsyncSessionLocal() as db:
+            with patch.object(EmissaoService, 'process_payload', new_callable=AsyncMock) as process_payload:
+                second = await receive_emission(payload, modo=None, async_=False, idempotency_key="retry-1", current_user="test_user", db=db)
+
+    process_payload.assert_not_called()
+    assert second.status_code == first.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert json.loads(second.body) == json.loads(first.body)
+
+    async with AsyncSessionLocal() as db:
+        stored = (await db.execute(select(EmissaoIdempotencyKey))).scalars().all()
+        assert [(k.api_user, k.idempotency_key) for k in stored] == [("test_user", "retry-1")]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("modo", ["serial", MODO_BULK])
+async def test_gzip_raw_payload_goes_to_side_table(modo):
+    payload = NotfisPayload.model_validate({"documentos": [_minuta(f"RAW-GZ-{modo}", [("4701" if modo == MODO_BULK else "4702") * 11])]})
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock), \
+            patch.object(settings, 'emissao_raw_payload', 'gzip'):
+        async with AsyncSessionLocal() as db:
+            result = await EmissaoService(db).process_payload(payload, "test_user", modo=modo)
+
+    shipment_id = result.data[0].id
+    async with AsyncSessionLocal() as db:
+        assert (await db.get(Shipment, shipment_id)).raw_payload is None
+        blob = await db.get(ShipmentRawPayload, shipment_id)
+    assert blob.encoding == "gzip"
+    assert json.loads(decompress_raw_payload(blob.data, blob.encoding))["minuta"]["nDocEmit"] == f"RAW-GZ-{modo}"
+
+
+@pytest.mark.asyncio
+async def test_stream_stores_original_line_bytes():
+    line = json.dumps(_minuta("RAW-STREAM", ["48" * 22]), separators=(",", ":"))
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock), \
+            patch.object(MinutaStructure, 'model_dump_json', side_effect=AssertionError("no re-serialization expected")):
+        async with AsyncSessionLocal() as db:
+            results = [r async for r in EmissaoService(db).process_stream(_chunks(line.encode(), 64), "test_user")]
+
+    async with AsyncSessionLocal() as db:
+        assert (await db.get(Shipment, results[0].id)).raw_payload == line
+
+
+@pytest.mark.asyncio
+async def test_raw_payload_off_skips_serialization():
+    payload = NotfisPayload.model_validate({"documentos": [_minuta("RAW-OFF", ["49" * 22])]})
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock), \
+            patch.object(settings, 'emissao_raw_payload', 'off'), \
+            patch.object(settings, 'emissao_audit_log', 'summary'), \
+            patch.object(MinutaStructure, 'model_dump_json', side_effect=AssertionError("no serialization expected")):
+        async with AsyncSessionLocal() as db:
+            result = await EmissaoService(db).process_payload(payload, "test_user")
+
+    assert result.data[0].status == 1
+    async with AsyncSessionLocal() as db:
+        assert (await db.get(Shipment, result.data[0].id)).raw_payload is None
+        assert await db.get(ShipmentRawPayload, result.data[0].id) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_with_same_idempotency_key_process_once():
+    payload = NotfisPayload.model_validate({"documentos": [_minuta("IDEM-C", ["46" * 22])]})
+    started, release = asyncio.Event(), asyncio.Event()
+    original = EmissaoService.process_payload
+
+    async def slow_process(self, *args, **kwargs):
+        started.set()
+        await release.wait()
+        return await original(self, *args, **kwargs)
+
+    async def call():
+        async with AsyncSessionLocal() as db:
+            return await receive_emission(payload, modo=None, async_=False, idempotency_key="race-1", current_user="test_user", db=db)
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock), \
+            patch.object(EmissaoService, 'process_payload', slow_process):
+        first = asyncio.create_task(call())
+        await started.wait()
+        second = await call()
+        release.set()
+        first = await first
+        replay = await call()
+
+    assert second.status_code == 409
+    assert first.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert json.loads(replay.body) == json.loads(first.body)
+
+
+@pytest.mark.asyncio
+async def test_failed_request_releases_idempotency_key():
+    payload = NotfisPayload.model_validate({"documentos": [_minuta("IDEM-F", ["47" * 22])]})
+
+    with patch('app.services.emissao_service.LocalidadesService.set_shipment_locations', new_callable=AsyncMock):
+        async with AsyncSessionLocal() as db:
+            with patch.object(EmissaoService, 'process_payload', AsyncMock(side_effect=RuntimeError("boom"))):
+                failed = await receive_emission(payload, modo=None, async_=False, idempotency_key="retry-f", current_user="test_user", db=db)
+        async with AsyncSessionLocal() as db:
+            retried = await receive_emission(payload, modo=None, async_=False, idempotency_key="retry-f", current_user="test_user", db=db)
+
+    assert failed.status_code == 500
+    assert retried.status_code == 200 and "Idempotent-Replayed" not in retried.headers
+
+
+@pytest.mark.asyncio
+async def test_stale_idempotency_reservation_is_taken_over():
+    import datetime
+
+    old = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=settings.emissao_idempotency_stale_seconds + 60)
+    async with AsyncSessionLocal() as db:
+        db.add(EmissaoIdempotencyKey(api_user="test_user", idempotency_key="stale-1", reserved_at=old))
+        await db.commit()
+
+    async with AsyncSessionLocal() as db:
+        assert await EmissaoService(db).reserve_idempotency_key("stale-1", "test_user") is None
+        pending = await EmissaoService(db).reserve_idempotency_key("stale-1", "test_user")
+        assert pending is not None and pending.status_code is None
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.http_clients import HttpClientRegistry, BRUDAM, http_clients
+from app.services.tracking_service import TrackingService
+from app.services.upload_cte_service import UploadCteService
+
+
+async def _keepalive_server():
+    async def handle(reader, writer):
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            if not head:
+                break
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nOK")
+            await writer.drain()
+        writer.close()
+
+    async def safe_handle(reader, writer):
+        try:
+            await handle(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    return await asyncio.start_server(safe_handle, "127.0.0.1", 0)
+
+
+@pytest.mark.asyncio
+async def test_registry_reuses_connections(monkeypatch):
+    monkeypatch.setattr(settings, "http_http2", False)
+    server = await _keepalive_server()
+    port = server.sockets[0].getsockname()[1]
+    registry = HttpClientRegistry()
+    try:
+        client = registry.get(BRUDAM)
+        for _ in range(3):
+            resp = await client.get(f"http://127.0.0.1:{port}/tracking")
+            assert resp.text == "OK"
+        assert registry.get(BRUDAM) is client
+        assert registry.stats()[BRUDAM] == {"requests": 3, "new_connections": 1, "reuse_ratio": pytest.approx(2 / 3)}
+    finally:
+        await registry.aclose()
+        server.close()
+        await server.wait_closed()
+
+    assert client.is_closed
+    assert registry.get(BRUDAM) is not client
+
+
+@pytest.mark.asyncio
+async def test_brudam_services_share_client():
+    tracking_client = await TrackingService()._get_client()
+    upload_client = await UploadCteService()._get_client()
+    assert tracking_client is upload_client is http_clients.get(BRUDAM)
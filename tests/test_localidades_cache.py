@@ -0,0 +1,81 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.models.shipment import Shipment
+from app.services.localidades_service import LocalidadesService
+
+
+@pytest.fixture
+def municipios_cache():
+    LocalidadesService._municipios_cache = {3550308: ("São Paulo", 35, "SP"), 3304557: ("Rio de Janeiro", 33, "RJ")}
+    yield
+    LocalidadesService.invalidar_cache_municipios()
+
+
+@pytest.mark.asyncio
+async def test_set_shipment_locations_uses_cache_without_db(municipios_cache):
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=AssertionError("no DB calls expected on the hot path"))
+
+    shipment = Shipment(service_code='1', emission_status=1, rem_cMun='3550308', dest_cMun='3304557',
+                        recebedor_cMun='3550308', c_orig_calc='3550308', c_dest_calc='3304557')
+    await LocalidadesService.set_shipment_locations(db, shipment)
+
+    db.execute.assert_not_called()
+    assert shipment.rem_municipio_nome == 'São Paulo'
+    assert shipment.rem_uf == 'SP'
+    assert shipment.dest_estado_codigo_ibge == 33
+    assert shipment.destino_municipio_codigo_ibge == 3304557
+    assert shipment.origem == {"uf": "SP", "municipio": "São Paulo"}
+
+
+@pytest.mark.asyncio
+async def test_cache_miss_falls_back_to_uf_from_code(municipios_cache):
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=AssertionError("no DB calls expected on the hot path"))
+
+    shipment = Shipment(service_code='1', emission_status=1, rem_cMun='3106200')
+    await LocalidadesService.set_shipment_locations(db, shipment)
+
+    assert shipment.rem_uf == 'MG'
+    assert shipment.rem_municipio_codigo_ibge == 3106200
+    assert shipment.rem_municipio_nome is None
+
+
+@pytest.mark.asyncio
+async def test_cache_is_loaded_once_after_invalidation():
+    LocalidadesService.invalidar_cache_municipios()
+    load = AsyncMock(side_effect=lambda db: setattr(LocalidadesService, '_municipios_cache', {3550308: ("São Paulo", 35, "SP")}))
+    original = LocalidadesService._load_municipios_cache
+    LocalidadesService._load_municipios_cache = load
+    try:
+        for _ in range(3):
+            info = await LocalidadesService._find_municipio_info_by_codigo(None, 3550308)
+        assert info == (3550308, "São Paulo", 35, "SP")
+        assert load.await_count == 1
+    finally:
+        LocalidadesService._load_municipios_cache = original
+        LocalidadesService.invalidar_cache_municipios()
+
+
+@pytest.mark.asyncio
+async def test_failed_cache_load_is_retried_after_backoff(monkeypatch):
+    LocalidadesService.invalidar_cache_municipios()
+    db = MagicMock()
+    db.begin_nested = MagicMock(side_effect=RuntimeError("banco indisponível"))
+    now = {"t": 1000.0}
+    monkeypatch.setattr("app.services.localidades_service.time.monotonic", lambda: now["t"])
+    try:
+        assert await LocalidadesService._find_municipio_info_by_codigo(db, 3550308) == (None, None, None, None)
+        assert LocalidadesService._municipios_cache is None
+
+        # Dentro da espera: nenhuma nova tentativa
+        await LocalidadesService._find_municipio_info_by_codigo(db, 3550308)
+        assert db.begin_nested.call_count == 1
+
+        now["t"] += LocalidadesService._MUNICIPIOS_CACHE_RETRY_SECONDS
+        load = AsyncMock(side_effect=lambda db: setattr(LocalidadesService, '_municipios_cache', {3550308: ("São Paulo", 35, "SP")}))
+        monkeypatch.setattr(LocalidadesService, '_load_municipios_cache', load)
+        assert await LocalidadesService._find_municipio_info_by_codigo(db, 3550308) == (3550308, "São Paulo", 35, "SP")
+    finally:
+        LocalidadesService.invalidar_cache_municipios()
@@ -7,13 +7,13 @@ from app.services.localidades_service import LocalidadesService
 
 @pytest.mark.asyncio
 async def test_municipios_por_raio_returns_501_when_postgis_not_available(monkeypatch):
-    async def fake_get_municipios_por_raio(db, codigo_ibge, raio):
+    async def fake_get_municipios_por_raio(db, codigo_ibge, raio, refinar=None):
         raise LocalidadesService.PostGisUnavailableError("PostGIS not available for test")
 
     monkeypatch.setattr(LocalidadesService, "get_municipios_por_raio", fake_get_municipios_por_raio)
 
     with pytest.raises(HTTPException) as excinfo:
-        await municipios_por_raio(123, 10.0, db=None)
+        await municipios_por_raio(123, 10.0, refinar=True, db=None)
 
     assert excinfo.value.status_code == 501
     assert "PostGIS" in excinfo.value.detail
@@ -21,10 +21,10 @@ async def test_municipios_por_raio_returns_501_when_postgis_not_available(monkey
 
 @pytest.mark.asyncio
 async def test_municipios_por_raio_returns_results_when_postgis_available(monkeypatch):
-    async def fake_get_municipios_por_raio(db, codigo_ibge, raio):
+    async def fake_get_municipios_por_raio(db, codigo_ibge, raio, refinar=None):
         return []
 
     monkeypatch.setattr(LocalidadesService, "get_municipios_por_raio", fake_get_municipios_por_raio)
 
-    res = await municipios_por_raio(123, 10.0, db=None)
+    res = await municipios_por_raio(123, 10.0, refinar=True, db=None)
     assert res == []
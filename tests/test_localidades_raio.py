@@ -0,0 +1,137 @@
+import time
+import uuid
+
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import box
+
+from app.db import AsyncSessionLocal
+from app.models.localidades import Estado, Municipio
+from app.services import localidades_service
+from app.services.localidades_raio import CentroidIndex
+from app.services.localidades_service import LocalidadesService
+from tests.test_localidades_sync import _criar_tabelas_localidades
+
+# (codigo_ibge, nome, latitude, longitude) aproximados dos centros urbanos
+CIDADES = [
+    (3550308, "São Paulo", -23.55, -46.63),
+    (3509502, "Campinas", -22.91, -47.06),
+    (3548708, "Santos", -23.96, -46.33),
+    (3304557, "Rio de Janeiro", -22.91, -43.17),
+]
+
+
+def _row(codigo, nome, lat, lon, envolvente=0.0):
+    return {"codigo_ibge": codigo, "nome": nome, "latitude": lat, "longitude": lon, "raio_envolvente_km": envolvente}
+
+
+@pytest.fixture(autouse=True)
+def _reset_indice():
+    LocalidadesService.invalidar_indice_raio()
+    yield
+    LocalidadesService.invalidar_indice_raio()
+
+
+def test_centroid_index_haversine_and_candidates():
+    indice = CentroidIndex(_row(*c) for c in CIDADES)
+
+    distancias = dict(zip((r["codigo_ibge"] for r in indice.rows), indice.distancias_km(3550308)))
+    assert distancias[3550308] == 0
+    assert 80 < distancias[3509502] < 90
+    assert 355 < distancias[3304557] < 365
+
+    assert [r["nome"] for r in indice.dentro_do_raio(3550308, 100)] == ["Campinas", "Santos", "São Paulo"]
+    assert indice.dentro_do_raio(9999999, 100) is None
+
+    # Polígonos grandes: o raio envolvente aproxima candidatos que o centróide deixaria de fora
+    grande = CentroidIndex([_row(3550308, "São Paulo", -23.55, -46.63, 20), _row(3304557, "Rio de Janeiro", -22.91, -43.17, 330)])
+    assert grande.candidatos(3550308, 10) == [3304557, 3550308]
+
+
+def test_centroid_index_radius_query_is_sub_millisecond():
+    rng = np.random.default_rng(42)
+    lats, lons = rng.uniform(-33, 5, 5570), rng.uniform(-73, -35, 5570)
+    indice = CentroidIndex(_row(i, f"M{i:04d}", lat, lon) for i, (lat, lon) in enumerate(zip(lats, lons)))
+
+    runs = 200
+    start = time.perf_counter()
+    for i in range(runs):
+        indice.dentro_do_raio(i, 150)
+    per_query_ms = (time.perf_counter() - start) / runs * 1000
+    print(f"\n[bench] raio em 5570 centróides: {per_query_ms:.3f} ms/consulta")
+    assert per_query_ms < 5
+
+
+async def _popular():
+    await _criar_tabelas_localidades()
+    estado_sp, estado_rj = uuid.uuid4(), uuid.uuid4()
+    async with AsyncSessionLocal() as db:
+        db.add_all([
+            Estado(uuid=estado_sp, codigo_ibge=35, sigla="SP", nome="São Paulo"),
+            Estado(uuid=estado_rj, codigo_ibge=33, sigla="RJ", nome="Rio de Janeiro"),
+        ])
+        # Core insert: o SQLite dos testes não tem a coluna geometria
+        await db.execute(Municipio.__table__.insert(), [
+            {"uuid": uuid.uuid4(), "codigo_ibge": codigo, "nome": nome, "estado_uuid": estado_rj if codigo == 3304557 else estado_sp}
+            for codigo, nome, _, _ in CIDADES
+        ])
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_shapefile_import_stores_centroids_and_radius_works_without_postgis(tmp_path, monkeypatch):
+    await _popular()
+    # Quadrados de ~0,2° em volta de cada cidade, no formato do shapefile do IBGE
+    shape = gpd.GeoDataFrame(
+        {"CD_MUN": [str(c[0]) for c in CIDADES], "NM_MUN": [c[1] for c in CIDADES]},
+        geometry=[box(lon - 0.1, lat - 0.1, lon + 0.1, lat + 0.1) for _, _, lat, lon in CIDADES],
+        crs="EPSG:4674",
+    )
+    shape.to_file(tmp_path / "municipios.geojson")
+    monkeypatch.setattr(localidades_service, "SHAPEFILE_MUNICIPIOS_PATH", str(tmp_path / "municipios.geojson"))
+
+    async with AsyncSessionLocal() as db:
+        assert await LocalidadesService.importar_shapefile(db)
+        assert await LocalidadesService.atualizar_geometria(db) == {"postgis": False, "updated": 0, "centroides": 4}
+
+    async with AsyncSessionLocal() as db:
+        campinas = await LocalidadesService.get_municipio_por_codigo(db, 3509502)
+        assert campinas.latitude == pytest.approx(-22.91, abs=1e-3)
+        assert campinas.longitude == pytest.approx(-47.06, abs=1e-3)
+        # Meia diagonal do quadrado de 0,2°: ~15 km
+        assert 13 < campinas.raio_envolvente_km < 17
+
+        result = await LocalidadesService.get_municipios_por_raio(db, 3550308, 100)
+        assert [m["nome"] for m in result] == ["Campinas", "Santos", "São Paulo"]
+        assert result[0]["estado"]["sigla"] == "SP"
+
+        assert await LocalidadesService.get_municipios_por_raio(db, 9999999, 100) is None
+        with pytest.raises(LocalidadesService.PostGisUnavailableError):
+            await LocalidadesService.get_municipios_por_raio(db, 3550308, 100, refinar=True)
+
+
+@pytest.mark.asyncio
+async def test_radius_without_centroid_requires_postgis():
+    await _popular()
+    async with AsyncSessionLocal() as db:
+        with pytest.raises(LocalidadesService.PostGisUnavailableError, match="centroid"):
+            await LocalidadesService.get_municipios_por_raio(db, 3550308, 100)
+
+
+def test_postgis_radius_filter_prefilters_on_simplified_bbox():
+    from sqlalchemy import select
+    from sqlalchemy.dialects import postgresql
+
+    sql = str(
+        select(Municipio.codigo_ibge)
+        .where(*LocalidadesService._filtro_raio_postgis(3550308, 50))
+        .compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    )
+
+    prefiltro, exato = sql.split(" AND ST_DWithin")
+    # bbox da simplificada expandida por raio + 2x a tolerância (100 m)
+    assert "municipios.geometria_simplificada && ST_Expand((SELECT municipios_1.geometria_simplificada" in prefiltro
+    assert "50200" in prefiltro
+    # Geometria da base vem de um alias (subconsulta não correlacionada)
+    assert "(municipios.geometria, (SELECT municipios_1.geometria \nFROM municipios AS municipios_1" in exato
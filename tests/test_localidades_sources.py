@@ -0,0 +1,70 @@
+from pathlib import Path
+
+import httpx
+import pytest
+
+from app.services.localidades_sources import CachedSnapshotSource, IbgeApiSource, LocalidadesSource, SnapshotFileSource
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.mark.asyncio
+async def test_json_and_csv_snapshots_normalize_to_same_version():
+    from_json = await SnapshotFileSource(FIXTURES / "localidades.json").carregar()
+    from_csv = await SnapshotFileSource(FIXTURES / "localidades.csv").carregar()
+
+    assert from_json.estados == [{"id": 33, "sigla": "RJ", "nome": "Rio de Janeiro"}, {"id": 35, "sigla": "SP", "nome": "São Paulo"}]
+    assert {"id": 3509502, "nome": "Campinas", "uf_id": 35} in from_json.municipios
+    assert from_json == from_csv
+
+
+@pytest.mark.asyncio
+async def test_cached_snapshot_revalidates_with_etag_and_works_offline(tmp_path):
+    content = (FIXTURES / "localidades.json").read_bytes()
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=content, headers={"etag": '"v1"'})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    source = CachedSnapshotSource("https://snapshots.local/localidades.json", str(tmp_path), client=client)
+
+    first = await source.carregar()
+    second = await source.carregar()
+
+    assert first == second and len(first.municipios) == 3
+    assert [r.headers.get("if-none-match") for r in requests] == [None, '"v1"']
+    assert (tmp_path / "localidades.json").read_bytes() == content
+
+    def offline(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("sem rede", request=request)
+
+    source._client = httpx.AsyncClient(transport=httpx.MockTransport(offline))
+    assert (await source.carregar()).versao == first.versao
+
+    empty = CachedSnapshotSource("https://snapshots.local/localidades.json", str(tmp_path / "vazio"), client=source._client)
+    with pytest.raises(httpx.ConnectError):
+        await empty.carregar()
+
+
+@pytest.mark.asyncio
+async def test_ibge_source_raises_on_http_error():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/estados"):
+            return httpx.Response(200, json=[{"id": 35, "sigla": "SP", "nome": "São Paulo"}])
+        return httpx.Response(503, json={"message": "Serviço indisponível"})
+
+    source = IbgeApiSource(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    with pytest.raises(httpx.HTTPStatusError):
+        await source.carregar()
+
+
+def test_localidades_source_requires_carregar():
+    class SemCarregar(LocalidadesSource):
+        pass
+
+    with pytest.raises(TypeError):
+        SemCarregar()
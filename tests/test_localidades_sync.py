@@ -1,107 +1,116 @@
 import pytest
-import asyncio
+from geoalchemy2 import Geometry
+from sqlalchemy import MetaData, Table, event, select
 
+from app.db import AsyncSessionLocal, engine
+from app.models.localidades import Estado, Municipio
 from app.services.localidades_service import LocalidadesService
-from app.db import AsyncSessionLocal
 
 
-@pytest.mark.asyncio
-async def test_sincronizar_com_ibge_works_without_postgis(monkeypatch):
-    # Fake IBGE responses
+async def _criar_tabelas_localidades():
+    # Sem as colunas de geometria: o SQLite dos testes não tem SpatiaLite
+    metadata = MetaData()
+    for table in (Estado.__table__, Municipio.__table__):
+        Table(table.name, metadata, *(c._copy() for c in table.columns if not isinstance(c.type, Geometry)))
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.drop_all)
+        await conn.run_sync(metadata.create_all)
+
+
+def _fake_ibge(monkeypatch, estados, municipios):
     async def fake_get(self, url):
         class Dummy:
             def __init__(self, payload):
                 self._payload = payload
             def json(self):
                 return self._payload
+            def raise_for_status(self):
+                return None
         if 'estados' in url:
-            return Dummy([{"id": 11, "sigla": "MG", "nome": "Minas Gerais"}])
+            return Dummy(estados)
         if 'municipios' in url:
-            return Dummy([
-                {
-                    "id": 1100015,
-                    "nome": "Testemunha",
-                    "microrregiao": {"mesorregiao": {"UF": {"id": 11}}}
-                }
-            ])
+            return Dummy(municipios)
         return Dummy([])
 
     monkeypatch.setattr('httpx.AsyncClient.get', fake_get, raising=False)
-
     # Skip shapefile import to avoid PostGIS requirements
     monkeypatch.setattr(LocalidadesService, '_importar_municipios_do_shapefile_sync', lambda *_: False)
 
+
+def _muni(codigo, nome, uf=31):
+    return {"id": codigo, "nome": nome, "microrregiao": {"mesorregiao": {"UF": {"id": uf}}}}
+
+
+@pytest.mark.asyncio
+async def test_sincronizar_com_ibge_works_without_postgis(monkeypatch):
+    await _criar_tabelas_localidades()
+    _fake_ibge(monkeypatch, [{"id": 11, "sigla": "MG", "nome": "Minas Gerais"}], [_muni(1100015, "Testemunha", uf=11)])
+
     async with AsyncSessionLocal() as db:
         # Should not raise even if PostGIS is not installed
         await LocalidadesService.sincronizar_com_ibge(db)
 
-        # Verify that estados and municipios were inserted
-        from sqlalchemy import select
-        from app.models.localidades import Estado, Municipio
-
         res = await db.execute(select(Estado).where(Estado.codigo_ibge == 11))
         estado = res.scalar_one_or_none()
         assert estado is not None
 
-        res = await db.execute(select(Municipio).where(Municipio.codigo_ibge == 1100015))
-        municipio = res.scalar_one_or_none()
-        assert municipio is not None
+        res = await db.execute(select(Municipio.estado_uuid).where(Municipio.codigo_ibge == 1100015))
+        assert res.scalar_one_or_none() == estado.uuid
 
 
 @pytest.mark.asyncio
-async def test_sincronizar_skips_failing_municipio(monkeypatch):
-    # Two municipios: one will raise on insert, second should be inserted
-    async def fake_get(self, url):
-        class Dummy:
-            def __init__(self, payload):
-                self._payload = payload
-            def json(self):
-                return self._payload
-        if 'estados' in url:
-            return Dummy([{"id": 11, "sigla": "MG", "nome": "Minas Gerais"}])
-        if 'municipios' in url:
-            return Dummy([
-                {
-                    "id": 1100015,
-                    "nome": "Fail City",
-                    "microrregiao": {"mesorregiao": {"UF": {"id": 11}}}
-                },
-                {
-                    "id": 1100020,
-                    "nome": "Good City",
-                    "microrregiao": {"mesorregiao": {"UF": {"id": 11}}}
-                }
-            ])
-        return Dummy([])
+async def test_sincronizar_skips_municipio_without_known_uf(monkeypatch):
+    await _criar_tabelas_localidades()
+    sem_uf = {"id": 1100015, "nome": "Fail City", "microrregiao": None}
+    _fake_ibge(monkeypatch, [{"id": 11, "sigla": "RO", "nome": "Rondônia"}], [
+        sem_uf,
+        _muni(5300108, "Estado desconhecido", uf=53),
+        _muni(1100020, "Good City", uf=11),
+        {"id": 1100023, "nome": "Nova", "microrregiao": None,
+         "regiao-imediata": {"regiao-intermediaria": {"UF": {"id": 11}}}},
+    ])
 
-    monkeypatch.setattr('httpx.AsyncClient.get', fake_get, raising=False)
-    monkeypatch.setattr(LocalidadesService, '_importar_municipios_do_shapefile_sync', lambda *_: False)
-    # Force no PostGIS so raw INSERT is used
-    monkeypatch.setattr(LocalidadesService, '_postgis_available', lambda *_: False)
+    async with AsyncSessionLocal() as db:
+        contagens = await LocalidadesService.sincronizar_com_ibge(db)
 
-    from sqlalchemy.ext.asyncio import AsyncSession
-    original_execute = AsyncSession.execute
+        codigos = (await db.execute(select(Municipio.codigo_ibge).order_by(Municipio.codigo_ibge))).scalars().all()
+        assert codigos == [1100020, 1100023]
+        assert contagens["municipios"] == {"inserted": 2, "updated": 0, "unchanged": 0, "ignored": 2}
 
-    async def fake_execute(self, *args, **kwargs):
-        # Detect raw INSERT INTO municipios and fail for codigo_ibge == 1100015
-        sql = args[0]
-        params = args[1] if len(args) > 1 else kwargs.get('params') or kwargs.get('parameters')
-        if isinstance(sql, str) and 'INSERT INTO municipios' in sql:
-            if params and params.get('codigo_ibge') == 1100015:
-                raise Exception('simulated insert failure')
-        return await original_execute(self, *args, **kwargs)
 
-    monkeypatch.setattr(AsyncSession, 'execute', fake_execute)
+@pytest.mark.asyncio
+async def test_sincronizar_is_set_based_and_reports_changes(monkeypatch):
+    await _criar_tabelas_localidades()
+    estados = [{"id": 31, "sigla": "MG", "nome": "Minas Gerais"}, {"id": 35, "sigla": "SP", "nome": "São Paulo"}]
+    municipios = [_muni(3100000 + i, f"Município {i}", uf=31 if i % 2 else 35) for i in range(300)]
+    _fake_ibge(monkeypatch, estados, municipios)
 
     async with AsyncSessionLocal() as db:
-        # Should not raise; failing municipio is skipped, the other is inserted
-        await LocalidadesService.sincronizar_com_ibge(db)
+        primeira = await LocalidadesService.sincronizar_com_ibge(db)
+    assert primeira["estados"] == {"inserted": 2, "updated": 0, "unchanged": 0}
+    assert primeira["municipios"] == {"inserted": 300, "updated": 0, "unchanged": 0, "ignored": 0}
+
+    municipios[0] = _muni(3100000, "Renomeado", uf=35)
+    municipios[1] = _muni(3100001, "Município 1", uf=35)
+    _fake_ibge(monkeypatch, estados, municipios + [_muni(3199999, "Novo")])
+
+    statements = []
+    listener = lambda conn, cursor, stmt, params, context, executemany: statements.append(stmt)
+    event.listen(engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        async with AsyncSessionLocal() as db:
+            segunda = await LocalidadesService.sincronizar_com_ibge(db)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", listener)
+
+    assert segunda["estados"] == {"inserted": 0, "updated": 0, "unchanged": 2}
+    assert segunda["municipios"] == {"inserted": 1, "updated": 2, "unchanged": 298, "ignored": 0}
+    # Número de comandos independe da quantidade de municípios (sem round trip por linha)
+    assert len(statements) < 30
 
-        from sqlalchemy import select
-        from app.models.localidades import Municipio
-
-        res_fail = await db.execute(select(Municipio).where(Municipio.codigo_ibge == 1100015))
-        assert res_fail.scalar_one_or_none() is None
-
-        res_good = await db.execute(select(Municipio).where(Municipio.codigo_ibge == 1100020))
-        assert res_good.scalar_one_or_none() is not None
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(
+            select(Municipio.nome, Estado.sigla).join(Estado, Estado.uuid == Municipio.estado_uuid)
+            .where(Municipio.codigo_ibge == 3100001)
+        )).one()
+        assert tuple(row) == ("Município 1", "SP")
@@ -0,0 +1,115 @@
+import pytest
+from fastapi import HTTPException
+from geoalchemy2 import Geometry
+from sqlalchemy import MetaData, Table, delete
+
+from app.api.routes.localidades import status_sincronizacao
+from app.db import AsyncSessionLocal, engine
+from app.models.localidades import Estado, Municipio
+from app.models.localidades_sync_job import LocalidadesSyncJob
+from app.services.localidades_service import LocalidadesService
+from app.services.localidades_sources import LocalidadesSource, montar_snapshot
+from app.services.localidades_sync_service import LocalidadesSyncService, SyncAlreadyRunning
+
+
+async def _preparar():
+    # Sem as colunas de geometria: o SQLite dos testes não tem SpatiaLite
+    metadata = MetaData()
+    for table in (Estado.__table__, Municipio.__table__):
+        Table(table.name, metadata, *(c._copy() for c in table.columns if not isinstance(c.type, Geometry)))
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.drop_all)
+        await conn.run_sync(metadata.create_all)
+        await conn.execute(delete(LocalidadesSyncJob))
+
+
+class _FakeSource(LocalidadesSource):
+    nome = "fake"
+
+    def __init__(self):
+        self.loads = 0
+        self.municipios = [{"id": 3550308, "nome": "São Paulo", "uf_id": 35}]
+
+    async def carregar(self):
+        self.loads += 1
+        return montar_snapshot([{"id": 35, "sigla": "SP", "nome": "São Paulo"}], self.municipios)
+
+
+@pytest.mark.asyncio
+async def test_failed_sync_resumes_at_failed_phase(monkeypatch):
+    await _preparar()
+    fonte = _FakeSource()
+    monkeypatch.setattr(LocalidadesService, "_importar_municipios_do_shapefile_sync", lambda *_: False)
+
+    service = LocalidadesSyncService(fonte=fonte)
+    job = await service.start("integracao")
+    await service.task
+
+    async with AsyncSessionLocal() as db:
+        failed = await LocalidadesSyncService.get_job(db, job.id)
+        assert (failed.status, failed.phase) == ("failed", "shapefile")
+        assert "shapefile" in failed.error
+        assert failed.progress["municipios"] == {"inserted": 1, "updated": 0, "unchanged": 0, "ignored": 0}
+    assert fonte.loads == 1
+
+    # Nova tentativa: mesmo job, a partir do shapefile (estados/municípios não são baixados de novo)
+    monkeypatch.setattr(LocalidadesService, "_importar_municipios_do_shapefile_sync", lambda *_: True)
+    service = LocalidadesSyncService(fonte=fonte)
+    resumed = await service.start("integracao")
+    await service.task
+
+    assert resumed.id == job.id
+    assert fonte.loads == 1
+    async with AsyncSessionLocal() as db:
+        read = await status_sincronizacao(job.id, db=db)
+    assert (read.status, read.phase, read.attempts, read.error) == ("done", None, 2, None)
+    assert read.progress["shapefile"] == {"ok": True}
+    assert read.progress["geometria"] == {"postgis": False, "updated": 0, "centroides": 0}
+    assert read.progress["estados"]["inserted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_sync_is_rejected():
+    await _preparar()
+
+    lock = await LocalidadesSyncService(fonte=_FakeSource())._try_lock()
+    try:
+        with pytest.raises(SyncAlreadyRunning):
+            await LocalidadesSyncService(fonte=_FakeSource()).start()
+    finally:
+        await lock.release()
+
+    async with AsyncSessionLocal() as db:
+        with pytest.raises(HTTPException) as excinfo:
+            await status_sincronizacao(999999, db=db)
+    assert excinfo.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_unchanged_snapshot_skips_sync_unless_forced(monkeypatch):
+    await _preparar()
+    monkeypatch.setattr(LocalidadesService, "_importar_municipios_do_shapefile_sync", lambda *_: True)
+    fonte = _FakeSource()
+
+    async def sincronizar(forcar=False):
+        service = LocalidadesSyncService(fonte=fonte)
+        job = await service.start("integracao", forcar=forcar)
+        await service.task
+        async with AsyncSessionLocal() as db:
+            return await LocalidadesSyncService.get_job(db, job.id)
+
+    first = await sincronizar()
+    assert first.status == "done" and first.progress["municipios"]["inserted"] == 1
+
+    skipped = await sincronizar()
+    assert skipped.status == "done" and skipped.id != first.id
+    assert skipped.progress["versao"] == first.progress["versao"]
+    assert skipped.progress["shapefile"] == {"skipped": True}
+
+    forced = await sincronizar(forcar=True)
+    assert forced.progress["municipios"] == {"inserted": 0, "updated": 0, "unchanged": 1, "ignored": 0}
+
+    fonte.municipios = fonte.municipios + [{"id": 3509502, "nome": "Campinas", "uf_id": 35}]
+    changed = await sincronizar()
+    assert changed.progress["versao"] != first.progress["versao"]
+    assert changed.progress["municipios"]["inserted"] == 1
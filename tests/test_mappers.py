@@ -1,4 +1,7 @@
-from app.utils.mappers import minuta_to_shipment_payload, nota_to_invoice_payload
+from app.models.shipment import Shipment
+from app.schemas.notfis import Actor
+from app.utils.mappers import _REM_MAP, minuta_to_shipment_payload, nota_to_invoice_payload
+from app.utils.shipment_serializers import _ACTOR_MAPS
 
 class Dummy:
     def __init__(self, **kwargs):
@@ -48,4 +51,28 @@ def test_nota_mapping_includes_remetente_ndoc_when_present():
 def test_nota_mapping_remetente_ndoc_none_when_absent():
     nf = Dummy(nPed='PED', serie='1', nDoc='123', dEmi='2024-01-01', vBC='10', vNF=1200.0, nCFOP='5102', pBru='10.5', qVol='3', chave='44CHAVE', cte={'Chave': 'CTECHAVE'})
     payload = nota_to_invoice_payload(nf, shipment_id=42)
-    assert 'remetente_ndoc' in payload and payload['remetente_ndoc'] is None
\ No newline at end of file
+    assert 'remetente_ndoc' in payload and payload['remetente_ndoc'] is None
+
+
+def _getattr_loop(field_map, obj):
+    return {target: getattr(obj, attr, None) for target, attr in field_map.pairs}
+
+
+def test_field_map_matches_getattr_for_pydantic_source():
+    actor = Actor(
+        nDoc="12345678901234", IE="ISENTO", cFiscal=1, xNome="REM LTDA", xFant="REM", xLgr="RUA A",
+        nro="1", xBairro="CENTRO", cMun="3550308", CEP="01001000", cPais=1058,
+    )
+    assert _REM_MAP.to_dict(actor) == _getattr_loop(_REM_MAP, actor)
+    assert _REM_MAP.to_dict(Dummy(nDoc="111")) == _getattr_loop(_REM_MAP, Dummy(nDoc="111"))
+
+
+def test_field_map_matches_getattr_for_orm_source():
+    rem_map = _ACTOR_MAPS[("rem", True)]
+    # Colunas nunca atribuídas não estão no __dict__ da instância
+    shipment = Shipment(id=1, rem_nDoc="12345678901234", rem_xNome="REM LTDA")
+    assert "rem_xLgr" not in shipment.__dict__
+
+    result = rem_map.to_dict(shipment)
+    assert result == _getattr_loop(rem_map, shipment)
+    assert result["nDoc"] == "12345678901234"
@@ -6,6 +6,7 @@ from app.services.shipment_status_service import ShipmentStatusService
 from app.services.shipment_xml_service import ShipmentXmlService
 from app.schemas.shipment import ShipmentStatusRequest, AttachmentIn, AttachmentFile
 from app.models.shipment import Shipment, ShipmentInvoice
+from app.models.tracking_outbox import TrackingOutbox
 from app.db import AsyncSessionLocal
 from fastapi import UploadFile, HTTPException
 
@@ -19,7 +20,7 @@ async def test_status_service_change_status_success():
         db.add(shipment)
         await db.flush()
 
-        invoice = ShipmentInvoice(shipment_id=shipment.id, access_key="12345678901234567890123456789012345678901234")
+        invoice = ShipmentInvoice(shipment_id=shipment.id, access_key="12345678901234567890123456789012345678901230")
         db.add(invoice)
         await db.commit()
         await db.refresh(invoice)
@@ -38,9 +39,18 @@ async def test_status_service_change_status_success():
         assert result.codigo_enviado == "1"
         assert len(result.results) == 1
         assert result.results[0].ok is True
-        mock_tracking.enviar.assert_called_once()
+        # Envio à Brudam fica para o dispatcher do outbox
+        mock_tracking.enviar.assert_not_called()
         mock_tracking.registrar.assert_called_once()
 
+        evento = await db.get(TrackingOutbox, result.results[0].evento_id)
+        assert evento.status == "pending"
+        assert evento.documentos[0]["chave"] == invoice.access_key
+        assert evento.documentos[0]["eventos"][0]["codigo"] == 1
+
+        await db.refresh(shipment)
+        assert (shipment.status_code, shipment.status_type) == ("1", "Finalizada")
+
 
 @pytest.mark.asyncio
 async def test_status_service_invalid_code():
@@ -62,7 +72,7 @@ async def test_status_service_with_file_attachment():
         db.add(shipment)
         await db.flush()
 
-        invoice = ShipmentInvoice(shipment_id=shipment.id, access_key="12345678901234567890123456789012345678901234")
+        invoice = ShipmentInvoice(shipment_id=shipment.id, access_key="12345678901234567890123456789012345678901231")
         db.add(invoice)
         await db.commit()
         await db.refresh(invoice)
@@ -81,10 +91,9 @@ async def test_status_service_with_file_attachment():
         result = await service.change_status(db=db, invoice_id=invoice.id, payload=payload, anexo_file=upload_file)
 
         assert result.status == "ok"
-        # Verify tracking was called with attachments
-        call_args = mock_tracking.enviar.call_args
-        assert call_args.kwargs["anexos"] is not None
-        assert len(call_args.kwargs["anexos"]) == 1
+        # Verify the outbox event carries the attachment
+        evento = await db.get(TrackingOutbox, result.results[0].evento_id)
+        assert len(evento.documentos[0]["anexos"]) == 1
 
 
 @pytest.mark.asyncio
@@ -95,7 +104,7 @@ async def test_status_service_with_base64_attachment():
         db.add(shipment)
         await db.flush()
 
-        invoice = ShipmentInvoice(shipment_id=shipment.id, access_key="12345678901234567890123456789012345678901234")
+        invoice = ShipmentInvoice(shipment_id=shipment.id, access_key="12345678901234567890123456789012345678901232")
         db.add(invoice)
         await db.commit()
         await db.refresh(invoice)
@@ -113,8 +122,8 @@ async def test_status_service_with_base64_attachment():
         result = await service.change_status(db=db, invoice_id=invoice.id, payload=payload)
 
         assert result.status == "ok"
-        call_args = mock_tracking.enviar.call_args
-        assert len(call_args.kwargs["anexos"]) == 1
+        evento = await db.get(TrackingOutbox, result.results[0].evento_id)
+        assert len(evento.documentos[0]["anexos"]) == 1
 
 
 @pytest.mark.asyncio
@@ -125,7 +134,7 @@ async def test_status_service_with_recebedor():
         db.add(shipment)
         await db.flush()
 
-        invoice = ShipmentInvoice(shipment_id=shipment.id, access_key="12345678901234567890123456789012345678901234")
+        invoice = ShipmentInvoice(shipment_id=shipment.id, access_key="12345678901234567890123456789012345678901233")
         db.add(invoice)
         await db.commit()
         await db.refresh(invoice)
@@ -262,3 +271,104 @@ async def test_xml_service_invoice_not_found():
             await service.upload_xmls(db=db, invoice_id=99999, xml_files=[upload_file])
 
         assert exc_info.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_status_service_change_status_batch():
+    """Batch status change uses a fixed number of statements and one multi-document outbox event."""
+    from sqlalchemy import event, select
+    from app.db import engine
+    from app.models.shipment import ShipmentInvoiceTracking
+    from app.schemas.shipment import ShipmentStatusBatchRequest
+
+    async with AsyncSessionLocal() as db:
+        invoice_ids = []
+        for i in range(5):
+            shipment = Shipment(service_code="1", emission_status=1, rem_nDoc="11111111000111")
+            db.add(shipment)
+            await db.flush()
+            invoice = ShipmentInvoice(shipment_id=shipment.id, access_key=f"5{i:043d}"[::-1])
+            db.add(invoice)
+            await db.flush()
+            invoice_ids.append(invoice.id)
+        await db.commit()
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+    try:
+        async with AsyncSessionLocal() as db:
+            service = ShipmentStatusService()
+            result = await service.change_status_batch(
+                db=db, payload=ShipmentStatusBatchRequest(ids=invoice_ids + [999999], code="25")
+            )
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count)
+
+    assert result.status == "partial"
+    assert [r.ok for r in result.results] == [True] * 5 + [False]
+    # SELECT notas, UPDATE shipments, INSERT trackings, INSERT outbox
+    assert statements == ["SELECT", "UPDATE", "INSERT", "INSERT"]
+
+    async with AsyncSessionLocal() as db:
+        evento = await db.get(TrackingOutbox, result.results[0].evento_id)
+        trackings = (await db.execute(
+            select(ShipmentInvoiceTracking).where(ShipmentInvoiceTracking.shipment_invoice_id.in_(invoice_ids))
+        )).scalars().all()
+        shipments = (await db.execute(
+            select(Shipment).join(ShipmentInvoice).where(ShipmentInvoice.id.in_(invoice_ids))
+        )).scalars().all()
+
+    assert len(evento.documentos) == 5
+    assert {d["cliente"] for d in evento.documentos} == {"11111111000111"}
+    assert len(trackings) == 5
+    assert {(s.status_code, s.status_type, s.status["message"]) for s in shipments} == {("25", "Transito", "EM ROTA DE ENTREGA")}
+
+
+@pytest.mark.asyncio
+async def test_status_service_change_status_single_transaction():
+    """Status, outbox event and tracking row are written in one commit without refreshes."""
+    from sqlalchemy import event, select
+    from app.db import engine
+    from app.models.shipment import ShipmentInvoiceTracking
+
+    async with AsyncSessionLocal() as db:
+        shipment = Shipment(service_code="1", emission_status=1)
+        db.add(shipment)
+        await db.flush()
+        invoice = ShipmentInvoice(shipment_id=shipment.id, access_key="12345678901234567890123456789012345678901239")
+        db.add(invoice)
+        await db.commit()
+        invoice_id = invoice.id
+
+    statements, commits = [], []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split()[0])
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    event.listen(engine.sync_engine, "commit", on_commit)
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await ShipmentStatusService().change_status(
+                db=db, invoice_id=invoice_id, payload=ShipmentStatusRequest(code="25")
+            )
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+        event.remove(engine.sync_engine, "commit", on_commit)
+
+    assert sorted(statements) == ["INSERT", "INSERT", "SELECT", "UPDATE"]
+    assert len(commits) == 1
+    assert result.results[0].evento_id is not None
+
+    async with AsyncSessionLocal() as db:
+        trackings = (await db.execute(
+            select(ShipmentInvoiceTracking).where(ShipmentInvoiceTracking.shipment_invoice_id == invoice_id)
+        )).scalars().all()
+    assert [t.codigo_evento for t in trackings] == ["25"]
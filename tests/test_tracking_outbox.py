@@ -0,0 +1,124 @@
+import datetime
+
+import httpx
+import pytest
+from sqlalchemy import update
+from unittest.mock import AsyncMock, Mock
+
+from app.core.config import settings
+from app.db import AsyncSessionLocal
+from app.models.tracking_outbox import TrackingOutbox
+from app.services.tracking_outbox_service import TrackingOutboxService
+
+
+async def _enqueue(codigo: str = "25") -> int:
+    async with AsyncSessionLocal() as db:
+        evento = TrackingOutboxService.enqueue(db, [{"chave": "OUTBOX", "eventos": [{"codigo": int(codigo)}]}], codigo)
+        await db.commit()
+        return evento.id
+
+
+async def _make_due(event_id: int) -> None:
+    async with AsyncSessionLocal() as db:
+        async with db.begin():
+            await db.execute(
+                update(TrackingOutbox).where(TrackingOutbox.id == event_id)
+                .values(next_attempt_at=datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1))
+            )
+
+
+async def _get(event_id: int) -> TrackingOutbox:
+    async with AsyncSessionLocal() as db:
+        return await db.get(TrackingOutbox, event_id)
+
+
+def _service(*responses) -> TrackingOutboxService:
+    tracking = Mock()
+    if len(responses) == 1 and isinstance(responses[0], tuple):
+        tracking.enviar_documentos = AsyncMock(return_value=responses[0])
+    else:
+        tracking.enviar_documentos = AsyncMock(side_effect=list(responses))
+    return TrackingOutboxService(tracking_svc=tracking)
+
+
+@pytest.mark.asyncio
+async def test_outbox_delivers_pending_event():
+    event_id = await _enqueue()
+    service = _service((True, 200, "OK"))
+
+    assert await service.run_once() >= 1
+
+    evento = await _get(event_id)
+    assert (evento.status, evento.attempts, evento.response) == ("sent", 1, "OK")
+    service.tracking_svc.enviar_documentos.assert_any_call([{"chave": "OUTBOX", "eventos": [{"codigo": 25}]}])
+
+
+@pytest.mark.asyncio
+async def test_outbox_retries_with_backoff_then_dead_letters(monkeypatch):
+    monkeypatch.setattr(settings, "tracking_outbox_max_attempts", 2)
+    event_id = await _enqueue()
+    service = _service(httpx.ConnectTimeout("timeout"), (False, 503, "indisponível"))
+
+    assert event_id in await service.claim_batch()
+    before = datetime.datetime.now(datetime.timezone.utc)
+    assert await service.deliver(event_id) == "pending"
+
+    evento = await _get(event_id)
+    assert evento.attempts == 1 and "ConnectTimeout" in evento.last_error
+    delay = evento.next_attempt_at.replace(tzinfo=datetime.timezone.utc) - before
+    assert datetime.timedelta(seconds=settings.tracking_outbox_backoff_base * 0.8 - 1) < delay
+    # Ainda não venceu: não é reservado de novo
+    assert event_id not in await service.claim_batch()
+
+    await _make_due(event_id)
+    assert event_id in await service.claim_batch()
+    assert await service.deliver(event_id) == "dead"
+    evento = await _get(event_id)
+    assert evento.attempts == 2 and evento.last_error.startswith("HTTP 503")
+
+
+@pytest.mark.asyncio
+async def test_outbox_rejected_event_goes_straight_to_dead():
+    event_id = await _enqueue()
+    service = _service((False, 400, "chave inválida"))
+
+    assert event_id in await service.claim_batch()
+    assert await service.deliver(event_id) == "dead"
+    assert (await _get(event_id)).attempts == 1
+
+
+def test_backoff_is_exponential_and_capped(monkeypatch):
+    monkeypatch.setattr(settings, "tracking_outbox_backoff_base", 10.0)
+    monkeypatch.setattr(settings, "tracking_outbox_backoff_max", 60.0)
+    assert 8.0 <= TrackingOutboxService.backoff(1) <= 10.0
+    assert 32.0 <= TrackingOutboxService.backoff(3) <= 40.0
+    assert TrackingOutboxService.backoff(10) <= 60.0
+
+
+@pytest.mark.asyncio
+async def test_outbox_delivery_does_not_overwrite_a_taken_over_claim(monkeypatch):
+    event_id = await _enqueue()
+    service = _service((True, 200, "OK"))
+    assert event_id in await service.claim_batch()
+
+    async def enviar_enquanto_outro_assume(documentos):
+        # A reserva venceu e outro dispatcher assumiu o evento durante o envio
+        monkeypatch.setattr(settings, "tracking_outbox_stale_seconds", -1)
+        assert event_id in await TrackingOutboxService(tracking_svc=Mock()).claim_batch()
+        return True, 200, "OK"
+
+    service.tracking_svc.enviar_documentos = AsyncMock(side_effect=enviar_enquanto_outro_assume)
+
+    assert await service.deliver(event_id) is None
+    evento = await _get(event_id)
+    assert (evento.status, evento.attempts) == ("sending", 0)
+
+
+@pytest.mark.asyncio
+async def test_outbox_skips_event_that_is_not_claimed():
+    event_id = await _enqueue()
+    service = _service((True, 200, "OK"))
+
+    assert await service.deliver(event_id) is None
+    service.tracking_svc.enviar_documentos.assert_not_called()
+    assert (await _get(event_id)).status == "pending"
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.services import upload_cte_service
+from app.services.upload_cte_service import UploadCteService
+
+
+def _brudam_client(calls: dict, reject_tokens: set = frozenset()):
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/login":
+            calls["login"] += 1
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, json={"data": {"token": f"tok{calls['login']}"}})
+        calls["upload"] += 1
+        if request.headers["Authorization"].split()[-1] in reject_tokens:
+            return httpx.Response(401, json={"message": "token expirado"})
+        return httpx.Response(200, text="OK")
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _service(client) -> UploadCteService:
+    svc = UploadCteService(client=client)
+    svc.endpoint_login = "http://brudam.test/login"
+    svc.endpoint = "http://brudam.test/upload"
+    svc.usuario = "cte-user"
+    return svc
+
+
+@pytest.mark.asyncio
+async def test_burst_of_uploads_logs_in_once():
+    upload_cte_service._token_cache.clear()
+    calls = {"login": 0, "upload": 0}
+    client = _brudam_client(calls)
+
+    results = await asyncio.gather(*(_service(client).enviar(["PENNUZT4="]) for _ in range(200)))
+
+    assert all(ok for ok, _ in results)
+    assert calls == {"login": 1, "upload": 200}
+
+
+@pytest.mark.asyncio
+async def test_upload_relogs_after_401():
+    upload_cte_service._token_cache.clear()
+    calls = {"login": 0, "upload": 0}
+    client = _brudam_client(calls, reject_tokens={"tok1"})
+
+    ok, text = await _service(client).enviar(["PENNUZT4="])
+
+    assert ok and text == "OK"
+    assert calls == {"login": 2, "upload": 2}
+
+
+@pytest.mark.asyncio
+async def test_token_refreshed_in_background_before_expiry():
+    cache = upload_cte_service._token_cache
+    cache.clear()
+    calls = {"login": 0, "upload": 0}
+    svc = _service(_brudam_client(calls))
+    key = (svc.endpoint_login, svc.usuario)
+    cache._tokens[key] = ("old", time.time() + 5)
+
+    assert await svc.get_token() == "old"
+    await cache._refreshing[key]
+
+    assert await svc.get_token() == "tok1"
+    assert calls["login"] == 1